@@ -0,0 +1,179 @@
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+from meli_project.logic.utils.bronze import ruta_bronze, escribir_payload
+
+
+
+
+# Fin de la historia sintética (fijo para que los datos sean reproducibles)
+FIN_HISTORIA_TS = 1760745600
+
+
+
+
+def pares_sinteticos(n_pares: int) -> list:
+
+    """
+    Devuelve n_pares pares ficticios con destino BRL (ej. S000-BRL, S001-BRL, ...).
+    """
+
+    return [f"S{i:03d}-BRL" for i in range(n_pares)]
+
+
+
+
+def generar_payload(pair: str, dias: int, fin_ts: int = FIN_HISTORIA_TS, semilla: int = 0) -> list:
+
+    """
+    Genera un payload con la forma de la respuesta del endpoint daily de AwesomeAPI:
+    una lista del más reciente al más antiguo, con los valores como strings y la
+    cabecera (code, codein, name, create_date) solo en el primer registro.
+    """
+
+    code, codein = pair.split("-")
+
+    rnd = random.Random(f"{pair}-{semilla}")
+
+    valor = rnd.uniform(0.5, 6.0)
+
+    payload = []
+
+    for d in range(dias):
+
+        valor *= 1 + rnd.gauss(0, 0.01)
+
+        spread = valor * rnd.uniform(0.0005, 0.003)
+
+        registro = {
+            "high": f"{valor * 1.01:.4f}",
+            "low": f"{valor * 0.99:.4f}",
+            "varBid": f"{rnd.gauss(0, 0.01):.4f}",
+            "pctChange": f"{rnd.gauss(0, 0.5):.2f}",
+            "bid": f"{valor:.4f}",
+            "ask": f"{valor + spread:.4f}",
+            "timestamp": str(fin_ts - d * 86400),
+        }
+
+        if d == 0:
+            registro = {"code": code, "codein": codein, "name": f"{code}/{codein}",
+                        "create_date": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(fin_ts)), **registro}
+
+        payload.append(registro)
+
+    return payload
+
+
+
+
+def escribir_bronze_sintetico(bronze_path: str, n_pares: int, dias: int, formato: str = "json") -> list:
+
+    """
+    Escribe en bronze_path un archivo por par sintético. Devuelve las rutas escritas.
+    """
+
+    paths = []
+
+    for pair in pares_sinteticos(n_pares):
+
+        path = ruta_bronze(bronze_path, pair, formato)
+
+        escribir_payload(path, generar_payload(pair, dias))
+
+        paths.append(path)
+
+    return paths
+
+
+
+
+class ServidorApiMock:
+
+
+
+    def __init__(self, n_pares: int, dias: int, latencia: float = 0.0):
+
+        """
+        Servidor HTTP local que reemplaza a AwesomeAPI en los benchmarks:
+        /json/available lista los pares sintéticos y /json/daily/{par}/{dias}
+        devuelve su payload. Las respuestas se serializan una sola vez al iniciar.
+
+        Parameters:
+        - latencia (float): segundos de espera por request, para simular la red.
+        """
+
+        self.latencia = latencia
+
+        self.pares = pares_sinteticos(n_pares)
+
+        self._disponibles = json.dumps({p: p for p in self.pares}).encode("utf-8")
+
+        self._payloads = {p: json.dumps(generar_payload(p, dias)).encode("utf-8") for p in self.pares}
+
+        self.requests = 0
+
+        self._servidor = None
+
+
+
+
+    def __enter__(self):
+
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+
+                servidor.requests += 1
+
+                if servidor.latencia:
+                    time.sleep(servidor.latencia)
+
+                partes = urlparse(self.path).path.strip("/").split("/")
+
+                if partes[-1] == "available":
+                    cuerpo = servidor._disponibles
+
+                elif len(partes) >= 3 and partes[2] in servidor._payloads:
+                    cuerpo = servidor._payloads[partes[2]]
+
+                else:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+        self._servidor = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+
+        threading.Thread(target=self._servidor.serve_forever, daemon=True).start()
+
+        return self
+
+
+
+
+    def __exit__(self, *exc):
+
+        self._servidor.shutdown()
+
+        self._servidor.server_close()
+
+
+
+
+    @property
+    def url_base(self) -> str:
+
+        return f"http://127.0.0.1:{self._servidor.server_address[1]}/json"
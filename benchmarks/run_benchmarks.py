@@ -0,0 +1,282 @@
+"""
+Benchmarks de las etapas del pipeline sobre datos sintéticos.
+
+Uso (desde la raíz del repo):
+
+    python -m benchmarks.run_benchmarks --escalas 10x30,50x180,150x365
+
+Para cada escala (pares x días) se levanta un servidor mock de AwesomeAPI y se
+miden, en carpetas temporales, extracción, limpieza, transformación, modelado y
+carga a un BigQuery falso (en memoria). Cada etapa se corre `--repeticiones`
+veces para el tiempo (se informa el mínimo y la mediana) y una vez más con
+tracemalloc para el pico de memoria. Los resultados se guardan en JSON en
+benchmarks/resultados/ para comparar corridas en el tiempo.
+"""
+
+import os
+import io
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import tracemalloc
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from benchmarks.datos_sinteticos import ServidorApiMock
+from meli_project.logic.o1_extraction.api_wb import CurrencyExtractor
+from meli_project.logic.o2_cleaning.clean_json import DFsCurrencies
+from meli_project.logic.o3_transformation.transformaciones import CurrencyTransformer
+from meli_project.logic.o4_modeling.modelado import CurrencyModeler
+from meli_project.logic.o5_serving.carga_gcp import CargadorBigQuery
+from meli_project.logic.utils.manifiesto import Manifiesto
+
+
+
+
+ESCALAS_DEFAULT = "10x30,50x180,150x365"
+
+
+
+
+class _JobFalso:
+
+    def __init__(self, filas: int):
+
+        self.output_rows = filas
+
+        self.job_id = "benchmark"
+
+    def result(self):
+
+        return self
+
+
+
+
+class ClienteBigQueryFalso:
+
+    """
+    Reemplazo en memoria del cliente de BigQuery: decodifica el Parquet recibido
+    (el costo del lado del cliente) y lo descarta.
+    """
+
+    def __init__(self):
+
+        self.filas = 0
+
+        # Filas de la última carga de cada tabla destino
+        self.tablas = {}
+
+    def load_table_from_file(self, fuente, destino, job_config=None):
+
+        tabla = pq.read_table(io.BytesIO(fuente.read()))
+
+        self.filas += tabla.num_rows
+
+        self.tablas[destino] = tabla.num_rows
+
+        return _JobFalso(tabla.num_rows)
+
+
+
+
+def medir(funcion, repeticiones: int) -> dict:
+
+    """
+    Corre funcion `repeticiones` veces para medir tiempo y una vez más con
+    tracemalloc para el pico de memoria (tracemalloc distorsiona los tiempos).
+    Si la etapa informa un error ("❌ ..." / "⚠️ ...") se corta: medir una etapa
+    que falló no dice nada de su rendimiento.
+    """
+
+    tiempos = []
+
+    for _ in range(repeticiones):
+
+        inicio = time.perf_counter()
+
+        resultado = funcion()
+
+        tiempos.append(time.perf_counter() - inicio)
+
+        if isinstance(resultado, str) and resultado.startswith(("❌", "⚠️")):
+            raise RuntimeError(f"La etapa falló durante el benchmark: {resultado}")
+
+    tracemalloc.start()
+
+    try:
+        funcion()
+
+        _, pico = tracemalloc.get_traced_memory()
+
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "segundos_min": round(min(tiempos), 4),
+        "segundos_mediana": round(statistics.median(tiempos), 4),
+        "pico_memoria_mb": round(pico / 1024 ** 2, 2),
+    }
+
+
+
+
+def benchmark_escala(n_pares: int, dias: int, repeticiones: int, latencia: float, max_en_vuelo: int) -> list:
+
+    """
+    Mide todas las etapas para una escala, encadenando las salidas de cada una
+    como entrada de la siguiente. Todo se escribe en una carpeta temporal.
+    """
+
+    tmp = tempfile.mkdtemp(prefix="meli_benchmark_")
+
+    carpetas = {capa: os.path.join(tmp, capa) for capa in ("bronze", "silver", "gold")}
+
+    for carpeta in carpetas.values():
+        os.makedirs(carpeta)
+
+    manifiesto = Manifiesto(os.path.join(tmp, "manifiesto.json"))
+
+    resultados = []
+
+    try:
+        with ServidorApiMock(n_pares, dias, latencia) as servidor:
+
+            extractor = CurrencyExtractor(numero_dias=dias, max_en_vuelo=max_en_vuelo, requests_por_segundo=0,
+                                          incremental=False, usar_cache=False)
+
+            extractor.base_url = f"{servidor.url_base}/daily"
+
+            extractor.available_url = f"{servidor.url_base}/available"
+
+            extractor.bronze_path = carpetas["bronze"]
+
+            resultados.append({"etapa": "extraccion", **medir(extractor.obtener_todos_los_datos, repeticiones),
+                               "requests": servidor.requests})
+
+        cleaner = DFsCurrencies()
+
+        cleaner.bronze_path = carpetas["bronze"]
+
+        resultados.append({"etapa": "limpieza", **medir(cleaner.obtener_df_unificado, repeticiones)})
+
+        df = cleaner.obtener_df_unificado()
+
+        transformador = CurrencyTransformer(df)
+
+        transformador.silver_path = carpetas["silver"]
+
+        transformador.manifiesto = manifiesto
+
+        transformador.calidad.path = os.path.join(tmp, "calidad")
+
+        resultados.append({"etapa": "transformacion",
+                           **medir(lambda: transformador.guardar_en_parquet(particionado=False), repeticiones)})
+
+        modelador = CurrencyModeler(forzar=True)
+
+        modelador.silver_path = carpetas["silver"]
+
+        modelador.gold_path = carpetas["gold"]
+
+        modelador.manifiesto = manifiesto
+
+        resultados.append({"etapa": "modelado", **medir(modelador.procesar_modelado_completo, repeticiones)})
+
+        cliente = ClienteBigQueryFalso()
+
+        cargador = CargadorBigQuery(client=cliente, forzar=True, modo_carga="load_job", incremental=False)
+
+        cargador.gold_path = carpetas["gold"]
+
+        cargador.manifiesto = manifiesto
+
+        resultados.append({"etapa": "carga_bigquery", **medir(cargador.cargar_todas_tablas_gold, repeticiones),
+                           "tablas": len(cliente.tablas), "filas_cargadas": sum(cliente.tablas.values())})
+
+        for resultado in resultados:
+            resultado.update({"pares": n_pares, "dias": dias, "registros": len(df)})
+
+        return resultados
+
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+
+
+def _commit_actual() -> str:
+
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__), check=True).stdout.strip()
+
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Benchmarks de las etapas del pipeline ETL.")
+
+    parser.add_argument("--escalas", default=ESCALAS_DEFAULT,
+                        help="Escalas 'paresxdias' separadas por coma (default: %(default)s).")
+
+    parser.add_argument("--repeticiones", type=int, default=3, help="Corridas por etapa para medir tiempo.")
+
+    parser.add_argument("--latencia", type=float, default=0.0, help="Latencia simulada por request (segundos).")
+
+    parser.add_argument("--max-en-vuelo", type=int, default=8, help="Descargas simultáneas del extractor.")
+
+    parser.add_argument("--salida", default=None, help="Archivo JSON de resultados.")
+
+    args = parser.parse_args()
+
+    escalas = [tuple(int(x) for x in escala.lower().split("x")) for escala in args.escalas.split(",") if escala]
+
+    resultados = []
+
+    for n_pares, dias in escalas:
+
+        print(f"Escala {n_pares} pares x {dias} días...")
+
+        for resultado in benchmark_escala(n_pares, dias, max(1, args.repeticiones), args.latencia, args.max_en_vuelo):
+
+            print(f"  {resultado['etapa']:<16} {resultado['segundos_min']:>9.4f}s  {resultado['pico_memoria_mb']:>9.2f} MB")
+
+            resultados.append(resultado)
+
+    salida = args.salida or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "resultados", f"benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    )
+
+    os.makedirs(os.path.dirname(salida), exist_ok=True)
+
+    reporte = {
+        "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "commit": _commit_actual(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "pyarrow": pa.__version__,
+        "parametros": vars(args),
+        "resultados": resultados,
+    }
+
+    with open(salida, "w", encoding="utf-8") as f:
+        json.dump(reporte, f, indent=2, ensure_ascii=False)
+
+    print(f"Resultados guardados en: {salida}")
+
+
+
+
+if __name__ == "__main__":
+
+    main()
@@ -1,18 +1,86 @@
+import os
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from meli_project.logic.o1_extraction.api_wb import CurrencyExtractor
+from meli_project.logic.o1_extraction.backfill import BackfillHistorico
 from meli_project.logic.o2_cleaning.clean_json import DFsCurrencies
 from meli_project.logic.o3_transformation.transformaciones import CurrencyTransformer
 from meli_project.logic.o4_modeling.modelado import CurrencyModeler
 from meli_project.logic.o5_serving.carga_gcp import CargadorBigQuery
+from meli_project.logic.utils.bronze import listar_archivos_bronze
+from meli_project.logic.utils.contexto import ContextoEjecucion
+from meli_project.logic.utils.estado_corrida import EstadoCorrida
+from meli_project.logic.utils.manifiesto import hash_ruta, contar_filas, tamano_ruta
+from meli_project.logic.utils.metricas import METRICAS
+from meli_project.logic.utils.pipeline import PipelineRunner
 from meli_project.logic.utils.utils import *
+from meli_project.params import *
 
 
 
-def main():
+def verificar_resultado(resultado, etapa: str):
+
+    """
+    Los métodos del pipeline informan errores devolviendo un mensaje "❌ ..." o "⚠️ ...".
+    Se convierten en excepción para que el runner saltee las etapas dependientes.
+    """
+
+    if isinstance(resultado, str) and resultado.startswith(("❌", "⚠️")):
+        raise RuntimeError(f"{etapa}: {resultado}")
+
+    return resultado
+
+
+
+def backfill(desde: str, hasta: str = None, pares: list = None) -> str:
+
+    """
+    Descarga a bronze la historia [desde, hasta] de cada par con BackfillHistorico
+    (shards con checkpoint: si se corta, la próxima ejecución sigue desde ahí).
+    La extracción diaria fusiona su ventana sobre esos archivos, así que la
+    historia se conserva en las corridas siguientes.
+    """
+
+    logger = setup_logger('o6_main_logs/main_etl.log')
+
+    logger.info(f"📚 Backfill histórico {desde} → {hasta or 'hoy'}...")
+
+    resultado = BackfillHistorico().ejecutar(desde, hasta, pares)
+
+    if "❌" in resultado:
+        logger.error(resultado)
+
+    else:
+        logger.info(resultado)
+
+    return resultado
+
+
+
+
+def main(reanudar: bool = False):
 
 
     """
     Pipeline ETL completo para normalizar cotizaciones de monedas extranjeras,
     exportarlas a CSV y Parquet, y subirlas a BigQuery.
+
+    Las etapas corren como un DAG: cada una arranca cuando terminan sus dependencias,
+    si una falla se saltean las que dependen de ella, y las independientes
+    (exportación CSV y carga a BigQuery) corren en paralelo.
+
+    La tabla transformada queda en un ContextoEjecucion en memoria: modelado y
+    carga la reutilizan y el Parquet en disco solo se escribe por durabilidad.
+
+    Con PIPELINE_STREAMING, limpieza y transformación se reemplazan por una única
+    etapa que lleva bronze a silver en lotes chicos (memoria acotada por lote).
+
+    El avance queda en un EstadoCorrida durable. Con reanudar=True (main.py --resume)
+    no se vuelven a descargar los pares ya extraídos y se saltean las etapas cuya
+    salida ya existe y fue generada con las mismas entradas (comparando hashes).
+
+    Cada etapa se mide (tiempo, CPU, RSS, filas y bytes) y al final se exporta un
+    reporte JSON y un textfile de Prometheus en METRICAS_PATH.
     """
 
     logger = setup_logger('o6_main_logs/main_etl.log')
@@ -20,81 +88,322 @@ def main():
     logger.info("🚀 INICIO PIPELINE ETL - Cotizaciones de Monedas")
 
 
-    try:
+    estado = EstadoCorrida()
+
+    if estado.iniciar(reanudar):
+        logger.info(f"↩️ Reanudando la corrida {estado.datos['id']} (iniciada {estado.datos['inicio']}).")
+
+    contexto = ContextoEjecucion()
+
+    cleaner = DFsCurrencies()
+
+    modelador = CurrencyModeler(contexto=contexto)
+
+    # Cada JSON se convierte a DataFrame apenas se descarga, mientras siguen bajando los demás
+    conversor = ThreadPoolExecutor(max_workers=2)
+
+    conversiones = {}
+
+
+    def al_descargar(pair, path):
+
+        estado.registrar_unidad("extraccion", pair, path)
+
+        if not PIPELINE_ARROW and not PIPELINE_STREAMING:
+            conversiones[path] = conversor.submit(cleaner.convertir_json_a_df, path)
+
+
+    def extraccion(_):
+
         logger.info("📥 Extracción de datos desde AwesomeAPI...")
 
         extractor = CurrencyExtractor()
 
-        resultado = extractor.obtener_todos_los_datos()
+        pares = estado.obtener("pares")
+
+        if not pares:
+
+            pares = extractor.get_currency_pairs_brl()
+
+            # Una lista vacía es un fallo de la API: no se guarda para que --resume la vuelva a pedir
+            if not pares:
+                raise RuntimeError("extraccion: ❌ No se obtuvieron pares de monedas de la API.")
+
+            estado.guardar("pares", pares)
+
+        pendientes = [pair for pair in pares if not estado.unidad_vigente("extraccion", pair)]
+
+        if not pendientes:
+
+            logger.info(f"⏭️ Extracción ya completada ({len(pares)} pares).")
+
+            return estado.resultado_etapa("extraccion")
+
+        if len(pendientes) < len(pares):
+            logger.info(f"↩️ {len(pares) - len(pendientes)} pares ya extraídos; faltan {len(pendientes)}.")
+
+        resultado = extractor.obtener_todos_los_datos(pares=pendientes, al_descargar=al_descargar)
+
+        estado.completar_etapa("extraccion", resultado=resultado)
 
         logger.info(f"✅ Resultado extracción: {resultado}")
 
-    except Exception as e:
+        return resultado
 
-        logger.error(f"❌ Error en extracción de monedas: {e}")
 
-    try:
+    def entradas_silver():
+
+        # Silver depende del contenido exacto de bronze
+        return {"bronze": {os.path.basename(path): hash_ruta(path) for path in listar_archivos_bronze(cleaner.bronze_path)}}
+
+
+    def silver_vigente():
+
+        if not estado.etapa_vigente("transformacion", entradas_silver()):
+            return None
+
+        logger.info("⏭️ Silver ya generado con el mismo bronze, se reutiliza.")
+
+        return estado.resultado_etapa("transformacion")
+
+
+    def limpieza(_):
+
+        if silver_vigente():
+            return None
 
         logger.info("Limpieza y unión de JSONs...")
 
-        cleaner = DFsCurrencies()
+        if PIPELINE_ARROW:
+            df_unificado = cleaner.obtener_tabla_arrow()
+
+        else:
+            precargados = {path: futuro.result() for path, futuro in conversiones.items()}
 
-        df_unificado = cleaner.obtener_df_unificado()
+            df_unificado = cleaner.obtener_df_unificado(precargados=precargados)
+
+        if len(df_unificado) == 0:
+            raise ValueError("No hay registros válidos en bronze.")
+
+        METRICAS.sumar("limpieza", "filas_entrada", len(df_unificado))
 
         logger.info(f"✅ DF unificado generado. Registros: {len(df_unificado)}")
 
-    except Exception as e:
+        return df_unificado
 
-        logger.error(f"❌ Error en limpieza/unificación: {e}")
 
-        df_unificado = None
+    def transformacion(entradas):
 
-    if df_unificado is not None:
+        previo = silver_vigente()
 
-        try:
+        if previo:
+            return previo
 
-            logger.info("⚙️ Transformación de datos y guardado en Silver (.parquet)...")
-            transformador = CurrencyTransformer(df_unificado)
+        entradas_bronze = entradas_silver()
 
-            transformador.guardar_en_parquet()
-            logger.info("✅ Transformación completada y guardada.")
+        logger.info("⚙️ Transformación de datos y guardado en Silver (.parquet)...")
 
-        except Exception as e:
+        transformador = CurrencyTransformer(entradas["limpieza"], contexto=contexto)
 
-            logger.error(f"❌ Error en transformación de datos: {e}")
+        path_salida = transformador.guardar_en_parquet()
 
-    try:
+        if path_salida is None:
+            raise RuntimeError("No se pudo guardar el Parquet en Silver.")
 
-        logger.info("📦 Modelado: copia a GOLD y exportación a CSV...")
+        estado.completar_etapa("transformacion", entradas_bronze, path_salida, path_salida)
 
+        medir_salida("transformacion", path_salida)
 
-        modelador = CurrencyModeler()
+        logger.info("✅ Transformación completada y guardada.")
 
-        modelador.procesar_modelado_completo()
+        return path_salida
 
-        logger.info("✅ Archivo Parquet copiado y CSV generado en GOLD.")
 
-    except Exception as e:
+    def transformacion_streaming(_):
 
-        logger.error(f"❌ Error en modelado/exportación a GOLD: {e}")
+        previo = silver_vigente()
 
+        if previo:
+            return previo
 
-    try:
+        entradas_bronze = entradas_silver()
+
+        logger.info("⚙️ Limpieza y transformación en streaming hacia Silver (.parquet)...")
+
+        transformador = CurrencyTransformer(None)
+
+        path_salida = transformador.guardar_en_parquet_streaming(cleaner.iterar_lotes_arrow())
+
+        if path_salida is None:
+            raise RuntimeError("No se pudo guardar el Parquet en Silver.")
+
+        estado.completar_etapa("transformacion", entradas_bronze, path_salida, path_salida)
+
+        medir_salida("transformacion", path_salida)
+
+        logger.info("✅ Transformación en streaming completada y guardada.")
+
+        return path_salida
+
+
+    def medir_salida(etapa: str, path: str):
+
+        if path and os.path.exists(path):
+
+            METRICAS.sumar(etapa, "bytes_escritos", tamano_ruta(path))
+
+            filas = contar_filas(path)
+
+            if filas is not None:
+                METRICAS.sumar(etapa, "filas_salida", filas)
+
+
+    def etapa_reanudable(etapa: str, entradas: dict, funcion, path: str = None):
+
+        """
+        Corre una etapa salvo que ya esté completa con las mismas entradas,
+        y la registra en el estado de la corrida al terminar.
+        """
+
+        if estado.etapa_vigente(etapa, entradas):
+
+            logger.info(f"⏭️ Etapa '{etapa}' ya completada con las mismas entradas.")
+
+            return estado.resultado_etapa(etapa)
+
+        resultado = verificar_resultado(funcion(), etapa)
+
+        medir_salida(etapa, path)
+
+        estado.completar_etapa(etapa, entradas, resultado, path if path and os.path.exists(path) else None)
+
+        return resultado
+
+
+    def gold_parquet(entradas):
+
+        logger.info("📦 Modelado: copia del Parquet a GOLD...")
+
+        silver = entradas["transformacion"]
+
+        gold = os.path.join(modelador.gold_path, os.path.basename(silver))
+
+        return etapa_reanudable("gold_parquet", {"silver": hash_ruta(silver)}, modelador.copiar_parquet_a_gold, gold)
+
+
+    def csv(entradas):
+
+        logger.info("📦 Modelado: exportación a CSV en GOLD...")
+
+        silver = entradas["transformacion"]
+
+        csv_path = os.path.join(modelador.gold_path, modelador.nombre_parquet.replace(".parquet", ".csv.gz" if CSV_GZIP else ".csv"))
+
+        return etapa_reanudable("csv", {"silver": hash_ruta(silver)}, modelador.convertir_a_csv, csv_path)
+
+
+    def gold_agregados(_):
+
+        logger.info("📦 Modelado: tablas agregadas de GOLD (OHLC diario y estadísticas móviles)...")
+
+        # construir_tablas_gold ya saltea el trabajo si Silver no cambió (manifiesto)
+        paths = verificar_resultado(modelador.construir_tablas_gold(), "gold_agregados")
+
+        for path in paths:
+            medir_salida("gold_agregados", path)
+
+        return paths
+
+
+    def tasas_cruzadas(_):
+
+        logger.info("🔀 Modelado: matriz de tasas cruzadas vía BRL en GOLD...")
+
+        path = verificar_resultado(modelador.construir_tasas_cruzadas(), "tasas_cruzadas")
+
+        medir_salida("tasas_cruzadas", path)
+
+        return path
+
+
+    def serving(entradas):
 
         logger.info("☁️ Carga del archivo Parquet a Google BigQuery...")
 
-        cargador = CargadorBigQuery()
+        cargador = CargadorBigQuery(contexto=contexto)
+
+        tablas_gold = [entradas["gold_parquet"]] + entradas["gold_agregados"] + [entradas["tasas_cruzadas"]]
+
+        for path in tablas_gold:
+            METRICAS.sumar("serving", "bytes_leidos", tamano_ruta(path))
+
+        entradas_gold = {"gold": {os.path.basename(path): hash_ruta(path) for path in tablas_gold}}
+
+        return etapa_reanudable("serving", entradas_gold, cargador.cargar_todas_tablas_gold)
 
-        cargador.cargar_todas_tablas_gold()
-        logger.info("✅ Datos cargados correctamente a BigQuery.")
 
-    except Exception as e:
+    runner = PipelineRunner(max_workers=3, logger=logger, metricas=METRICAS)
 
-        logger.error(f"❌ Error al subir a BigQuery: {e}")
+    runner.agregar("extraccion", extraccion)
 
-    logger.info("🏁 FIN PIPELINE ETL finalizado correctamente.")
+    if PIPELINE_STREAMING:
+        runner.agregar("transformacion", transformacion_streaming, depende_de=["extraccion"])
+
+    else:
+        runner.agregar("limpieza", limpieza, depende_de=["extraccion"])
+        runner.agregar("transformacion", transformacion, depende_de=["limpieza"])
+
+    runner.agregar("gold_parquet", gold_parquet, depende_de=["transformacion"])
+    runner.agregar("csv", csv, depende_de=["transformacion"])
+    runner.agregar("gold_agregados", gold_agregados, depende_de=["transformacion"])
+    runner.agregar("tasas_cruzadas", tasas_cruzadas, depende_de=["transformacion"])
+    runner.agregar("serving", serving, depende_de=["gold_parquet", "gold_agregados", "tasas_cruzadas"])
+
+    try:
+        estados = runner.ejecutar()
+
+    finally:
+        conversor.shutdown(wait=True)
+
+    estado.finalizar({nombre: estado_etapa["estado"] for nombre, estado_etapa in estados.items()})
+
+    try:
+        logger.info(f"📊 Métricas: {METRICAS.guardar_reporte()} | Prometheus: {METRICAS.exportar_prometheus()}")
+
+    except OSError as e:
+        logger.error(f"❌ No se pudieron exportar las métricas: {e}")
+
+    for nombre, estado_etapa in estados.items():
+
+        logger.info(f"  {nombre}: {estado_etapa['estado']} ({estado_etapa['segundos']:.2f}s)"
+                    + (f" - {estado_etapa['error']}" if estado_etapa["error"] else ""))
+
+    if all(estado_etapa["estado"] == "ok" for estado_etapa in estados.values()):
+        logger.info("🏁 FIN PIPELINE ETL finalizado correctamente.")
+
+    else:
+        logger.error("🏁 FIN PIPELINE ETL con etapas fallidas o salteadas.")
+
+    return estados
 
 
 if __name__ == "__main__":
 
-    main()
+    parser = argparse.ArgumentParser(description="Pipeline ETL de cotizaciones de monedas.")
+
+    parser.add_argument("--resume", action="store_true",
+                        help="Retoma la última corrida salteando pares y etapas ya completados.")
+
+    parser.add_argument("--backfill", metavar="DESDE",
+                        help="Antes del pipeline, descarga a bronze la historia desde DESDE (YYYY-MM-DD).")
+
+    parser.add_argument("--hasta", metavar="HASTA", help="Fin del backfill (YYYY-MM-DD, por defecto hoy).")
+
+    parser.add_argument("--pares", help="Pares del backfill separados por coma (por defecto todos los BRL).")
+
+    args = parser.parse_args()
+
+    if args.backfill:
+        backfill(args.backfill, args.hasta, args.pares.split(",") if args.pares else None)
+
+    main(reanudar=args.resume)
@@ -1,6 +1,13 @@
 import os
-import json
-import requests
+import time
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from meli_project.logic.o1_extraction.http_cache import HttpCache
+from meli_project.logic.o1_extraction.http_client import HttpClient
+from meli_project.logic.o1_extraction.rate_limiter import RateLimiterPorHost
+from meli_project.logic.utils.bronze import (ruta_bronze, escribir_payload, leer_payload, ultimo_timestamp,
+                                             fusionar_registros, lock_bronze)
+from meli_project.logic.utils.metricas import METRICAS
 from meli_project.logic.utils.utils import *
 from meli_project.params import *
 
@@ -12,14 +19,36 @@ class CurrencyExtractor:
 
 
 
-    def __init__(self, numero_dias: int = 180):
+    def __init__(self, numero_dias: int = 180, max_en_vuelo: int = EXTRACCION_MAX_EN_VUELO,
+                 requests_por_segundo: float = EXTRACCION_REQUESTS_POR_SEGUNDO,
+                 incremental: bool = EXTRACCION_INCREMENTAL,
+                 usar_cache: bool = HTTP_CACHE_ACTIVO,
+                 formato_bronze: str = BRONZE_FORMATO):
 
         """
         Constructor de la clase. Define los parámetros básicos de la API.
+
+        Parameters:
+        - numero_dias (int): cantidad de días de historia a descargar por par.
+        - max_en_vuelo (int): máximo de descargas simultáneas (1 = modo secuencial).
+        - requests_por_segundo (float): límite de requests por host (0 = sin límite).
+        - incremental (bool): si hay historia en bronze, solo pide los días faltantes.
+          En ambos modos lo descargado se fusiona con bronze: la historia previa
+          (por ejemplo la de un backfill) nunca se pisa.
+        - usar_cache (bool): usa la caché HTTP en disco (data/o1_http_cache).
+        - formato_bronze (str): "json" compacto o "jsonl.gz" (un registro por línea).
         """
 
         self.numero_dias = numero_dias
 
+        self.incremental = incremental
+
+        self.formato_bronze = formato_bronze
+
+        self.max_en_vuelo = max(1, int(max_en_vuelo))
+
+        self.rate_limiter = RateLimiterPorHost(requests_por_segundo)
+
         self.base_url = "https://economia.awesomeapi.com.br/json/daily"
 
         self.available_url = "https://economia.awesomeapi.com.br/json/available"
@@ -31,6 +60,16 @@ class CurrencyExtractor:
         )
         os.makedirs(self.bronze_path, exist_ok=True)
 
+        # Caché HTTP (índice de metadatos + cuerpos) junto a bronze
+        self.cache_path = os.path.abspath(
+            os.path.join(os.path.dirname(__file__), "../../../data/o1_http_cache")
+        )
+
+        cache = HttpCache(self.cache_path, ttl_segundos=HTTP_CACHE_TTL) if usar_cache else None
+
+        # Sesión HTTP compartida (pool keep-alive, timeouts, reintentos y caché)
+        self.http = HttpClient(max_conexiones=self.max_en_vuelo, rate_limiter=self.rate_limiter, cache=cache)
+
 
 
 
@@ -45,15 +84,8 @@ class CurrencyExtractor:
 
         logger.info("INICIANDO consulta de pares de monedas disponibles...")
 
-        headers = {
-            "Accept": "application/json",
-            "x-api-key": API_KEY_AWESOME
-        }
-
-
-
         try:
-            response = requests.get(self.available_url, headers=headers)
+            response = self.http.get(self.available_url)
 
 
             if response.status_code == 200:
@@ -62,6 +94,9 @@ class CurrencyExtractor:
 
                 pares_brl = [k for k in data.keys() if k.endswith("BRL")]
 
+                # No va a bronze: se cachea solo la respuesta (dentro del TTL no se vuelve a pedir)
+                self.http.confirmar(self.available_url, response, None)
+
                 logger.info(f"FIN consulta. ✅ {len(pares_brl)} pares BRL obtenidos.")
 
                 return pares_brl
@@ -85,25 +120,74 @@ class CurrencyExtractor:
 
         """
         Descarga el JSON de la API para un par de moneda específico
-        y lo guarda en la capa bronze.
+        y lo fusiona con el archivo bronze del par (ante un mismo timestamp
+        gana lo descargado; los registros más viejos que la ventana se conservan).
         """
 
-        logger = setup_logger(f"o1_extraction_logs/PAIRS/{pair}.log")
+        logger = setup_logger("o1_extraction_logs/descarga_par.log", pair=pair)
+
+        output_path = ruta_bronze(self.bronze_path, pair, self.formato_bronze)
 
         url = f"{self.base_url}/{pair}/{self.numero_dias}"
 
+        existentes = leer_payload(output_path) if self.incremental else None
+
+        desde = ultimo_timestamp(existentes)
+
+        if desde is not None:
+
+            url = f"{url}?{self._rango_faltante(desde)}"
+
+            logger.info(f"Modo incremental: historia previa hasta timestamp {desde}.")
+
         logger.info(f"INICIO de descarga de datos para {pair}...")
 
         try:
 
-            response = requests.get(url)
+            inicio = time.perf_counter()
+
+            response = self.http.get(url)
+
+            METRICAS.observar_http(time.perf_counter() - inicio, response.status_code, pair)
+
+            METRICAS.sumar("extraccion", "bytes_leidos", len(response.content or b""), pair)
 
             if response.status_code == 200:
 
-                output_path = os.path.join(self.bronze_path, f"{pair}.json")
+                # El backfill fusiona sobre el mismo archivo: leer → fusionar → escribir bajo su lock
+                # (bronze se vuelve a leer adentro; lo leído antes solo definió el rango pedido)
+                with lock_bronze(output_path):
+
+                    if self.http.bronze_vigente(url, response, output_path):
+
+                        logger.info(f"FIN descarga. ✅ Contenido sin cambios, se conserva: {output_path}")
+
+                        return output_path
+
+                    data = response.json()
+
+                    existentes = leer_payload(output_path)
+
+                    if existentes:
+
+                        data = fusionar_registros(existentes, data)
 
-                with open(output_path, "w", encoding="utf-8") as f:
-                    json.dump(response.json(), f, indent=4, ensure_ascii=False)
+                        if data == existentes:
+
+                            self.http.confirmar(url, response, output_path)
+
+                            logger.info(f"FIN descarga. ✅ Sin registros nuevos, se conserva: {output_path}")
+
+                            return output_path
+
+                    escribir_payload(output_path, data)
+
+                    # La caché se actualiza recién con bronze escrito
+                    self.http.confirmar(url, response, output_path)
+
+                METRICAS.sumar("extraccion", "filas_salida", len(data), pair)
+
+                METRICAS.sumar("extraccion", "bytes_escritos", os.path.getsize(output_path), pair)
 
                 logger.info(f"FIN descarga. ✅ JSON guardado en: {output_path}")
 
@@ -123,11 +207,35 @@ class CurrencyExtractor:
 
 
 
-    def obtener_todos_los_datos(self, pares: list = None):
+    def _rango_faltante(self, ultimo_ts: int) -> str:
+
+        """
+        Arma los parámetros start_date/end_date (YYYYMMDD) del endpoint daily
+        para pedir solo los días posteriores a lo que ya hay en bronze.
+        Se solapa un día para cubrir diferencias de zona horaria; los
+        duplicados se descartan al fusionar.
+        """
+
+        inicio = datetime.fromtimestamp(ultimo_ts, tz=timezone.utc) - timedelta(days=1)
+
+        fin = datetime.now(timezone.utc)
+
+        return f"start_date={inicio:%Y%m%d}&end_date={fin:%Y%m%d}"
+
+
+
+
+
+
+    def obtener_todos_los_datos(self, pares: list = None, al_descargar=None):
 
         """
         Descarga todos los pares BRL disponibles y guarda sus datos en bronze.
         Si se pasa una lista personalizada, solo se descargan esos pares.
+
+        Parameters:
+        - al_descargar (callable): opcional, se llama con (pair, path) apenas cada
+          par queda guardado en bronze (permite empezar a procesarlo sin esperar al resto).
         """
 
         logger = setup_logger("o1_extraction_logs/descarga_masiva.log")
@@ -141,25 +249,42 @@ class CurrencyExtractor:
         descargados = []
         errores = []
 
-        for pair in pares:
+        if self.max_en_vuelo == 1:
 
-            try:
-                path = self.descargar_json_moneda(pair)
+            for pair in pares:
 
-                if path:
+                if self._descargar_par_seguro(pair, logger, al_descargar):
                     descargados.append(pair)
 
                 else:
                     errores.append(pair)
 
-            except Exception as e:
+        else:
+
+            logger.info(f"Modo concurrente: {self.max_en_vuelo} descargas en vuelo como máximo.")
+
+            resultados = {}
+
+            with ThreadPoolExecutor(max_workers=self.max_en_vuelo) as executor:
 
-                logger.error(f"❌ Error inesperado al procesar {pair}: {e}")
+                futuros = {executor.submit(self._descargar_par_seguro, pair, logger, al_descargar): pair for pair in pares}
 
-                errores.append(pair)
+                for futuro in as_completed(futuros):
+                    resultados[futuros[futuro]] = futuro.result()
+
+            # Se respeta el orden original de los pares en el resumen
+            for pair in pares:
+
+                if resultados.get(pair):
+                    descargados.append(pair)
+
+                else:
+                    errores.append(pair)
 
         logger.info(f"✅ Monedas descargadas: {len(descargados)}")
 
+        logger.info(f"Latencias HTTP: {self.http.resumen_latencias()}")
+
         if errores:
 
             logger.warning(f"⚠️ Monedas con error: {errores}")
@@ -169,3 +294,27 @@ class CurrencyExtractor:
         else:
 
             return f"FIN descarga. ✅ Todos los pares descargados correctamente."
+
+
+
+
+    def _descargar_par_seguro(self, pair: str, logger, al_descargar=None) -> bool:
+
+        """
+        Descarga un par capturando cualquier excepción.
+        Devuelve True si el JSON quedó guardado en bronze.
+        """
+
+        try:
+            path = self.descargar_json_moneda(pair)
+
+            if path and al_descargar is not None:
+                al_descargar(pair, path)
+
+            return bool(path)
+
+        except Exception as e:
+
+            logger.error(f"❌ Error inesperado al procesar {pair}: {e}")
+
+            return False
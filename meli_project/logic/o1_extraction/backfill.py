@@ -0,0 +1,298 @@
+import os
+import json
+import time
+import bisect
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from meli_project.logic.o1_extraction.api_wb import CurrencyExtractor
+from meli_project.logic.utils.bronze import (ruta_bronze, escribir_payload, leer_payload, fusionar_registros,
+                                             iterar_registros, lock_bronze)
+from meli_project.logic.utils.utils import *
+from meli_project.params import *
+
+
+
+
+class BackfillHistorico:
+
+
+
+    def __init__(self, extractor: CurrencyExtractor = None, dias_por_shard: int = BACKFILL_DIAS_POR_SHARD,
+                 checkpoint_path: str = None):
+
+        """
+        Motor de backfill de historia profunda. El rango de fechas de cada par se
+        divide en shards (par, ventana de días) que entran en una sola llamada a la
+        API; los shards se descargan en paralelo con la sesión, el rate limit y los
+        reintentos del extractor, y sus registros se fusionan en bronze sin duplicar.
+
+        Cada shard terminado queda en un checkpoint en disco: si el proceso se corta,
+        la próxima ejecución solo descarga los shards pendientes.
+
+        Parameters:
+        - extractor (CurrencyExtractor): define URLs, concurrencia, rate limit y formato bronze.
+        - dias_por_shard (int): días por llamada (debe respetar el límite de registros de la API).
+        - checkpoint_path (str): archivo JSON de shards completados.
+        """
+
+        self.extractor = extractor or CurrencyExtractor()
+
+        self.dias_por_shard = max(1, int(dias_por_shard))
+
+        self.checkpoint_path = checkpoint_path or os.path.abspath(
+            os.path.join(os.path.dirname(__file__), "../../../data/o1_backfill/checkpoint.json")
+        )
+
+        os.makedirs(os.path.dirname(self.checkpoint_path), exist_ok=True)
+
+        self._lock_checkpoint = threading.Lock()
+
+
+
+
+    def planificar(self, pares: list, desde: str, hasta: str = None) -> list:
+
+        """
+        Divide [desde, hasta] ("YYYY-MM-DD", inclusivo; hasta = hoy por defecto)
+        en shards de dias_por_shard días por par, del más reciente al más antiguo.
+        """
+
+        inicio = datetime.strptime(desde, "%Y-%m-%d").date()
+
+        fin = datetime.strptime(hasta, "%Y-%m-%d").date() if hasta else datetime.now(timezone.utc).date()
+
+        if inicio > fin:
+            raise ValueError(f"Rango de fechas inválido: {desde} > {hasta}")
+
+        shards = []
+
+        for pair in pares:
+
+            fin_shard = fin
+
+            while fin_shard >= inicio:
+
+                inicio_shard = max(inicio, fin_shard - timedelta(days=self.dias_por_shard - 1))
+
+                shards.append({"pair": pair, "inicio": inicio_shard, "fin": fin_shard})
+
+                fin_shard = inicio_shard - timedelta(days=1)
+
+        return shards
+
+
+
+
+    def ejecutar(self, desde: str, hasta: str = None, pares: list = None) -> str:
+
+        """
+        Ejecuta el backfill salteando los shards del checkpoint cuyos registros
+        siguen en bronze (ver _completados_en_bronze).
+        """
+
+        logger = setup_logger("o1_extraction_logs/backfill.log")
+
+        if pares is None:
+            pares = self.extractor.get_currency_pairs_brl()
+
+        shards = self.planificar(pares, desde, hasta)
+
+        completados = self._completados_en_bronze(shards, self._leer_checkpoint(), logger)
+
+        pendientes = [s for s in shards if self._id_shard(s) not in completados]
+
+        logger.info(
+            f"INICIO backfill {desde} → {hasta or 'hoy'}: {len(pares)} pares, {len(shards)} shards, "
+            f"{len(shards) - len(pendientes)} ya completados."
+        )
+
+        errores = []
+
+        with ThreadPoolExecutor(max_workers=self.extractor.max_en_vuelo) as executor:
+
+            futuros = {executor.submit(self._descargar_shard_seguro, shard, logger): shard for shard in pendientes}
+
+            for futuro in as_completed(futuros):
+
+                if not futuro.result():
+                    errores.append(self._id_shard(futuros[futuro]))
+
+        logger.info(f"Latencias HTTP: {self.extractor.http.resumen_latencias()}")
+
+        if errores:
+
+            logger.warning(f"⚠️ Shards con error (se reintentan en la próxima ejecución): {sorted(errores)}")
+
+            return f"FIN backfill. ❌ Error: Fallaron {len(errores)} de {len(pendientes)} shards pendientes."
+
+        return f"FIN backfill. ✅ {len(pendientes)} shards descargados ({len(shards)} en total)."
+
+
+
+
+    def descargar_shard(self, shard: dict) -> int:
+
+        """
+        Descarga un shard, lo fusiona con el archivo bronze del par (los registros
+        solapados se deduplican por timestamp) y lo marca como completado.
+        El checkpoint se escribe después de bronze: si el proceso se corta entre
+        ambos pasos, el shard se vuelve a bajar y la fusión es idempotente.
+        Devuelve la cantidad de registros recibidos.
+        """
+
+        pair = shard["pair"]
+
+        dias = (shard["fin"] - shard["inicio"]).days + 1
+
+        url = (
+            f"{self.extractor.base_url}/{pair}/{dias}"
+            f"?start_date={shard['inicio']:%Y%m%d}&end_date={shard['fin']:%Y%m%d}"
+        )
+
+        response = self.extractor.http.get(url)
+
+        if response.status_code != 200:
+            raise RuntimeError(f"Error {response.status_code} al descargar {self._id_shard(shard)}")
+
+        registros = response.json()
+
+        if not isinstance(registros, list):
+            raise ValueError(f"Respuesta inesperada para {self._id_shard(shard)}: {type(registros).__name__}")
+
+        if registros:
+
+            output_path = ruta_bronze(self.extractor.bronze_path, pair, self.extractor.formato_bronze)
+
+            # Los shards del par y la extracción diaria escriben el mismo archivo: se serializa la fusión
+            with lock_bronze(output_path):
+
+                existentes = leer_payload(output_path)
+
+                fusionados = fusionar_registros(existentes, registros)
+
+                if fusionados != existentes:
+                    escribir_payload(output_path, fusionados)
+
+        self._marcar_completado(shard, len(registros))
+
+        return len(registros)
+
+
+
+
+    def _completados_en_bronze(self, shards: list, checkpoint: dict, logger) -> set:
+
+        """
+        Ids de los shards del checkpoint que siguen presentes en bronze: el archivo
+        del par tiene al menos tantos registros en el rango del shard como los que
+        se descargaron (con un día de tolerancia por zona horaria). Si bronze se
+        borró o se reescribió sin esa historia, el shard vuelve a quedar pendiente.
+        Cada archivo se recorre una sola vez y en streaming (solo timestamps).
+        """
+
+        por_par = {}
+
+        for shard in shards:
+
+            if self._id_shard(shard) in checkpoint:
+                por_par.setdefault(shard["pair"], []).append(shard)
+
+        completados = set()
+
+        for pair, del_par in por_par.items():
+
+            path = ruta_bronze(self.extractor.bronze_path, pair, self.extractor.formato_bronze)
+
+            timestamps = []
+
+            try:
+                if os.path.isfile(path):
+                    timestamps = sorted(int(r["timestamp"]) for r in iterar_registros(path) if "timestamp" in r)
+
+            except (OSError, ValueError, EOFError, KeyError, TypeError):
+                timestamps = []
+
+            for shard in del_par:
+
+                id_shard = self._id_shard(shard)
+
+                desde = datetime.combine(shard["inicio"] - timedelta(days=1), datetime.min.time(), timezone.utc)
+
+                hasta = datetime.combine(shard["fin"] + timedelta(days=2), datetime.min.time(), timezone.utc)
+
+                en_bronze = bisect.bisect_left(timestamps, hasta.timestamp()) - bisect.bisect_left(timestamps, desde.timestamp())
+
+                if en_bronze >= checkpoint[id_shard].get("registros", 0):
+                    completados.add(id_shard)
+
+                else:
+                    logger.warning(f"⚠️ Shard {id_shard} figura completado pero no está en bronze: se vuelve a descargar.")
+
+        return completados
+
+
+
+
+    def _descargar_shard_seguro(self, shard: dict, logger) -> bool:
+
+        try:
+            n = self.descargar_shard(shard)
+
+            logger.info(f"✅ Shard {self._id_shard(shard)}: {n} registros.")
+
+            return True
+
+        except Exception as e:
+
+            logger.error(f"❌ Shard {self._id_shard(shard)}: {e}")
+
+            return False
+
+
+
+
+    def _id_shard(self, shard: dict) -> str:
+
+        return f"{shard['pair']}:{shard['inicio']:%Y%m%d}-{shard['fin']:%Y%m%d}"
+
+
+
+
+    def _leer_checkpoint(self) -> dict:
+
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        except (OSError, ValueError):
+            return {}
+
+
+
+
+    def _marcar_completado(self, shard: dict, registros: int):
+
+        with self._lock_checkpoint:
+
+            completados = self._leer_checkpoint()
+
+            completados[self._id_shard(shard)] = {"registros": registros, "fecha": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+            # Temporal único: otro proceso de backfill con el mismo checkpoint no pisa este archivo
+            descriptor, tmp_path = tempfile.mkstemp(prefix=".checkpoint_", suffix=".tmp",
+                                                    dir=os.path.dirname(self.checkpoint_path))
+
+            try:
+                with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+                    json.dump(completados, f, indent=2, ensure_ascii=False)
+
+                os.replace(tmp_path, self.checkpoint_path)
+
+            except BaseException:
+
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+                raise
@@ -0,0 +1,229 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+
+
+
+class RespuestaCacheada:
+
+
+
+    def __init__(self, url: str, content: bytes, headers: dict = None, desde_cache: bool = True):
+
+        """
+        Respuesta armada a partir de la caché local. Expone la misma interfaz
+        mínima que usa el extractor de requests.Response (status_code, json, content).
+        """
+
+        self.url = url
+
+        self.status_code = 200
+
+        self.content = content
+
+        self.headers = headers or {}
+
+        self.desde_cache = desde_cache
+
+        self.sin_cambios = True
+
+
+
+    def json(self):
+
+        return json.loads(self.content)
+
+
+
+    def close(self):
+
+        pass
+
+
+
+
+class HttpCache:
+
+
+
+    def __init__(self, cache_path: str, ttl_segundos: float = 3600):
+
+        """
+        Caché HTTP en disco indexada por URL:
+        - index.json guarda ETag, Last-Modified, fecha de descarga y hash del contenido
+        - el cuerpo de cada respuesta se guarda en un archivo aparte
+        - una entrada con menos de ttl_segundos se sirve sin consultar la API
+        """
+
+        self.cache_path = cache_path
+
+        self.ttl_segundos = ttl_segundos
+
+        self.index_path = os.path.join(cache_path, "index.json")
+
+        os.makedirs(cache_path, exist_ok=True)
+
+        self._lock = threading.Lock()
+
+        self._index = self._leer_index()
+
+
+
+
+    def buscar(self, url: str):
+
+        """
+        Devuelve la entrada del índice para la URL si su cuerpo sigue en disco.
+        """
+
+        with self._lock:
+            entrada = self._index.get(url)
+
+        if entrada and os.path.isfile(self._ruta_cuerpo(url)):
+            return entrada
+
+        return None
+
+
+
+    def esta_fresca(self, entrada: dict) -> bool:
+
+        return entrada is not None and (time.time() - entrada["fecha"]) < self.ttl_segundos
+
+
+
+    def headers_condicionales(self, entrada: dict) -> dict:
+
+        """
+        Headers para revalidar una entrada vencida (If-None-Match / If-Modified-Since).
+        """
+
+        headers = {}
+
+        if entrada and entrada.get("etag"):
+            headers["If-None-Match"] = entrada["etag"]
+
+        if entrada and entrada.get("last_modified"):
+            headers["If-Modified-Since"] = entrada["last_modified"]
+
+        return headers
+
+
+
+    def leer_cuerpo(self, url: str) -> bytes:
+
+        with open(self._ruta_cuerpo(url), "rb") as f:
+            return f.read()
+
+
+
+
+    def es_igual(self, entrada: dict, content: bytes) -> bool:
+
+        """
+        True si el cuerpo recibido es idéntico al de la entrada cacheada.
+        """
+
+        return entrada is not None and entrada.get("sha256") == hashlib.sha256(content).hexdigest()
+
+
+
+
+    def guardar(self, url: str, response, bronze_sha256: str = None) -> bool:
+
+        """
+        Guarda una respuesta 200 en la caché, junto con el hash del archivo bronze
+        que se escribió a partir de ella. Se llama solo después de escribir bronze,
+        así la caché nunca describe un contenido que no llegó a disco.
+        Devuelve True si el contenido cambió respecto de la versión anterior.
+        """
+
+        sha256 = hashlib.sha256(response.content).hexdigest()
+
+        anterior = self.buscar(url)
+
+        cambio = anterior is None or anterior.get("sha256") != sha256
+
+        if cambio:
+
+            tmp_path = f"{self._ruta_cuerpo(url)}.tmp"
+
+            with open(tmp_path, "wb") as f:
+                f.write(response.content)
+
+            os.replace(tmp_path, self._ruta_cuerpo(url))
+
+        self._actualizar(url, {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fecha": time.time(),
+            "sha256": sha256,
+            "bronze_sha256": bronze_sha256,
+        })
+
+        return cambio
+
+
+
+
+    def registrar_bronze(self, url: str, bronze_sha256: str):
+
+        """
+        Actualiza el hash de bronze de una entrada servida desde la caché
+        (sin tocar su fecha, para no extender el TTL).
+        """
+
+        entrada = self.buscar(url)
+
+        if entrada:
+            self._actualizar(url, {**entrada, "bronze_sha256": bronze_sha256})
+
+
+
+
+    def refrescar(self, url: str):
+
+        """
+        Renueva la fecha de una entrada revalidada con un 304.
+        """
+
+        entrada = self.buscar(url)
+
+        if entrada:
+            self._actualizar(url, {**entrada, "fecha": time.time()})
+
+
+
+
+    def _actualizar(self, url: str, entrada: dict):
+
+        with self._lock:
+
+            self._index[url] = entrada
+
+            tmp_path = f"{self.index_path}.tmp"
+
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._index, f, ensure_ascii=False)
+
+            os.replace(tmp_path, self.index_path)
+
+
+
+    def _leer_index(self) -> dict:
+
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        except (OSError, ValueError):
+            return {}
+
+
+
+    def _ruta_cuerpo(self, url: str) -> str:
+
+        return os.path.join(self.cache_path, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".body")
@@ -0,0 +1,276 @@
+import os
+import time
+import random
+import threading
+import requests
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from requests.adapters import HTTPAdapter
+from meli_project.logic.o1_extraction.http_cache import HttpCache, RespuestaCacheada
+from meli_project.logic.o1_extraction.rate_limiter import RateLimiterPorHost
+from meli_project.logic.utils.manifiesto import hash_ruta
+from meli_project.logic.utils.metricas import METRICAS
+from meli_project.logic.utils.utils import *
+from meli_project.params import *
+
+
+
+
+# Códigos que se consideran transitorios y se reintentan
+STATUS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+
+
+
+class HttpClient:
+
+
+
+    def __init__(self, max_conexiones: int = EXTRACCION_MAX_EN_VUELO,
+                 timeout_conexion: float = HTTP_TIMEOUT_CONEXION,
+                 timeout_lectura: float = HTTP_TIMEOUT_LECTURA,
+                 max_reintentos: int = HTTP_MAX_REINTENTOS,
+                 backoff_base: float = HTTP_BACKOFF_BASE,
+                 backoff_max: float = HTTP_BACKOFF_MAX,
+                 rate_limiter: RateLimiterPorHost = None,
+                 cache: HttpCache = None):
+
+        """
+        Cliente HTTP compartido por el extractor:
+        - Sesión única con pool de conexiones keep-alive (sin un TCP+TLS nuevo por par)
+        - Timeouts de conexión y lectura configurables
+        - Reintentos con backoff exponencial + jitter ante 429/5xx, respetando Retry-After
+        - Registro de la latencia de cada request
+        - Caché opcional en disco con TTL y revalidación ETag/Last-Modified
+        """
+
+        self.timeout = (timeout_conexion, timeout_lectura)
+
+        self.max_reintentos = max_reintentos
+
+        self.backoff_base = backoff_base
+
+        self.backoff_max = backoff_max
+
+        self.rate_limiter = rate_limiter or RateLimiterPorHost(0)
+
+        self.cache = cache
+
+        self.session = requests.Session()
+
+        adapter = HTTPAdapter(pool_connections=max_conexiones, pool_maxsize=max_conexiones)
+
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.session.headers.update({"Accept": "application/json"})
+
+        if API_KEY_AWESOME:
+            self.session.headers.update({"x-api-key": API_KEY_AWESOME})
+
+        self.latencias = []
+
+        self._lock = threading.Lock()
+
+
+
+
+    def get(self, url: str, **kwargs):
+
+        """
+        Ejecuta un GET (con caché si está configurada). La respuesta lleva el
+        atributo sin_cambios=True cuando el contenido es idéntico al ya cacheado.
+
+        Una respuesta 200 nueva no se guarda en la caché acá: quien la persiste
+        llama a confirmar() después de escribir bronze.
+        """
+
+        if self.cache is None:
+            return self._get_con_reintentos(url, **kwargs)
+
+        entrada = self.cache.buscar(url)
+
+        if self.cache.esta_fresca(entrada):
+            return RespuestaCacheada(url, self.cache.leer_cuerpo(url))
+
+        headers = {**kwargs.pop("headers", {}), **self.cache.headers_condicionales(entrada)}
+
+        response = self._get_con_reintentos(url, headers=headers, **kwargs)
+
+        if response.status_code == 304 and entrada:
+
+            self.cache.refrescar(url)
+
+            return RespuestaCacheada(url, self.cache.leer_cuerpo(url), dict(response.headers), desde_cache=False)
+
+        if response.status_code == 200:
+            response.sin_cambios = self.cache.es_igual(entrada, response.content)
+
+        return response
+
+
+
+
+    def bronze_vigente(self, url: str, response, path: str) -> bool:
+
+        """
+        True si la respuesta no cambió respecto de la caché y el archivo bronze
+        es exactamente el que se escribió a partir de ella (mismo hash). Si bronze
+        falta, cambió o quedó a medias, hay que volver a escribirlo.
+        """
+
+        if self.cache is None or not getattr(response, "sin_cambios", False) or not os.path.isfile(path):
+            return False
+
+        entrada = self.cache.buscar(url)
+
+        return entrada is not None and entrada.get("bronze_sha256") == hash_ruta(path)
+
+
+
+
+    def confirmar(self, url: str, response, path: str):
+
+        """
+        Registra en la caché una respuesta ya persistida en bronze, con el hash
+        del archivo escrito. Con path=None (respuestas que no van a bronze, como
+        /json/available) se cachea solo el cuerpo.
+        """
+
+        if self.cache is None or response.status_code != 200:
+            return
+
+        if isinstance(response, RespuestaCacheada):
+
+            if path is not None:
+                self.cache.registrar_bronze(url, hash_ruta(path))
+
+        else:
+            self.cache.guardar(url, response, bronze_sha256=hash_ruta(path) if path is not None else None)
+
+
+
+
+    def _get_con_reintentos(self, url: str, **kwargs) -> requests.Response:
+
+        """
+        Ejecuta un GET con reintentos. Devuelve la última respuesta obtenida
+        (aunque sea un error no reintentable) o relanza la última excepción de red.
+        """
+
+        logger = setup_logger("o1_extraction_logs/http_client.log")
+
+        kwargs.setdefault("timeout", self.timeout)
+
+        for intento in range(self.max_reintentos + 1):
+
+            self.rate_limiter.esperar(url)
+
+            inicio = time.perf_counter()
+
+            try:
+                response = self.session.get(url, **kwargs)
+
+            except (requests.ConnectionError, requests.Timeout) as e:
+
+                self._registrar_latencia(url, None, time.perf_counter() - inicio, intento)
+
+                if intento >= self.max_reintentos:
+                    raise
+
+                espera = self._calcular_espera(intento)
+
+                logger.warning(f"⚠️ {type(e).__name__} en {url}. Reintento {intento + 1} en {espera:.2f}s")
+
+                time.sleep(espera)
+
+                continue
+
+            self._registrar_latencia(url, response.status_code, time.perf_counter() - inicio, intento)
+
+            if response.status_code not in STATUS_REINTENTABLES or intento >= self.max_reintentos:
+                return response
+
+            espera = self._calcular_espera(intento, response.headers.get("Retry-After"))
+
+            logger.warning(f"⚠️ Status {response.status_code} en {url}. Reintento {intento + 1} en {espera:.2f}s")
+
+            response.close()
+
+            time.sleep(espera)
+
+
+
+
+    def resumen_latencias(self) -> dict:
+
+        """
+        Devuelve un resumen de las latencias registradas (en segundos).
+        """
+
+        with self._lock:
+            valores = sorted(r["segundos"] for r in self.latencias)
+
+        if not valores:
+            return {"requests": 0}
+
+        return {
+            "requests": len(valores),
+            "total": round(sum(valores), 4),
+            "p50": round(valores[len(valores) // 2], 4),
+            "p95": round(valores[min(len(valores) - 1, int(len(valores) * 0.95))], 4),
+            "max": round(valores[-1], 4),
+        }
+
+
+
+
+    def cerrar(self):
+
+        """
+        Cierra la sesión y libera las conexiones del pool.
+        """
+
+        self.session.close()
+
+
+
+
+    def _registrar_latencia(self, url: str, status, segundos: float, intento: int):
+
+        with self._lock:
+            self.latencias.append({"url": url, "status": status, "segundos": segundos, "intento": intento})
+
+        METRICAS.sumar("extraccion", "http_intentos", 1)
+
+        if intento:
+            METRICAS.sumar("extraccion", "http_reintentos", 1)
+
+
+
+
+    def _calcular_espera(self, intento: int, retry_after: str = None) -> float:
+
+        """
+        Backoff exponencial con jitter completo. Si el servidor envía Retry-After
+        (en segundos o como fecha HTTP) se usa ese valor como mínimo.
+        """
+
+        espera = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** intento)))
+
+        if retry_after:
+
+            try:
+                minimo = float(retry_after)
+
+            except ValueError:
+
+                try:
+                    minimo = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+
+                except (TypeError, ValueError):
+                    minimo = 0.0
+
+            espera = max(espera, min(minimo, self.backoff_max))
+
+        return max(espera, 0.0)
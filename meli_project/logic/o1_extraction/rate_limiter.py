@@ -0,0 +1,53 @@
+import time
+import threading
+from urllib.parse import urlparse
+
+
+
+
+class RateLimiterPorHost:
+
+
+
+    def __init__(self, requests_por_segundo: float = 5.0):
+
+        """
+        Limitador de requests por host (token bucket simple).
+        Garantiza un intervalo mínimo entre requests al mismo host,
+        aunque las descargas se ejecuten en varios hilos.
+        """
+
+        self.requests_por_segundo = requests_por_segundo
+
+        self.intervalo = 1.0 / requests_por_segundo if requests_por_segundo and requests_por_segundo > 0 else 0.0
+
+        self._proximo_turno = {}
+
+        self._lock = threading.Lock()
+
+
+
+
+    def esperar(self, url: str):
+
+        """
+        Bloquea el hilo actual hasta que el host de la URL tenga un turno libre.
+        """
+
+        if self.intervalo <= 0:
+            return
+
+        host = urlparse(url).netloc
+
+        with self._lock:
+
+            ahora = time.monotonic()
+
+            turno = max(ahora, self._proximo_turno.get(host, ahora))
+
+            self._proximo_turno[host] = turno + self.intervalo
+
+        espera = turno - time.monotonic()
+
+        if espera > 0:
+            time.sleep(espera)
@@ -1,7 +1,15 @@
 import os
-import json
+import multiprocessing
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from meli_project.logic.utils.bronze import listar_archivos_bronze, iterar_registros, leer_registros, par_desde_archivo
+from meli_project.logic.utils.esquemas import BRONZE_ARROW_SCHEMA
+from meli_project.logic.utils.metricas import METRICAS
 from meli_project.logic.utils.utils import *
+from meli_project.params import *
 
 
 
@@ -10,12 +18,17 @@ class DFsCurrencies:
 
 
 
-    def __init__(self):
+    def __init__(self, n_workers: int = LIMPIEZA_N_WORKERS):
 
         """
         Define la ruta a la capa bronze donde se encuentran los JSONs.
+
+        Parameters:
+        - n_workers (int): procesos para convertir los JSON en paralelo (1 = secuencial).
         """
 
+        self.n_workers = max(1, int(n_workers))
+
         self.bronze_path = os.path.abspath(
             os.path.join(os.path.dirname(__file__), "../../../data/o1_bronze")
         )
@@ -25,7 +38,9 @@ class DFsCurrencies:
     def listar_jsons_validos(self):
 
         """
-        Lista todos los archivos .json válidos en la carpeta bronze.
+        Lista todos los archivos bronze válidos (.json o .jsonl.gz) en la carpeta bronze.
+        En ambos formatos alcanza con decodificar el primer registro para validarlo
+        (iterar_registros lee en streaming, sin cargar el archivo completo).
         """
 
         logger = setup_logger('o3_transformation_logs/listar_jsons_validos.log')
@@ -34,27 +49,24 @@ class DFsCurrencies:
 
         archivos_validos = []
 
-        for file in os.listdir(self.bronze_path):
-
-            if file.endswith(".json"):
+        for full_path in listar_archivos_bronze(self.bronze_path):
 
-                full_path = os.path.join(self.bronze_path, file)
+            file = os.path.basename(full_path)
 
-                try:
+            try:
 
-                    with open(full_path, "r", encoding="utf-8") as f:
-                        data = json.load(f)
+                primeros = list(islice(iterar_registros(full_path), 1))
 
-                        if isinstance(data, list) and len(data) > 0:
-                            archivos_validos.append(full_path)
-                            logger.info(f"FIN listado. ✅ {file} es válido.")
+                if len(primeros) > 0:
+                    archivos_validos.append(full_path)
+                    logger.info(f"FIN listado. ✅ {file} es válido.")
 
-                        else:
+                else:
 
-                            logger.warning(f"FIN listado. ⚠️ {file} no contiene una lista o está vacío.")
+                    logger.warning(f"FIN listado. ⚠️ {file} no contiene una lista o está vacío.")
 
-                except Exception as e:
-                    logger.error(f"FIN listado. ❌ Error al procesar {file}: {e}")
+            except Exception as e:
+                logger.error(f"FIN listado. ❌ Error al procesar {file}: {e}")
 
         return archivos_validos
 
@@ -63,28 +75,27 @@ class DFsCurrencies:
     def convertir_json_a_df(self, json_path: str) -> pd.DataFrame:
 
         """
-        Convierte un archivo JSON individual en un DataFrame normalizado.
+        Convierte un archivo bronze individual (.json o .jsonl.gz) en un DataFrame normalizado.
         """
 
-        logger = setup_logger("o3_transformation_logs/convertir_json_a_df.log")
-
         file_name = os.path.basename(json_path)
 
+        logger = setup_logger("o3_transformation_logs/convertir_json_a_df.log", pair=par_desde_archivo(file_name))
+
         logger.info(f"INICIO proceso {file_name}")
 
         try:
-            with open(json_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            registros = iter(leer_registros(json_path))
+
+            header = next(registros, None)  # contiene code, codein, name, create_date, etc.
 
-            if not isinstance(data, list) or len(data) == 0:
+            if not isinstance(header, dict):
                 logger.warning(f"FIN proceso. ⚠️ {file_name} vacío o no es lista.")
                 return pd.DataFrame()
 
-            pair = file_name.replace(".json", "")
+            pair = par_desde_archivo(file_name)
 
-            header = data[0]  # contiene code, codein, name, create_date, etc.
-
-            rows = data[1:] if len(data) > 1 else []
+            rows = list(registros)
 
             # Normalizamos los valores históricos
             df = pd.DataFrame(rows)
@@ -97,6 +108,10 @@ class DFsCurrencies:
             df["create_date"] = header.get("create_date")
             df["source_file"] = file_name
 
+            METRICAS.sumar("limpieza", "bytes_leidos", os.path.getsize(json_path), pair)
+
+            METRICAS.sumar("limpieza", "filas_salida", len(df), pair)
+
             logger.info(f"FIN proceso. ✅ {file_name} convertido con {len(df)} registros.")
             return df
 
@@ -107,27 +122,304 @@ class DFsCurrencies:
 
 
 
-    def obtener_df_unificado(self):
+    def obtener_df_unificado(self, precargados: dict = None):
 
         """
         Convierte todos los JSONs válidos en un único DataFrame consolidado.
+        Cada archivo se lee y valida una sola vez (convertir_json_a_df descarta
+        los vacíos o inválidos) y los DataFrames se unen con un único concat.
+
+        Parameters:
+        - precargados (dict): {path: DataFrame} ya convertidos (ej. mientras se
+          descargaban); solo se convierten los archivos que no estén en el dict.
         """
 
         logger = setup_logger("o3_transformation_logs/unificar_todo_df.log")
 
         logger.info("INICIANDO proceso de unificación")
 
-        archivos = self.listar_jsons_validos()
+        archivos = listar_archivos_bronze(self.bronze_path)
+
+        precargados = precargados or {}
+
+        restantes = [path for path in archivos if path not in precargados]
+
+        if self.n_workers > 1 and len(restantes) > 1:
 
-        df_final = pd.DataFrame()
+            convertidos = dict(zip(restantes, self._convertir_en_paralelo(restantes)))
 
-        for path in archivos:
+        else:
 
-            df = self.convertir_json_a_df(path)
+            convertidos = {path: self.convertir_json_a_df(path) for path in restantes}
 
-            if not df.empty:
-                df_final = pd.concat([df_final, df], ignore_index=True)
+        dfs = [precargados[path] if path in precargados else convertidos[path] for path in archivos]
+
+        dfs = [df for df in dfs if not df.empty]
+
+        df_final = pd.concat(dfs, ignore_index=True) if dfs else pd.DataFrame()
 
         logger.info(f"FIN proceso. ✅ Unificación finalizada. Total de registros: {len(df_final)}")
 
         return df_final
+
+
+
+
+    def convertir_json_a_arrow(self, json_path: str) -> pa.RecordBatch:
+
+        """
+        Convierte un archivo bronze directamente a un RecordBatch de Arrow con
+        el esquema BRONZE_ARROW_SCHEMA (sin pasar por objetos de pandas).
+        Igual que convertir_json_a_df, el primer registro solo aporta la cabecera.
+        """
+
+        logger = setup_logger("o3_transformation_logs/convertir_json_a_arrow.log")
+
+        file_name = os.path.basename(json_path)
+
+        try:
+            registros = iter(leer_registros(json_path))
+
+            header = next(registros, None)
+
+            if not isinstance(header, dict):
+                logger.warning(f"FIN proceso. ⚠️ {file_name} vacío o no es lista.")
+                return None
+
+            batch = _lote_arrow(header, registros)
+
+            if batch is None:
+                return None
+
+            n = batch.num_rows
+
+            logger.info(f"FIN proceso. ✅ {file_name} convertido con {n} registros.")
+
+            return batch
+
+        except Exception as e:
+            logger.error(f"FIN proceso. ❌ Error procesando {file_name}: {e}")
+            return None
+
+
+
+
+    def obtener_tabla_arrow(self) -> pa.Table:
+
+        """
+        Camino Arrow nativo: lee todos los archivos bronze en una única pa.Table
+        con esquema explícito (float64 bid/ask, int64 timestamp, códigos de moneda
+        codificados como diccionario).
+        """
+
+        logger = setup_logger("o3_transformation_logs/unificar_todo_df.log")
+
+        logger.info("INICIANDO proceso de unificación (Arrow)")
+
+        batches = []
+
+        for path in listar_archivos_bronze(self.bronze_path):
+
+            batch = self.convertir_json_a_arrow(path)
+
+            if batch is not None:
+                batches.append(batch)
+
+        tabla = pa.Table.from_batches(batches, schema=BRONZE_ARROW_SCHEMA)
+
+        logger.info(f"FIN proceso. ✅ Unificación Arrow finalizada. Total de registros: {tabla.num_rows}")
+
+        return tabla
+
+
+
+
+    def iterar_lotes_arrow(self, filas_por_lote: int = STREAMING_FILAS_POR_LOTE):
+
+        """
+        Modo streaming: recorre bronze archivo por archivo y devuelve un generador
+        de RecordBatches (BRONZE_ARROW_SCHEMA) de a lo sumo filas_por_lote filas.
+        Nunca hay más de un lote en memoria, así que el consumo no depende del
+        tamaño total de la historia (en .jsonl.gz tampoco del tamaño de cada archivo).
+        """
+
+        logger = setup_logger("o3_transformation_logs/convertir_json_a_arrow.log")
+
+        total = 0
+
+        for path in listar_archivos_bronze(self.bronze_path):
+
+            file_name = os.path.basename(path)
+
+            try:
+                registros = iterar_registros(path)
+
+                header = next(registros, None)
+
+                if not isinstance(header, dict):
+                    logger.warning(f"FIN proceso. ⚠️ {file_name} vacío o no es lista.")
+                    continue
+
+                filas = 0
+
+                while True:
+
+                    batch = _lote_arrow(header, islice(registros, filas_por_lote))
+
+                    if batch is None:
+                        break
+
+                    filas += batch.num_rows
+
+                    yield batch
+
+                total += filas
+
+                logger.info(f"FIN proceso. ✅ {file_name} convertido en streaming con {filas} registros.")
+
+            except Exception as e:
+                logger.error(f"FIN proceso. ❌ Error procesando {file_name}: {e}")
+
+        logger.info(f"FIN streaming bronze. ✅ Total de registros: {total}")
+
+
+
+
+    def _convertir_en_paralelo(self, archivos: list) -> list:
+
+        """
+        Reparte la conversión de los archivos entre un pool de procesos.
+        Cada worker devuelve su DataFrame serializado como stream Arrow IPC,
+        que el proceso padre vuelve a convertir a pandas (respetando el orden),
+        y los contadores de métricas del archivo, que se suman a METRICAS.
+
+        Los workers arrancan con forkserver (spawn donde no existe): un fork
+        del proceso padre, que ya tiene hilos (descargas, logging), puede
+        heredar locks tomados y colgarse.
+        """
+
+        logger = setup_logger("o3_transformation_logs/unificar_todo_df.log")
+
+        logger.info(f"Conversión en paralelo con {self.n_workers} procesos ({len(archivos)} archivos).")
+
+        chunksize = max(1, len(archivos) // (self.n_workers * 4))
+
+        metodo = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+        with ProcessPoolExecutor(max_workers=self.n_workers, mp_context=multiprocessing.get_context(metodo)) as executor:
+
+            resultados = list(executor.map(_convertir_archivo_a_arrow, archivos, chunksize=chunksize))
+
+        for _, contadores in resultados:
+            METRICAS.sumar_contadores(contadores)
+
+        return [_arrow_a_df(chunk) for chunk, _ in resultados]
+
+
+
+
+def _convertir_archivo_a_arrow(json_path: str) -> tuple:
+
+    """
+    Worker de proceso: convierte un archivo bronze y lo devuelve como bytes Arrow IPC
+    (None si está vacío o falla, como en el camino secuencial), junto con los
+    contadores de METRICAS que sumó la conversión en este proceso.
+    """
+
+    # Los contadores de este proceso se devuelven por archivo: se descarta lo anterior
+    METRICAS.extraer_contadores()
+
+    try:
+        df = DFsCurrencies(n_workers=1).convertir_json_a_df(json_path)
+
+        if df.empty:
+            return None, METRICAS.extraer_contadores()
+
+        tabla = pa.Table.from_pandas(df, preserve_index=False)
+
+        sink = pa.BufferOutputStream()
+
+        with pa.ipc.new_stream(sink, tabla.schema) as writer:
+            writer.write_table(tabla)
+
+        return sink.getvalue().to_pybytes(), METRICAS.extraer_contadores()
+
+    except Exception as e:
+
+        logger = setup_logger("o3_transformation_logs/convertir_json_a_df.log")
+
+        logger.error(f"FIN proceso. ❌ Error serializando {os.path.basename(json_path)}: {e}")
+
+        # El archivo no llega al padre: tampoco sus contadores
+        METRICAS.extraer_contadores()
+
+        return None, {"etapas": {}, "pares": {}}
+
+
+
+
+def _arrow_a_df(chunk: bytes) -> pd.DataFrame:
+
+    if chunk is None:
+        return pd.DataFrame()
+
+    return pa.ipc.open_stream(chunk).read_all().to_pandas()
+
+
+
+
+def _lote_arrow(header: dict, registros) -> pa.RecordBatch:
+
+    """
+    Arma un RecordBatch con BRONZE_ARROW_SCHEMA a partir de la cabecera del
+    payload y de los registros históricos. None si no hay registros.
+    """
+
+    columnas = {"bid": [], "ask": [], "timestamp": []}
+
+    for registro in registros:
+
+        for columna, valores in columnas.items():
+            valores.append(registro.get(columna))
+
+    n = len(columnas["timestamp"])
+
+    if n == 0:
+        return None
+
+    return pa.RecordBatch.from_arrays([
+        pa.repeat(pa.scalar(header.get("code"), pa.string()), n).dictionary_encode(),
+        pa.repeat(pa.scalar(header.get("codein"), pa.string()), n).dictionary_encode(),
+        _columna_numerica(columnas["bid"], pa.float64()),
+        _columna_numerica(columnas["ask"], pa.float64()),
+        _columna_numerica(columnas["timestamp"], pa.int64()),
+    ], schema=BRONZE_ARROW_SCHEMA)
+
+
+
+
+def _columna_numerica(valores: list, tipo: pa.DataType) -> pa.Array:
+
+    """
+    Convierte los valores crudos (strings numéricos de la API) al tipo indicado.
+    Si alguno no es numérico se convierte en nulo, como pd.to_numeric(errors="coerce").
+    """
+
+    try:
+        return pc.cast(pa.array(valores), tipo)
+
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+
+        coercionados = []
+
+        for valor in valores:
+
+            try:
+                numero = float(valor)
+
+                coercionados.append(int(numero) if pa.types.is_integer(tipo) else numero)
+
+            except (TypeError, ValueError, OverflowError):
+                coercionados.append(None)
+
+        return pa.array(coercionados, tipo)
@@ -0,0 +1,726 @@
+import os
+import json
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from meli_project.params import *
+
+
+
+
+# Reglas por fila: cada una es un bit de la máscara de motivos
+REGLAS_CALIDAD = {
+    "valor_invalido": 1,        # compra o venta nula, NaN o <= 0, o fecha nula
+    "duplicado": 2,             # (par, date_time) repetido: se conserva la primera aparición
+    "venta_menor_compra": 4,    # ask < bid
+    "outlier": 8,               # desvío del valor medio contra la mediana móvil del par
+}
+
+
+CLAVES_PAR = ["base_currency", "destination_currency"]
+
+
+# Máximo de huecos detallados en el reporte (el total se informa siempre)
+MAX_HUECOS_REPORTE = 500
+
+
+# Origen de cada fila en la ventana de outliers (ver ControlCalidad._outliers)
+_CONTEXTO, _NUEVA, _PENDIENTE = 0, 1, 2
+
+
+_DIA_NS = 86_400 * 10 ** 9
+
+
+
+
+def _reglas_por_fila(df: pd.DataFrame) -> np.ndarray:
+
+    """
+    Máscara de las reglas que se deciden sin mirar otras cotizaciones del par
+    (los duplicados, solo dentro del df).
+    """
+
+    compra = df["purchase_value"].to_numpy(dtype="float64", na_value=np.nan)
+
+    venta = df["sale_value"].to_numpy(dtype="float64", na_value=np.nan)
+
+    motivos = np.zeros(len(df), dtype=np.int8)
+
+    # Las comparaciones con NaN dan False, así que los nulos también quedan marcados
+    motivos[~(compra > 0) | ~(venta > 0) | df["date_time"].isna().to_numpy()] |= REGLAS_CALIDAD["valor_invalido"]
+
+    motivos[df.duplicated(CLAVES_PAR + ["date_time"], keep="first").to_numpy()] |= REGLAS_CALIDAD["duplicado"]
+
+    motivos[venta < compra] |= REGLAS_CALIDAD["venta_menor_compra"]
+
+    return motivos
+
+
+
+
+def _mediana_movil(base: pd.DataFrame, claves: list, ventana: int) -> np.ndarray:
+
+    """
+    Mediana móvil centrada del valor medio (columna mid) de cada par, con base
+    ordenada por par y fecha. Una sola operación groupby(...).rolling para todos los pares.
+    """
+
+    return (
+        base.groupby(claves, observed=True, sort=False)["mid"]
+        .rolling(ventana, center=True, min_periods=ventana // 2 + 1).median()
+        .droplevel(list(range(len(claves))))
+        .reindex(base.index)
+        .to_numpy()
+    )
+
+
+
+
+def _es_outlier(mid: np.ndarray, mediana: np.ndarray, umbral: float) -> np.ndarray:
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.abs(mid / mediana - 1) > umbral
+
+
+
+
+def _instantes(df: pd.DataFrame) -> np.ndarray:
+
+    """
+    date_time como int64 (ns desde epoch, UTC): se ordena y compara sin objetos Timestamp.
+    """
+
+    fechas = df["date_time"]
+
+    if fechas.dt.tz is not None:
+        fechas = fechas.dt.tz_convert(None)
+
+    return fechas.to_numpy(dtype="datetime64[ns]").view("int64")
+
+
+
+
+def _por_par(ids: np.ndarray):
+
+    """
+    (id del par, posiciones de sus filas) para cada par presente en ids.
+    """
+
+    orden = np.argsort(ids, kind="stable")
+
+    cortes = np.flatnonzero(np.diff(ids[orden])) + 1
+
+    for filas in np.split(orden, cortes):
+
+        if len(filas):
+            yield int(ids[filas[0]]), filas
+
+
+
+
+def evaluar_reglas(df: pd.DataFrame, ventana: int = CALIDAD_VENTANA_MEDIANA,
+                   umbral: float = CALIDAD_UMBRAL_OUTLIER) -> np.ndarray:
+
+    """
+    Evalúa las reglas de calidad sobre columnas completas (sin recorrer filas)
+    y devuelve la máscara de motivos (int8, bits de REGLAS_CALIDAD) por fila.
+
+    El outlier se mide solo sobre las filas que pasan las demás reglas: el valor
+    medio ((compra + venta) / 2) se compara con la mediana móvil centrada de las
+    `ventana` cotizaciones vecinas del mismo par (groupby(...).rolling, una sola
+    operación para todos los pares) y se marca si |valor / mediana - 1| > umbral.
+    """
+
+    df = df.reset_index(drop=True)
+
+    motivos = _reglas_por_fila(df)
+
+    validas = motivos == 0
+
+    if ventana < 3 or not validas.any():
+        return motivos
+
+    compra = df["purchase_value"].to_numpy(dtype="float64", na_value=np.nan)
+
+    venta = df["sale_value"].to_numpy(dtype="float64", na_value=np.nan)
+
+    base = df.loc[validas, CLAVES_PAR + ["date_time"]].assign(mid=(compra[validas] + venta[validas]) / 2)
+
+    base = base.sort_values(CLAVES_PAR + ["date_time"])
+
+    outliers = _es_outlier(base["mid"].to_numpy(), _mediana_movil(base, CLAVES_PAR, ventana), umbral)
+
+    motivos[base.index.to_numpy()[outliers]] |= REGLAS_CALIDAD["outlier"]
+
+    return motivos
+
+
+
+
+def detectar_huecos(df: pd.DataFrame, max_dias: int = CALIDAD_MAX_HUECO_DIAS) -> pd.DataFrame:
+
+    """
+    Huecos de la serie diaria: pares de fechas (UTC) consecutivas con cotización
+    del mismo par separadas por más de max_dias días. Se calcula con un diff
+    agrupado sobre las fechas únicas de cada par.
+    """
+
+    dias = df[CLAVES_PAR].assign(hasta=df["date_time"].dt.floor("D")).drop_duplicates()
+
+    dias = dias.sort_values(CLAVES_PAR + ["hasta"])
+
+    dias["dias"] = dias.groupby(CLAVES_PAR, observed=True, sort=False)["hasta"].diff().dt.days
+
+    huecos = dias[dias["dias"] > max_dias].copy()
+
+    huecos["desde"] = huecos["hasta"] - pd.to_timedelta(huecos["dias"], unit="D")
+
+    return huecos[CLAVES_PAR + ["desde", "hasta", "dias"]].reset_index(drop=True)
+
+
+
+
+def _descripcion_motivos(motivos: np.ndarray) -> pd.Series:
+
+    """
+    Texto de cada máscara (ej. "duplicado,outlier"). Se arma una vez por máscara
+    distinta (a lo sumo 16) y se mapea al resto de las filas.
+    """
+
+    textos = {
+        int(mascara): ",".join(regla for regla, bit in REGLAS_CALIDAD.items() if mascara & bit)
+        for mascara in np.unique(motivos)
+    }
+
+    return pd.Series(motivos).map(textos)
+
+
+
+
+class ControlCalidad:
+
+
+
+    def __init__(self, path: str = None, ventana: int = CALIDAD_VENTANA_MEDIANA,
+                 umbral: float = CALIDAD_UMBRAL_OUTLIER, max_hueco_dias: int = CALIDAD_MAX_HUECO_DIAS):
+
+        """
+        Control de calidad bronze → silver. Separa las filas que fallan alguna regla
+        (REGLAS_CALIDAD) y acumula sus conteos y los huecos de la serie diaria.
+        - evaluar(tabla): la tabla completa de una vez.
+        - evaluar_lotes(tablas): modo streaming. El estado pasa de un lote al siguiente
+          (fechas ya vistas por par, las cotizaciones de los bordes de cada par para la
+          mediana móvil y los días con cotización válida), así que el resultado es el mismo que con la
+          tabla completa mientras los lotes de cada par lleguen en orden de fecha, ascendente
+          o descendente (como salen de bronze). Las cotizaciones a menos de media ventana
+          del borde se retienen hasta el lote siguiente (o el cierre) para decidir si son outliers.
+
+        guardar() escribe en data/o2_calidad:
+        - cuarentena.parquet: las filas separadas, con la columna motivos (se escriben
+          a medida que aparecen con un ParquetWriter, no se acumulan en memoria)
+        - reporte_calidad.json: conteos por regla y por par, y huecos detectados
+        """
+
+        self.path = path or os.path.abspath(
+            os.path.join(os.path.dirname(__file__), "../../../data/o2_calidad")
+        )
+
+        self.ventana = ventana
+
+        self.umbral = umbral
+
+        self.max_hueco_dias = max_hueco_dias
+
+        self._writer = None
+
+        self.reiniciar()
+
+
+
+
+    def reiniciar(self):
+
+        """
+        Descarta lo acumulado (cada escritura de silver empieza un reporte nuevo).
+        """
+
+        self._cerrar_cuarentena(conservar=False)
+
+        self.filas_evaluadas = 0
+
+        self.filas_cuarentena = 0
+
+        self.reglas = {regla: 0 for regla in REGLAS_CALIDAD}
+
+        self.pares = {}
+
+        self.huecos = []
+
+        self.segundos = 0.0
+
+        # Estado entre lotes. Los pares se identifican con un entero (posición en _nombres)
+        self._nombres, self._ids = [], {}
+
+        self._vistas, self._dias = {}, {}
+
+        self._contexto = pd.DataFrame({columna: pd.Series(dtype=tipo) for columna, tipo in (
+            ("pair", "int64"), ("date_time", "int64"), ("mid", "float64"), ("origen", "int8"), ("fila", "int64")
+        )})
+
+        self._pendientes = None
+
+
+
+
+    def evaluar(self, tabla: pa.Table) -> pa.Table:
+
+        """
+        Devuelve la tabla (esquema silver) sin las filas en cuarentena, en el orden original.
+        """
+
+        tabla = tabla.append_column("__orden", pa.array(np.arange(tabla.num_rows)))
+
+        validas = list(self.evaluar_lotes([tabla]))
+
+        if not validas:
+            return tabla.slice(0, 0).drop(["__orden"])
+
+        resultado = pa.concat_tables(validas)
+
+        return resultado.take(pc.sort_indices(resultado["__orden"])).drop(["__orden"])
+
+
+
+
+    def evaluar_lotes(self, tablas):
+
+        """
+        Generador: por cada lote devuelve sus filas válidas ya decididas y, al
+        terminar, las que quedaron retenidas para la ventana de outliers. Los huecos
+        se calculan al final, con los días válidos de todos los lotes.
+        """
+
+        for tabla in tablas:
+
+            validas = self._evaluar_lote(tabla)
+
+            if validas.num_rows:
+                yield validas
+
+        if self._pendientes is not None:
+
+            validas = self._evaluar_lote(None)
+
+            if validas.num_rows:
+                yield validas
+
+        self.huecos = self._detectar_huecos()
+
+
+
+
+    def _evaluar_lote(self, tabla: pa.Table = None) -> pa.Table:
+
+        """
+        Evalúa un lote (tabla=None: cierre, se deciden todas las retenidas).
+        """
+
+        inicio = time.perf_counter()
+
+        nuevas = None
+
+        if tabla is not None:
+
+            df = tabla.select(CLAVES_PAR + ["purchase_value", "sale_value", "date_time"]).to_pandas()
+
+            ids = self._ids_de_pares(tabla)
+
+            instantes = _instantes(df)
+
+            motivos = _reglas_por_fila(df)
+
+            motivos[self._ya_vistas(ids, instantes)] |= REGLAS_CALIDAD["duplicado"]
+
+            self.filas_evaluadas += len(df)
+
+            en_cuarentena = motivos != 0
+
+            if en_cuarentena.any():
+                self._a_cuarentena(tabla.filter(pa.array(en_cuarentena)), motivos[en_cuarentena], ids[en_cuarentena])
+
+            validas = ~en_cuarentena
+
+            if self.ventana < 3:
+
+                self._registrar_dias(ids[validas], instantes[validas])
+
+                self.segundos += time.perf_counter() - inicio
+
+                return tabla.filter(pa.array(validas)) if en_cuarentena.any() else tabla
+
+            compra = df["purchase_value"].to_numpy(dtype="float64")
+
+            venta = df["sale_value"].to_numpy(dtype="float64")
+
+            nuevas = pd.DataFrame({
+                "pair": ids[validas],
+                "date_time": instantes[validas],
+                "mid": (compra[validas] + venta[validas]) / 2,
+                "origen": np.int8(_NUEVA),
+                "fila": np.flatnonzero(validas),
+            })
+
+        resultado = self._outliers(tabla, nuevas)
+
+        self.segundos += time.perf_counter() - inicio
+
+        return resultado
+
+
+
+
+    def _ids_de_pares(self, tabla: pa.Table) -> np.ndarray:
+
+        """
+        Id entero del par de cada fila. El texto "BASE-DESTINO" se arma en Arrow
+        y se codifica como diccionario, así que solo se traducen los pares distintos.
+        """
+
+        texto = pc.binary_join_element_wise(
+            pc.cast(tabla["base_currency"], pa.string()), pc.cast(tabla["destination_currency"], pa.string()), "-",
+            null_handling="replace", null_replacement="None",
+        )
+
+        codificado = pc.dictionary_encode(texto).combine_chunks()
+
+        traduccion = np.array([self._ids.setdefault(pair, len(self._ids)) for pair in codificado.dictionary.to_pylist()],
+                              dtype=np.int64)
+
+        self._nombres = list(self._ids)
+
+        return traduccion[codificado.indices.to_numpy(zero_copy_only=False)]
+
+
+
+
+    def _ya_vistas(self, ids: np.ndarray, instantes: np.ndarray) -> np.ndarray:
+
+        """
+        Filas cuyo (par, date_time) ya apareció en un lote anterior. Se guardan las
+        fechas vistas de cada par como un array int64 ordenado (8 bytes por cotización).
+        """
+
+        repetidas = np.zeros(len(instantes), dtype=bool)
+
+        for pair, filas in _por_par(ids):
+
+            valores = instantes[filas]
+
+            vistas = self._vistas.get(pair)
+
+            if vistas is None:
+
+                self._vistas[pair] = np.unique(valores)
+
+                continue
+
+            posiciones = np.minimum(np.searchsorted(vistas, valores), len(vistas) - 1)
+
+            repetidas[filas] = vistas[posiciones] == valores
+
+            self._vistas[pair] = np.union1d(vistas, valores)
+
+        return repetidas
+
+
+
+
+    def _outliers(self, tabla: pa.Table, nuevas: pd.DataFrame) -> pa.Table:
+
+        """
+        Regla de outlier con una ventana que cruza lotes. Se juntan, por par y en
+        orden de fecha, el contexto de lotes anteriores (las 2 medias ventanas de
+        cada borde, incluidas las retenidas) y las filas válidas del lote, y se
+        calcula la mediana móvil de todo junto. Una fila se decide cuando tiene media
+        ventana de vecinas a cada lado (o en el cierre); las demás quedan retenidas.
+        Devuelve las filas válidas decididas (del lote y retenidas de antes).
+        """
+
+        cierre = tabla is None
+
+        media = self.ventana // 2
+
+        if not cierre and nuevas.empty:
+            return tabla.slice(0, 0)
+
+        pendientes = self._pendientes
+
+        # Solo se recalculan los pares del lote: el contexto del resto queda como está
+        contexto = self._contexto
+
+        ajenos = contexto.iloc[0:0]
+
+        if not cierre:
+
+            activos = contexto["pair"].isin(np.unique(nuevas["pair"].to_numpy())).to_numpy()
+
+            contexto, ajenos = contexto[activos], contexto[~activos]
+
+        # Las retenidas de pares ajenos siguen esperando: pasan al frente de las nuevas _pendientes
+        ajenas = ajenos["origen"].to_numpy() == _PENDIENTE
+
+        retenidas_ajenas = pendientes.take(pa.array(ajenos["fila"].to_numpy()[ajenas])) if ajenas.any() else None
+
+        if ajenas.any():
+            ajenos = ajenos.assign(fila=np.where(ajenas, np.cumsum(ajenas) - 1, -1))
+
+        base = contexto if cierre else pd.concat([contexto, nuevas], ignore_index=True)
+
+        base = base.sort_values(["pair", "date_time"], kind="stable").reset_index(drop=True)
+
+        outlier = _es_outlier(base["mid"].to_numpy(), _mediana_movil(base, ["pair"], self.ventana), self.umbral)
+
+        ids = base["pair"].to_numpy()
+
+        instantes = base["date_time"].to_numpy()
+
+        origen = base["origen"].to_numpy()
+
+        fila = base["fila"].to_numpy()
+
+        # Posición de cada fila dentro de su par y tamaño del par (base está ordenada por par)
+        inicio_par = np.r_[0, np.flatnonzero(np.diff(ids)) + 1]
+
+        tamano_par = np.diff(np.r_[inicio_par, len(ids)])
+
+        posicion = np.arange(len(ids)) - np.repeat(inicio_par, tamano_par)
+
+        tamano = np.repeat(tamano_par, tamano_par)
+
+        decidida = np.ones(len(ids), dtype=bool) if cierre else (posicion >= media) & (posicion < tamano - media)
+
+        fuentes = ((_NUEVA, tabla), (_PENDIENTE, pendientes))
+
+        salida, retenidas = [], []
+
+        for tipo, fuente in fuentes:
+
+            if fuente is None:
+                continue
+
+            de_fuente = origen == tipo
+
+            separar = de_fuente & decidida & outlier
+
+            if separar.any():
+
+                self._a_cuarentena(fuente.take(pa.array(fila[separar])),
+                                   np.full(int(separar.sum()), REGLAS_CALIDAD["outlier"], dtype=np.int8), ids[separar])
+
+            quedan = de_fuente & decidida & ~outlier
+
+            if quedan.any():
+
+                salida.append(fuente.take(pa.array(np.sort(fila[quedan]))))
+
+                self._registrar_dias(ids[quedan], instantes[quedan])
+
+            retener = de_fuente & ~decidida
+
+            if retener.any():
+                retenidas.append((retener, fuente.take(pa.array(fila[retener]))))
+
+        if retenidas_ajenas is not None:
+            retenidas.insert(0, (None, retenidas_ajenas))
+
+        self._pendientes = pa.concat_tables([tabla for _, tabla in retenidas]) if retenidas else None
+
+        # Nuevo contexto: las 2 medias ventanas de cada borde del par. Las retenidas
+        # (siempre a menos de media ventana del borde) apuntan a su fila en _pendientes
+        borde = (posicion < 2 * media) | (posicion >= tamano - 2 * media) if not cierre else np.zeros(len(ids), dtype=bool)
+
+        contexto = base[borde].assign(origen=np.int8(_CONTEXTO), fila=-1)
+
+        desplazamiento = 0
+
+        for retener, tabla_retenida in retenidas:
+
+            if retener is None:
+
+                desplazamiento += tabla_retenida.num_rows
+
+                continue
+
+            en_contexto = retener[borde]
+
+            contexto.loc[en_contexto, "origen"] = np.int8(_PENDIENTE)
+
+            contexto.loc[en_contexto, "fila"] = desplazamiento + np.arange(int(en_contexto.sum()))
+
+            desplazamiento += tabla_retenida.num_rows
+
+        self._contexto = pd.concat([ajenos, contexto], ignore_index=True)
+
+        if not salida:
+            return (tabla if tabla is not None else pendientes).slice(0, 0)
+
+        return pa.concat_tables(salida) if len(salida) > 1 else salida[0]
+
+
+
+
+    def _a_cuarentena(self, tabla: pa.Table, motivos: np.ndarray, ids: np.ndarray):
+
+        """
+        Suma los conteos por regla y par, y escribe las filas en la cuarentena.
+        """
+
+        for regla, bit in REGLAS_CALIDAD.items():
+
+            con_regla = (motivos & bit) != 0
+
+            self.reglas[regla] += int(con_regla.sum())
+
+            for pair, cantidad in zip(*np.unique(ids[con_regla], return_counts=True)):
+
+                del_par = self.pares.setdefault(self._nombres[pair], {})
+
+                del_par[regla] = del_par.get(regla, 0) + int(cantidad)
+
+        if "__orden" in tabla.column_names:
+            tabla = tabla.drop(["__orden"])
+
+        cuarentena = tabla.append_column("motivos", pa.array(_descripcion_motivos(motivos), pa.string()))
+
+        if self._writer is None:
+
+            os.makedirs(self.path, exist_ok=True)
+
+            descriptor, self._tmp_cuarentena = tempfile.mkstemp(prefix=".cuarentena_", suffix=".tmp", dir=self.path)
+
+            os.close(descriptor)
+
+            self._writer = pq.ParquetWriter(self._tmp_cuarentena, cuarentena.schema, compression=SILVER_COMPRESION)
+
+        self._writer.write_table(cuarentena)
+
+        self.filas_cuarentena += cuarentena.num_rows
+
+
+
+
+    def _cerrar_cuarentena(self, conservar: bool) -> bool:
+
+        """
+        Cierra el ParquetWriter de la cuarentena. Con conservar=True el archivo
+        reemplaza a cuarentena.parquet; si no, se borra. Devuelve si había cuarentena.
+        """
+
+        if self._writer is None:
+            return False
+
+        self._writer.close()
+
+        self._writer = None
+
+        if conservar:
+            os.replace(self._tmp_cuarentena, os.path.join(self.path, "cuarentena.parquet"))
+
+        elif os.path.exists(self._tmp_cuarentena):
+            os.remove(self._tmp_cuarentena)
+
+        return True
+
+
+
+
+    def _registrar_dias(self, ids: np.ndarray, instantes: np.ndarray):
+
+        """
+        Acumula los días (UTC) con cotización válida de cada par, como array
+        ordenado de enteros. Los huecos se calculan al cerrar, con todos los lotes.
+        """
+
+        dias = instantes // _DIA_NS
+
+        for pair, filas in _por_par(ids):
+
+            previos = self._dias.get(pair)
+
+            self._dias[pair] = np.unique(dias[filas]) if previos is None else np.union1d(previos, dias[filas])
+
+
+
+
+    def _detectar_huecos(self) -> list:
+
+        """
+        Saltos de más de max_hueco_dias días entre días consecutivos con cotización de cada par.
+        """
+
+        huecos = []
+
+        for pair, dias in self._dias.items():
+
+            salto = np.diff(dias)
+
+            for i in np.flatnonzero(salto > self.max_hueco_dias):
+
+                huecos.append({
+                    "pair": self._nombres[pair],
+                    "desde": str(np.datetime64(int(dias[i]), "D")),
+                    "hasta": str(np.datetime64(int(dias[i + 1]), "D")),
+                    "dias": int(salto[i]),
+                })
+
+        return sorted(huecos, key=lambda hueco: (hueco["pair"], hueco["desde"]))
+
+
+
+
+    def reporte(self) -> dict:
+
+        return {
+            "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "parametros": {"ventana_mediana": self.ventana, "umbral_outlier": self.umbral,
+                           "max_hueco_dias": self.max_hueco_dias},
+            "filas_evaluadas": self.filas_evaluadas,
+            "filas_cuarentena": self.filas_cuarentena,
+            "filas_validas": self.filas_evaluadas - self.filas_cuarentena,
+            "reglas": self.reglas,
+            "pares": dict(sorted(self.pares.items())),
+            "huecos": {"total": len(self.huecos), "detalle": self.huecos[:MAX_HUECOS_REPORTE]},
+            "segundos": round(self.segundos, 4),
+        }
+
+
+
+
+    def guardar(self) -> dict:
+
+        """
+        Cierra la cuarentena (o borra la de una corrida anterior si no hubo filas
+        separadas) y escribe el reporte. Devuelve el reporte.
+        """
+
+        os.makedirs(self.path, exist_ok=True)
+
+        path_cuarentena = os.path.join(self.path, "cuarentena.parquet")
+
+        if not self._cerrar_cuarentena(conservar=True) and os.path.exists(path_cuarentena):
+            os.remove(path_cuarentena)
+
+        reporte = self.reporte()
+
+        path_reporte = os.path.join(self.path, "reporte_calidad.json")
+
+        with open(f"{path_reporte}.tmp", "w", encoding="utf-8") as f:
+            json.dump(reporte, f, indent=2, ensure_ascii=False)
+
+        os.replace(f"{path_reporte}.tmp", path_reporte)
+
+        return reporte
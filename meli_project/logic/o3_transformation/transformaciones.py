@@ -1,7 +1,16 @@
 import os
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from datetime import datetime
+from meli_project.logic.o3_transformation.calidad import ControlCalidad
+from meli_project.logic.utils.manifiesto import Manifiesto
+from meli_project.logic.utils.metricas import METRICAS
+from meli_project.logic.utils.particiones import escribir_dataset_particionado
+from meli_project.logic.utils.esquemas import RENOMBRES_SILVER, construir_esquema_silver, conformar_a_esquema
 from meli_project.logic.utils.utils import *
+from meli_project.params import *
 
 
 
@@ -9,14 +18,30 @@ from meli_project.logic.utils.utils import *
 class CurrencyTransformer:
 
 
-    def __init__(self, df: pd.DataFrame):
+    def __init__(self, df, contexto=None, calidad: bool = CALIDAD_ACTIVA):
 
         """
-        Inicializa el transformador con un DataFrame unificado.
+        Inicializa el transformador con un DataFrame unificado
+        o con una pa.Table (camino Arrow, ver DFsCurrencies.obtener_tabla_arrow).
+
+        Parameters:
+        - contexto (ContextoEjecucion): opcional; la tabla guardada en silver queda
+          en memoria para que modelado y carga no vuelvan a leer el Parquet.
+        - calidad (bool): antes de escribir silver, separa en cuarentena las filas
+          que fallan las reglas de calidad (ver ControlCalidad).
         """
 
         self.df = df
 
+        self.contexto = contexto
+
+        self.calidad = ControlCalidad() if calidad else None
+
+        self.manifiesto = Manifiesto()
+
+        # Esquema declarado de silver (float32 solo en las columnas configuradas)
+        self.esquema = construir_esquema_silver({c: "float32" for c in SILVER_COLUMNAS_FLOAT32})
+
         # Definir ruta a capa silver
         self.silver_path = os.path.abspath(
             os.path.join(os.path.dirname(__file__), "../../../data/o2_silver")
@@ -32,6 +57,9 @@ class CurrencyTransformer:
         Transforma y normaliza el DataFrame con las columnas necesarias.
         """
 
+        if isinstance(self.df, pa.Table):
+            return self.transformar_arrow()
+
         logger = setup_logger("o3_transformation_logs/transformar_moneda.log")
 
         logger.info("INICIANDO transformación del DataFrame de monedas...")
@@ -65,6 +93,13 @@ class CurrencyTransformer:
 
             df.drop(columns=["timestamp"], inplace=True)
 
+
+            # Monedas como categóricas (se guardan como diccionario en Parquet)
+
+            df["base_currency"] = df["base_currency"].astype("category")
+
+            df["destination_currency"] = df["destination_currency"].astype("category")
+
             logger.info(f"FIN transformacion. ✅ Transformación completada. Total de registros: {len(df)}")
 
             return df
@@ -79,10 +114,165 @@ class CurrencyTransformer:
 
 
 
-    def guardar_en_parquet(self, df_transformado = None, nombre_archivo="currencies_transformadas.parquet"):
+    def transformar_arrow(self) -> pa.Table:
+
+        """
+        Versión Arrow de transformar: renombra y castea las columnas sin pasar
+        por pandas. El timestamp (int64, epoch en segundos) pasa a timestamp[s, UTC].
+        """
+
+        logger = setup_logger("o3_transformation_logs/transformar_moneda.log")
+
+        logger.info("INICIANDO transformación Arrow de la tabla de monedas...")
+
+        try:
+            tabla = self.transformar_lote(self.df)
+
+            logger.info(f"FIN transformacion. ✅ Transformación Arrow completada. Total de registros: {tabla.num_rows}")
+
+            return tabla
+
+        except Exception as e:
+
+            logger.critical(f"FIN transformacion. ❌ Error en la transformación Arrow: {str(e)}")
+
+            return self.esquema.empty_table()
+
+
+
+
+    def transformar_lote(self, tabla) -> pa.Table:
+
+        """
+        Núcleo de transformar_arrow sobre una tabla o RecordBatch de bronze
+        (BRONZE_ARROW_SCHEMA): renombra las columnas y castea al esquema silver.
+        """
+
+        if isinstance(tabla, pa.RecordBatch):
+            tabla = pa.Table.from_batches([tabla])
+
+        tabla = tabla.select(list(RENOMBRES_SILVER))
+
+        tabla = tabla.rename_columns([RENOMBRES_SILVER[c] for c in tabla.column_names])
+
+        tabla = tabla.set_column(
+            tabla.schema.get_field_index("date_time"),
+            "date_time",
+            pc.cast(tabla["date_time"], pa.timestamp("s", tz="UTC")),
+        )
+
+        return tabla.cast(self.esquema)
+
+
+
+
+    def guardar_en_parquet_streaming(self, lotes, nombre_archivo="currencies_transformadas.parquet",
+                                     particionado: bool = DATASET_PARTICIONADO, modo: str = "reemplazar"):
 
         """
-        Guarda el DataFrame transformado en formato Parquet en la capa silver.
+        Modo streaming: transforma y escribe en silver cada lote de bronze a medida
+        que llega (ver DFsCurrencies.iterar_lotes_arrow), con un ParquetWriter
+        incremental. Los lotes se acumulan solo hasta completar un row group, así
+        que la memoria queda acotada por SILVER_ROW_GROUP y no por toda la historia.
+
+        Con particionado=True los lotes se escriben como un único dataset Hive
+        (las particiones se reemplazan una sola vez, al primer lote que las toca).
+        """
+
+        logger = setup_logger("o3_transformation_logs/guardar_parquet.log")
+
+        logger.info(f"INICIO transformacion a parquet en streaming.")
+
+        path_salida = os.path.join(self.silver_path, nombre_archivo)
+
+        tmp_path = f"{path_salida}.tmp"
+
+        try:
+            tablas = (self.transformar_lote(lote) for lote in lotes)
+
+            if self.calidad is not None:
+
+                self.calidad.reiniciar()
+
+                # El control guarda estado entre lotes y retiene los bordes para la mediana móvil
+                tablas = self.calidad.evaluar_lotes(tablas)
+
+            if particionado:
+
+                path_salida = path_salida.replace(".parquet", "")
+
+                filas = escribir_dataset_particionado(tablas, path_salida, modo=modo, compresion=SILVER_COMPRESION,
+                                                      filas_por_grupo=SILVER_ROW_GROUP)
+
+                self.manifiesto.registrar("silver", os.path.basename(path_salida), path_salida)
+
+                self._guardar_calidad()
+
+                logger.info(f"FIN transformacion. ✅ Dataset particionado guardado en streaming: {path_salida} ({filas} registros)")
+
+                return path_salida
+
+            filas = 0
+
+            pendientes, filas_pendientes = [], 0
+
+            with pq.ParquetWriter(tmp_path, self.esquema, compression=SILVER_COMPRESION) as writer:
+
+                for tabla in tablas:
+
+                    pendientes.append(tabla)
+
+                    filas += tabla.num_rows
+
+                    filas_pendientes += tabla.num_rows
+
+                    if filas_pendientes >= SILVER_ROW_GROUP:
+
+                        # Se escriben row groups completos y el resto queda para el próximo
+                        acumulado = pa.concat_tables(pendientes)
+
+                        completas = filas_pendientes - filas_pendientes % SILVER_ROW_GROUP
+
+                        writer.write_table(acumulado.slice(0, completas), row_group_size=SILVER_ROW_GROUP)
+
+                        resto = acumulado.slice(completas)
+
+                        pendientes, filas_pendientes = [resto], resto.num_rows
+
+                if filas_pendientes:
+                    writer.write_table(pa.concat_tables(pendientes), row_group_size=SILVER_ROW_GROUP)
+
+            os.replace(tmp_path, path_salida)
+
+            self.manifiesto.registrar("silver", nombre_archivo, path_salida)
+
+            self._guardar_calidad()
+
+            logger.info(f"FIN transformacion. ✅ Archivo guardado en Silver en streaming: {path_salida} ({filas} registros)")
+
+            return path_salida
+
+        except Exception as e:
+
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+            logger.error(f"FIN transformacion. ❌ Error al guardar el Parquet en streaming: {e}")
+
+
+
+
+    def guardar_en_parquet(self, df_transformado = None, nombre_archivo="currencies_transformadas.parquet",
+                           particionado: bool = DATASET_PARTICIONADO, modo: str = "reemplazar"):
+
+        """
+        Guarda el DataFrame (o la pa.Table) transformado en formato Parquet en la capa silver.
+        Antes de escribir se valida contra el esquema declarado; el archivo se escribe
+        con la compresión y el tamaño de row group configurados en params.
+
+        Con particionado=True se escribe un dataset Hive (carpeta sin la extensión
+        .parquet) y solo se reemplazan (o se agregan, modo="agregar") las
+        particiones moneda/fecha presentes en los datos.
         """
 
         logger = setup_logger("o3_transformation_logs/guardar_parquet.log")
@@ -96,10 +286,71 @@ class CurrencyTransformer:
 
             path_salida = os.path.join(self.silver_path, nombre_archivo)
 
-            df_transformado.to_parquet(path_salida, index=False)
+            tabla = conformar_a_esquema(df_transformado, self.esquema)
+
+            if self.calidad is not None:
+
+                self.calidad.reiniciar()
+
+                tabla = self.calidad.evaluar(tabla)
+
+                self._guardar_calidad()
+
+            if particionado:
+
+                path_salida = path_salida.replace(".parquet", "")
+
+                escribir_dataset_particionado(tabla, path_salida, modo=modo, compresion=SILVER_COMPRESION,
+                                              filas_por_grupo=SILVER_ROW_GROUP)
+
+                self.manifiesto.registrar("silver", os.path.basename(path_salida), path_salida)
+
+                logger.info(f"FIN transformacion. ✅ Dataset particionado guardado en Silver: {path_salida}")
+
+                return path_salida
+
+            tmp_path = f"{path_salida}.tmp"
+
+            pq.write_table(tabla, tmp_path, compression=SILVER_COMPRESION, row_group_size=SILVER_ROW_GROUP)
+
+            os.replace(tmp_path, path_salida)
+
+            entrada = self.manifiesto.registrar("silver", nombre_archivo, path_salida)
+
+            # Solo el Parquet monolítico: en un dataset la tabla no incluye las particiones previas
+            if self.contexto is not None:
+                self.contexto.guardar("silver", nombre_archivo, tabla, entrada["hash"])
 
             logger.info(f"FIN transformacion. ✅ Archivo guardado en Silver: {path_salida}")
 
+            return path_salida
+
         except Exception as e:
 
             logger.error(f"FIN transformacion. ❌ Error al guardar el archivo Parquet: {e}")
+
+
+
+
+    def _guardar_calidad(self):
+
+        """
+        Escribe la cuarentena y el reporte de calidad, y deja el resumen en logs y métricas.
+        """
+
+        logger = setup_logger("o3_transformation_logs/calidad.log")
+
+        reporte = self.calidad.guardar()
+
+        METRICAS.sumar("transformacion", "filas_cuarentena", reporte["filas_cuarentena"])
+
+        METRICAS.sumar("transformacion", "huecos_series", reporte["huecos"]["total"])
+
+        if reporte["filas_cuarentena"] or reporte["huecos"]["total"]:
+
+            logger.warning(f"⚠️ Calidad: {reporte['filas_cuarentena']} de {reporte['filas_evaluadas']} registros en cuarentena "
+                           f"{reporte['reglas']} y {reporte['huecos']['total']} huecos en las series diarias "
+                           f"({reporte['segundos']}s). Detalle en {self.calidad.path}")
+
+        else:
+            logger.info(f"✅ Calidad: {reporte['filas_evaluadas']} registros sin observaciones ({reporte['segundos']}s).")
@@ -0,0 +1,273 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+
+
+# Clave de cada serie (par de monedas)
+CLAVES_PAR = ["base_currency", "destination_currency"]
+
+
+# Ventanas (en días calendario) de las estadísticas móviles
+VENTANAS_MOVILES = (7, 30)
+
+
+ESQUEMA_OHLC_DIARIO = pa.schema([
+    ("base_currency", pa.dictionary(pa.int32(), pa.string())),
+    ("destination_currency", pa.dictionary(pa.int32(), pa.string())),
+    ("quote_date", pa.date32()),
+    ("open", pa.float64()),
+    ("high", pa.float64()),
+    ("low", pa.float64()),
+    ("close", pa.float64()),
+    ("quotes", pa.int32()),
+    ("spread_mean", pa.float64()),
+    ("spread_max", pa.float64()),
+    ("spread_pct_mean", pa.float64()),
+])
+
+
+
+
+def esquema_estadisticas_moviles(ventanas: tuple = VENTANAS_MOVILES) -> pa.Schema:
+
+    campos = [
+        ("base_currency", pa.dictionary(pa.int32(), pa.string())),
+        ("destination_currency", pa.dictionary(pa.int32(), pa.string())),
+        ("quote_date", pa.date32()),
+        ("close", pa.float64()),
+        ("log_return", pa.float64()),
+    ]
+
+    for dias in ventanas:
+        campos += [(f"mean_{dias}d", pa.float64()), (f"volatility_{dias}d", pa.float64())]
+
+    return pa.schema(campos)
+
+
+
+
+ESQUEMA_TASAS_CRUZADAS_LARGO = pa.schema([
+    ("quote_date", pa.date32()),
+    ("from_currency", pa.dictionary(pa.int32(), pa.string())),
+    ("to_currency", pa.dictionary(pa.int32(), pa.string())),
+    ("rate", pa.float64()),
+])
+
+
+
+
+def esquema_tasas_cruzadas_ancho(monedas: list) -> pa.Schema:
+
+    return pa.schema(
+        [("quote_date", pa.date32()), ("from_currency", pa.dictionary(pa.int32(), pa.string()))]
+        + [(f"rate_{moneda}", pa.float64()) for moneda in monedas]
+    )
+
+
+
+
+def ohlc_diario(df: pd.DataFrame) -> pd.DataFrame:
+
+    """
+    OHLC diario (UTC) del valor de compra por par, con el spread compra/venta
+    del día (medio, máximo y medio relativo al valor medio).
+    Se calcula en una sola agregación agrupada, sin recorrer los pares en Python.
+    """
+
+    df = df[CLAVES_PAR + ["purchase_value", "sale_value", "date_time"]].sort_values(CLAVES_PAR + ["date_time"])
+
+    spread = df["sale_value"] - df["purchase_value"]
+
+    df = df.assign(
+        quote_date=df["date_time"].dt.floor("D").dt.tz_localize(None),
+        spread=spread,
+        spread_pct=spread / ((df["sale_value"] + df["purchase_value"]) / 2),
+    )
+
+    diario = df.groupby(CLAVES_PAR + ["quote_date"], observed=True, sort=True).agg(
+        open=("purchase_value", "first"),
+        high=("purchase_value", "max"),
+        low=("purchase_value", "min"),
+        close=("purchase_value", "last"),
+        quotes=("purchase_value", "size"),
+        spread_mean=("spread", "mean"),
+        spread_max=("spread", "max"),
+        spread_pct_mean=("spread_pct", "mean"),
+    )
+
+    return diario.reset_index()
+
+
+
+
+def estadisticas_moviles(diario: pd.DataFrame, ventanas: tuple = VENTANAS_MOVILES) -> pd.DataFrame:
+
+    """
+    Media móvil y volatilidad móvil del cierre diario por par, en ventanas de
+    días calendario (ej. "7D": los fines de semana sin cotización no cuentan
+    como observaciones). La volatilidad es el desvío estándar de los retornos
+    logarítmicos diarios dentro de la ventana.
+
+    Usa groupby(...).rolling, que aplica las ventanas a todos los pares en una
+    sola operación vectorizada. `diario` es la salida de ohlc_diario.
+    """
+
+    diario = diario[CLAVES_PAR + ["quote_date", "close"]].sort_values(CLAVES_PAR + ["quote_date"]).reset_index(drop=True)
+
+    grupos = diario.groupby(CLAVES_PAR, observed=True, sort=True)
+
+    diario["log_return"] = np.log(diario["close"]).sub(np.log(grupos["close"].shift(1)))
+
+    # Mismo orden que diario (ordenado por par y fecha), así que los valores se alinean por posición
+    por_fecha = diario.set_index("quote_date").groupby(CLAVES_PAR, observed=True, sort=True)
+
+    for dias in ventanas:
+
+        ventana = f"{dias}D"
+
+        diario[f"mean_{dias}d"] = por_fecha["close"].rolling(ventana, min_periods=1).mean().to_numpy()
+
+        diario[f"volatility_{dias}d"] = por_fecha["log_return"].rolling(ventana, min_periods=2).std().to_numpy()
+
+    return diario
+
+
+
+
+def a_tabla_arrow(df: pd.DataFrame, esquema: pa.Schema) -> pa.Table:
+
+    """
+    Convierte un agregado de pandas a Arrow con el esquema declarado
+    (quote_date como DATE, monedas como diccionario).
+    """
+
+    tabla = pa.Table.from_pandas(df[esquema.names], preserve_index=False)
+
+    tabla = tabla.set_column(
+        tabla.schema.get_field_index("quote_date"),
+        "quote_date",
+        pc.cast(tabla["quote_date"], pa.date32()),
+    )
+
+    return tabla.cast(esquema)
+
+
+
+
+def tasas_brl_por_dia(df: pd.DataFrame, monedas: list = None, tolerancia_dias: int = 7):
+
+    """
+    Alinea todas las monedas cotizadas contra BRL en una grilla diaria común:
+    para cada día UTC toma la última cotización media ((compra + venta) / 2)
+    de cada moneda hasta el cierre del día (as-of join con merge_asof agrupado
+    por moneda, en una sola operación). Si la última cotización tiene más de
+    tolerancia_dias queda como NaN. BRL se agrega con tasa 1.
+
+    Devuelve (fechas datetime64[D] de largo T, lista de N monedas, matriz T x N
+    con BRL por unidad de cada moneda).
+    """
+
+    df = df[df["destination_currency"].astype(str) == "BRL"]
+
+    fechas_hora = df["date_time"]
+
+    if fechas_hora.dt.tz is not None:
+        fechas_hora = fechas_hora.dt.tz_convert("UTC").dt.tz_localize(None)
+
+    cotizaciones = pd.DataFrame({
+        "moneda": df["base_currency"].astype(str).to_numpy(),
+        "date_time": fechas_hora.to_numpy(),
+        "mid": ((df["purchase_value"] + df["sale_value"]) / 2).to_numpy(),
+    }).sort_values("date_time")
+
+    disponibles = sorted(set(cotizaciones["moneda"]) | {"BRL"})
+
+    monedas = [m for m in monedas if m in disponibles] if monedas else disponibles
+
+    if cotizaciones.empty or not monedas:
+        return np.array([], dtype="datetime64[D]"), monedas, np.empty((0, len(monedas)))
+
+    fechas = np.arange(cotizaciones["date_time"].min().floor("D").to_datetime64().astype("datetime64[D]"),
+                       cotizaciones["date_time"].max().floor("D").to_datetime64().astype("datetime64[D]") + 1)
+
+    # Cierre de cada día: último nanosegundo del día
+    cierres = (fechas + 1).astype("datetime64[ns]") - np.timedelta64(1, "ns")
+
+    grilla = pd.DataFrame({
+        "t": np.repeat(cierres, len(monedas)),
+        "moneda": np.tile(np.array(monedas, dtype=object), len(fechas)),
+    })
+
+    alineado = pd.merge_asof(grilla, cotizaciones, left_on="t", right_on="date_time", by="moneda",
+                             direction="backward", tolerance=pd.Timedelta(days=tolerancia_dias))
+
+    matriz = alineado["mid"].to_numpy(dtype="float64").reshape(len(fechas), len(monedas))
+
+    if "BRL" in monedas:
+        matriz[:, monedas.index("BRL")] = 1.0
+
+    return fechas, monedas, matriz
+
+
+
+
+def lotes_tasas_cruzadas(fechas, monedas: list, matriz: np.ndarray, formato: str = "largo", dias_por_lote: int = 64):
+
+    """
+    Genera la matriz de tasas cruzadas por broadcasting de NumPy:
+    tasa[t, i, j] = matriz[t, i] / matriz[t, j] (unidades de j por 1 de i).
+    Se procesa de a dias_por_lote días para acotar la memoria (T x N x N) y
+    se devuelve un generador de pa.Table:
+    - "largo": quote_date, from_currency, to_currency, rate (sin la diagonal ni NaN)
+    - "ancho": quote_date, from_currency y una columna rate_<moneda> por moneda destino
+    """
+
+    if formato not in ("largo", "ancho"):
+        raise ValueError(f"Formato de tasas cruzadas no soportado: {formato}")
+
+    diccionario = pa.array(monedas, pa.string())
+
+    fuera_diagonal = ~np.eye(len(monedas), dtype=bool)
+
+    for inicio in range(0, len(fechas), dias_por_lote):
+
+        bloque = matriz[inicio:inicio + dias_por_lote]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cruzadas = bloque[:, :, None] / bloque[:, None, :]
+
+        if formato == "largo":
+
+            mascara = np.isfinite(cruzadas) & fuera_diagonal
+
+            idx_t, idx_i, idx_j = np.nonzero(mascara)
+
+            yield pa.table({
+                "quote_date": pa.array(fechas[inicio:inicio + dias_por_lote][idx_t], pa.date32()),
+                "from_currency": pa.DictionaryArray.from_arrays(pa.array(idx_i, pa.int32()), diccionario),
+                "to_currency": pa.DictionaryArray.from_arrays(pa.array(idx_j, pa.int32()), diccionario),
+                "rate": pa.array(cruzadas[mascara], pa.float64()),
+            }, schema=ESQUEMA_TASAS_CRUZADAS_LARGO)
+
+        else:
+
+            filas = cruzadas.reshape(-1, len(monedas))
+
+            idx_t, idx_i = np.divmod(np.arange(filas.shape[0]), len(monedas))
+
+            validas = np.isfinite(bloque.reshape(-1))
+
+            columnas = {
+                "quote_date": pa.array(fechas[inicio:inicio + dias_por_lote][idx_t[validas]], pa.date32()),
+                "from_currency": pa.DictionaryArray.from_arrays(pa.array(idx_i[validas], pa.int32()), diccionario),
+            }
+
+            for j, moneda in enumerate(monedas):
+                columnas[f"rate_{moneda}"] = pa.array(np.where(np.isfinite(filas[validas, j]), filas[validas, j], np.nan),
+                                                      pa.float64(), from_pandas=True)
+
+            yield pa.table(columnas, schema=esquema_tasas_cruzadas_ancho(monedas))
+
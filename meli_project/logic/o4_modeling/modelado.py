@@ -1,22 +1,59 @@
 import os
+import gzip
 import shutil
 import pandas as pd
+import pyarrow.parquet as pq
+from meli_project.logic.o4_modeling.agregados import (ESQUEMA_OHLC_DIARIO, VENTANAS_MOVILES, ohlc_diario,
+                                                      estadisticas_moviles, esquema_estadisticas_moviles, a_tabla_arrow,
+                                                      ESQUEMA_TASAS_CRUZADAS_LARGO, esquema_tasas_cruzadas_ancho,
+                                                      tasas_brl_por_dia, lotes_tasas_cruzadas)
+from meli_project.logic.utils.manifiesto import Manifiesto, hash_ruta, enlazar_o_copiar
+from meli_project.logic.utils.particiones import es_dataset, leer_dataset, iterar_lotes, columnas_dataset, escribir_dataset_particionado
 from meli_project.logic.utils.utils import *
+from meli_project.params import *
 
 
 
 class CurrencyModeler:
 
-    def __init__(self, nombre_parquet="currencies_transformadas.parquet"):
+    def __init__(self, nombre_parquet="currencies_transformadas.parquet", pares: list = None,
+                 desde: str = None, hasta: str = None, forzar: bool = False, contexto=None):
 
         """
         Clase que gestiona el modelado de datos:
         - Copia el archivo .parquet desde Silver a Gold
         - Convierte el archivo .parquet a .csv y lo guarda en Gold
+        - Construye las tablas agregadas de Gold (OHLC diario y estadísticas móviles)
+        - Materializa la matriz de tasas cruzadas derivadas vía BRL
+
+        Si Silver es un dataset particionado, los filtros opcionales por pares
+        (ej. ["USD-BRL"]) y fechas "YYYY-MM-DD" se aplican con predicate pushdown.
+
+        Cada salida se registra en el manifiesto con el hash de Silver usado; si
+        Silver no cambió y la salida sigue intacta, el paso se saltea (salvo forzar=True).
+
+        Con un contexto (ContextoEjecucion) el CSV se genera desde la tabla que
+        dejó en memoria la transformación, sin volver a decodificar Silver.
         """
 
         self.nombre_parquet = nombre_parquet
 
+        self.nombre_dataset = nombre_parquet.replace(".parquet", "")
+
+        self.pares = pares
+
+        self.desde = desde
+
+        self.hasta = hasta
+
+        self.forzar = forzar
+
+        self.contexto = contexto
+
+        self.manifiesto = Manifiesto()
+
+        self._hashes = {}
+
         self.silver_path = os.path.abspath(
             os.path.join(os.path.dirname(__file__), "../../../data/o2_silver")
         )
@@ -33,6 +70,7 @@ class CurrencyModeler:
 
         """
         Copia el archivo .parquet desde Silver a Gold sin modificarlo.
+        Devuelve la ruta en Gold, o un mensaje "❌ ..." si la copia falla.
         """
 
         logger = setup_logger("o4_modeling_logs/copiar_parquet_a_gold.log")
@@ -43,30 +81,105 @@ class CurrencyModeler:
         source_path = os.path.join(self.silver_path, self.nombre_parquet)
         target_path = os.path.join(self.gold_path, self.nombre_parquet)
 
+        dataset_silver = os.path.join(self.silver_path, self.nombre_dataset)
+
 
         try:
 
+            if es_dataset(dataset_silver):
+
+                dataset_gold = os.path.join(self.gold_path, self.nombre_dataset)
+
+                # Un .parquet suelto de una corrida anterior iría a la misma tabla de BigQuery
+                self._quitar_otro_formato(target_path, logger)
+
+                entradas = self._entradas(dataset_silver)
+
+                if self._esta_vigente(self.nombre_dataset, entradas, dataset_gold):
+
+                    logger.info(f"✅ Silver sin cambios, se conserva: {dataset_gold}")
+
+                    return dataset_gold
+
+                # Lote a lote con los mismos filtros: el dataset no se materializa en memoria
+                lotes = iterar_lotes(dataset_silver, self.pares, self.desde, self.hasta)
+
+                filas = escribir_dataset_particionado(lotes, dataset_gold, modo="reemplazar", compresion=SILVER_COMPRESION,
+                                                      filas_por_grupo=SILVER_ROW_GROUP)
+
+                self.manifiesto.registrar("gold", self.nombre_dataset, dataset_gold, entradas)
+
+                logger.info(f"✅ Particiones reemplazadas en: {dataset_gold} ({filas} registros)")
+
+                return dataset_gold
+
             if not os.path.isfile(source_path):
 
                 logger.error(f"❌ Archivo no encontrado: {source_path}")
 
                 return f"❌ Archivo no encontrado: {source_path}"
 
+            self._quitar_otro_formato(os.path.join(self.gold_path, self.nombre_dataset), logger)
+
+            entradas = self._entradas(source_path)
 
-            shutil.copyfile(source_path, target_path)
+            if self._esta_vigente(self.nombre_parquet, entradas, target_path):
 
-            logger.info(f"✅ Archivo copiado correctamente a: {target_path}")
+                logger.info(f"✅ Silver sin cambios, se conserva: {target_path}")
+
+                return target_path
+
+            metodo = enlazar_o_copiar(source_path, target_path)
+
+            self.manifiesto.registrar("gold", self.nombre_parquet, target_path, entradas, hash_salida=entradas["silver"])
+
+            # El archivo de Gold es el mismo de Silver: se comparte la tabla en memoria
+            if self.contexto is not None:
+
+                tabla = self.contexto.obtener("silver", self.nombre_parquet, entradas["silver"])
+
+                if tabla is not None:
+                    self.contexto.guardar("gold", self.nombre_parquet, tabla, entradas["silver"])
+
+            logger.info(f"✅ Archivo copiado correctamente a: {target_path} ({metodo})")
+
+            return target_path
 
         except Exception as e:
 
             logger.error(f"❌ Error al copiar el archivo Parquet: {e}")
 
+            return f"❌ Error al copiar el archivo Parquet: {e}"
+
+
+
+    def _quitar_otro_formato(self, path: str, logger):
+
+        """
+        Gold sigue el formato de Silver: si Silver pasó de Parquet monolítico a
+        dataset particionado (o al revés), borra la salida en el formato anterior.
+        """
+
+        if es_dataset(path):
+            shutil.rmtree(path)
+
+        elif os.path.isfile(path):
+            os.remove(path)
+
+        else:
+            return
+
+        logger.warning(f"⚠️ Se borró la salida de Gold en el formato anterior: {path}")
 
 
-    def convertir_a_csv(self):
+
+    def convertir_a_csv(self, comprimir: bool = CSV_GZIP, filas_por_lote: int = CSV_FILAS_POR_LOTE):
 
         """
-        Carga el archivo .parquet desde Silver, lo convierte a .csv y lo guarda en Gold.
+        Convierte el archivo .parquet de Silver a .csv (o .csv.gz) en Gold en streaming:
+        se lee de a un record batch y cada lote se agrega al CSV, así la memoria
+        queda acotada por filas_por_lote y no por el tamaño total de la historia.
+        Devuelve la ruta del CSV, o un mensaje "❌ ..." si la conversión falla.
         """
 
         logger = setup_logger("o4_modeling_logs/convertir_a_csv.log")
@@ -75,28 +188,254 @@ class CurrencyModeler:
 
         parquet_file = os.path.join(self.silver_path, self.nombre_parquet)
 
+        dataset_silver = os.path.join(self.silver_path, self.nombre_dataset)
+
+        tmp_path = None
+
         try:
 
-            if not os.path.isfile(parquet_file):
+            if es_dataset(dataset_silver):
+
+                origen = dataset_silver
+
+            elif not os.path.isfile(parquet_file):
 
                 logger.error(f"❌ Archivo no encontrado: {parquet_file}")
 
                 return f"❌ Archivo no encontrado: {parquet_file}"
 
-            df = pd.read_parquet(parquet_file)
+            else:
+
+                origen = parquet_file
 
-            csv_name = self.nombre_parquet.replace(".parquet", ".csv")
+            csv_name = self.nombre_parquet.replace(".parquet", ".csv.gz" if comprimir else ".csv")
 
             csv_path = os.path.join(self.gold_path, csv_name)
 
-            df.to_csv(csv_path, index=False, encoding="utf-8-sig", sep=";")
+            entradas = self._entradas(origen)
 
-            logger.info(f"✅ CSV generado correctamente en: {csv_path}")
+            if self._esta_vigente(csv_name, entradas, csv_path):
+
+                logger.info(f"✅ Silver sin cambios, se conserva: {csv_path}")
+
+                return csv_path
+
+            tmp_path = f"{csv_path}.tmp"
+
+            abrir = gzip.open if comprimir else open
+
+            filas = 0
+
+            # Un único handle utf-8-sig: el BOM se escribe una sola vez al inicio
+            with abrir(tmp_path, "wt", encoding="utf-8-sig", newline="") as f:
+
+                for lote in self._lotes(origen, entradas, filas_por_lote):
+
+                    lote.to_pandas().to_csv(f, index=False, sep=";", header=(filas == 0))
+
+                    filas += lote.num_rows
+
+                if filas == 0:
+                    f.write(";".join(columnas_dataset(origen)) + "\n")
+
+            os.replace(tmp_path, csv_path)
+
+            self.manifiesto.registrar("gold", csv_name, csv_path, entradas)
+
+            logger.info(f"✅ CSV generado correctamente en: {csv_path} ({filas} registros)")
+
+            return csv_path
 
         except Exception as e:
 
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
             logger.error(f"❌ Error al convertir a CSV: {e}")
 
+            return f"❌ Error al convertir a CSV: {e}"
+
+
+
+    def construir_tablas_gold(self, ventanas: tuple = VENTANAS_MOVILES):
+
+        """
+        Construye las tablas agregadas de Gold a partir de Silver, con operaciones
+        vectorizadas de pandas (una agregación agrupada, sin loops por par):
+        - currencies_ohlc_diario.parquet: OHLC diario del valor de compra y spread compra/venta
+        - currencies_estadisticas_moviles.parquet: media y volatilidad móviles del cierre
+        Se escriben como Parquet adicionales en Gold, así CargadorBigQuery los sube
+        junto con el resto. Devuelve las rutas generadas.
+        """
+
+        logger = setup_logger("o4_modeling_logs/construir_tablas_gold.log")
+
+        logger.info("INICIO construcción de tablas agregadas de Gold...")
+
+        parquet_file = os.path.join(self.silver_path, self.nombre_parquet)
+
+        dataset_silver = os.path.join(self.silver_path, self.nombre_dataset)
+
+        try:
+
+            if es_dataset(dataset_silver):
+
+                origen = dataset_silver
+
+            elif not os.path.isfile(parquet_file):
+
+                logger.error(f"❌ Archivo no encontrado: {parquet_file}")
+
+                return f"❌ Archivo no encontrado: {parquet_file}"
+
+            else:
+
+                origen = parquet_file
+
+            entradas = {**self._entradas(origen), "ventanas": list(ventanas)}
+
+            salidas = {
+                "currencies_ohlc_diario.parquet": None,
+                "currencies_estadisticas_moviles.parquet": None,
+            }
+
+            paths = [os.path.join(self.gold_path, nombre) for nombre in salidas]
+
+            if all(self._esta_vigente(nombre, entradas, path) for nombre, path in zip(salidas, paths)):
+
+                logger.info("✅ Silver sin cambios, se conservan las tablas agregadas.")
+
+                return paths
+
+            tabla = None
+
+            if self.contexto is not None and not os.path.isdir(origen):
+                tabla = self.contexto.obtener("silver", os.path.basename(origen), entradas["silver"],
+                                              self.pares, self.desde, self.hasta)
+
+            if tabla is None:
+                tabla = leer_dataset(origen, self.pares, self.desde, self.hasta)
+
+            diario = ohlc_diario(tabla.to_pandas())
+
+            salidas["currencies_ohlc_diario.parquet"] = a_tabla_arrow(diario, ESQUEMA_OHLC_DIARIO)
+
+            salidas["currencies_estadisticas_moviles.parquet"] = a_tabla_arrow(
+                estadisticas_moviles(diario, ventanas), esquema_estadisticas_moviles(ventanas)
+            )
+
+            for (nombre, salida), path in zip(salidas.items(), paths):
+
+                tmp_path = f"{path}.tmp"
+
+                pq.write_table(salida, tmp_path, compression=SILVER_COMPRESION)
+
+                os.replace(tmp_path, path)
+
+                registro = self.manifiesto.registrar("gold", nombre, path, entradas)
+
+                if self.contexto is not None:
+                    self.contexto.guardar("gold", nombre, salida, registro["hash"])
+
+                logger.info(f"✅ Tabla {nombre} generada ({salida.num_rows} registros).")
+
+            return paths
+
+        except Exception as e:
+
+            logger.error(f"❌ Error al construir las tablas agregadas de Gold: {e}")
+
+            return f"❌ Error al construir las tablas agregadas de Gold: {e}"
+
+
+
+    def construir_tasas_cruzadas(self, monedas: list = None, formato: str = CRUCES_FORMATO,
+                                 tolerancia_dias: int = CRUCES_TOLERANCIA_DIAS):
+
+        """
+        Materializa en Gold la matriz de tasas cruzadas entre todas las monedas
+        cotizadas contra BRL (currencies_tasas_cruzadas.parquet):
+        - alinea cada moneda en una grilla diaria común con un as-of join
+          (última cotización media de cada día, con antigüedad máxima tolerancia_dias)
+        - deriva tasa(i -> j) = BRL por i / BRL por j con broadcasting de NumPy,
+          por bloques de días (sin loops de DataFrames por par de monedas)
+
+        Parameters:
+        - monedas (list): subconjunto de monedas (ej. ["USD", "EUR", "BRL"]); por defecto CRUCES_MONEDAS o todas.
+        - formato (str): "largo" (quote_date, from_currency, to_currency, rate) o
+          "ancho" (quote_date, from_currency y una columna rate_<moneda> por destino).
+        """
+
+        logger = setup_logger("o4_modeling_logs/construir_tasas_cruzadas.log")
+
+        logger.info("INICIO construcción de la matriz de tasas cruzadas...")
+
+        nombre = "currencies_tasas_cruzadas.parquet"
+
+        path = os.path.join(self.gold_path, nombre)
+
+        monedas = monedas or CRUCES_MONEDAS or None
+
+        try:
+
+            origen = self._origen_silver()
+
+            if origen is None:
+
+                logger.error(f"❌ Archivo no encontrado: {os.path.join(self.silver_path, self.nombre_parquet)}")
+
+                return f"❌ Archivo no encontrado: {os.path.join(self.silver_path, self.nombre_parquet)}"
+
+            entradas = {**self._entradas(origen), "monedas": sorted(monedas) if monedas else None,
+                        "formato": formato, "tolerancia_dias": tolerancia_dias}
+
+            if self._esta_vigente(nombre, entradas, path):
+
+                logger.info("✅ Silver sin cambios, se conserva la matriz de tasas cruzadas.")
+
+                return path
+
+            tabla = None
+
+            if self.contexto is not None and not os.path.isdir(origen):
+                tabla = self.contexto.obtener("silver", os.path.basename(origen), entradas["silver"],
+                                              self.pares, self.desde, self.hasta)
+
+            if tabla is None:
+                tabla = leer_dataset(origen, self.pares, self.desde, self.hasta)
+
+            columnas = ["base_currency", "destination_currency", "purchase_value", "sale_value", "date_time"]
+
+            fechas, monedas, matriz = tasas_brl_por_dia(tabla.select(columnas).to_pandas(), monedas, tolerancia_dias)
+
+            esquema = ESQUEMA_TASAS_CRUZADAS_LARGO if formato == "largo" else esquema_tasas_cruzadas_ancho(monedas)
+
+            tmp_path = f"{path}.tmp"
+
+            filas = 0
+
+            with pq.ParquetWriter(tmp_path, esquema, compression=SILVER_COMPRESION) as writer:
+
+                for lote in lotes_tasas_cruzadas(fechas, monedas, matriz, formato):
+
+                    writer.write_table(lote)
+
+                    filas += lote.num_rows
+
+            os.replace(tmp_path, path)
+
+            self.manifiesto.registrar("gold", nombre, path, entradas)
+
+            logger.info(f"✅ Tabla {nombre} generada: {len(monedas)} monedas x {len(fechas)} días ({filas} registros).")
+
+            return path
+
+        except Exception as e:
+
+            logger.error(f"❌ Error al construir la matriz de tasas cruzadas: {e}")
+
+            return f"❌ Error al construir la matriz de tasas cruzadas: {e}"
+
 
 
     def procesar_modelado_completo(self):
@@ -105,14 +444,95 @@ class CurrencyModeler:
         Ejecuta toda la etapa de modelado:
         - Copia el archivo .parquet a Gold
         - Genera el archivo .csv en Gold
+        - Genera las tablas agregadas en Gold
+        - Genera la matriz de tasas cruzadas en Gold
+
+        Devuelve la lista de resultados de cada paso, o el primer mensaje "❌ ..."
+        si alguno falló (los pasos son independientes: se corren todos igual).
         """
 
         logger = setup_logger("o4_modeling_logs/procesar_modelado_completo.log")
 
         logger.info("INICIO del proceso completo de modelado...")
 
-        self.copiar_parquet_a_gold()
+        resultados = [
+            self.copiar_parquet_a_gold(),
+            self.convertir_a_csv(),
+            self.construir_tablas_gold(),
+            self.construir_tasas_cruzadas(),
+        ]
+
+        errores = [r for r in resultados if isinstance(r, str) and r.startswith("❌")]
+
+        if errores:
+
+            logger.error(f"FIN del proceso de modelado. ❌ {len(errores)} de {len(resultados)} pasos fallaron.")
+
+            return errores[0]
+
+        logger.info("FIN del proceso de modelado. ✅")
+
+        return resultados
+
+
+
+    def _origen_silver(self):
+
+        """
+        Dataset particionado de Silver si existe; si no, el Parquet único (None si no hay ninguno).
+        """
+
+        dataset_silver = os.path.join(self.silver_path, self.nombre_dataset)
+
+        if es_dataset(dataset_silver):
+            return dataset_silver
+
+        parquet_file = os.path.join(self.silver_path, self.nombre_parquet)
+
+        return parquet_file if os.path.isfile(parquet_file) else None
+
+
+
+    def _lotes(self, origen: str, entradas: dict, filas_por_lote: int):
+
+        """
+        Lotes de Silver: desde la tabla en memoria del contexto si corresponde
+        al mismo archivo (mismo hash), o leyendo el Parquet/dataset de disco.
+        """
+
+        if self.contexto is not None and not os.path.isdir(origen):
+
+            lotes = self.contexto.iterar_lotes("silver", os.path.basename(origen), entradas["silver"],
+                                               self.pares, self.desde, self.hasta, filas_por_lote)
+
+            if lotes is not None:
+                return lotes
+
+        return iterar_lotes(origen, self.pares, self.desde, self.hasta, filas_por_lote)
+
+
+
+    def _entradas(self, origen: str) -> dict:
+
+        """
+        Entradas que determinan una salida de Gold: hash de Silver y filtros aplicados.
+        El hash de un archivo se memoriza por (mtime, tamaño) para no recalcularlo en cada paso.
+        """
+
+        if os.path.isdir(origen):
+            return {"silver": hash_ruta(origen), "filtros": [self.pares, self.desde, self.hasta]}
+
+        estado = os.stat(origen)
+
+        clave = (origen, estado.st_mtime_ns, estado.st_size)
+
+        if clave not in self._hashes:
+            self._hashes[clave] = hash_ruta(origen)
+
+        return {"silver": self._hashes[clave], "filtros": [self.pares, self.desde, self.hasta]}
+
+
 
-        self.convertir_a_csv()
+    def _esta_vigente(self, nombre: str, entradas: dict, salida: str) -> bool:
 
-        logger.info("FIN del proceso de modelado.")
+        return not self.forzar and os.path.exists(salida) and self.manifiesto.esta_vigente("gold", nombre, entradas, salida)
@@ -1,26 +1,119 @@
+import io
 import os
+import uuid
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from concurrent.futures import ThreadPoolExecutor
 from google.cloud import bigquery
 from google.oauth2 import service_account
 from meli_project.params import *
+from meli_project.logic.utils.manifiesto import Manifiesto, hash_ruta
+from meli_project.logic.utils.particiones import columnas_dataset, es_dataset, leer_dataset
 from meli_project.logic.utils.utils import *
 
 
 
 
+# Clave natural de las cotizaciones: par + instante de la cotización
+CLAVES_MERGE = ["base_currency", "destination_currency", "date_time"]
+
+
+
+
+def esquema_bigquery(esquema: pa.Schema) -> list:
+
+    """
+    Traduce un esquema Arrow al esquema explícito de BigQuery (SchemaField).
+    Las columnas diccionario se cargan como su tipo de valores (STRING).
+    """
+
+    campos = []
+
+    for campo in esquema:
+
+        tipo = campo.type.value_type if pa.types.is_dictionary(campo.type) else campo.type
+
+        if pa.types.is_timestamp(tipo):
+            tipo_bq = "TIMESTAMP"
+
+        elif pa.types.is_date(tipo):
+            tipo_bq = "DATE"
+
+        elif pa.types.is_floating(tipo):
+            tipo_bq = "FLOAT64"
+
+        elif pa.types.is_integer(tipo):
+            tipo_bq = "INT64"
+
+        elif pa.types.is_boolean(tipo):
+            tipo_bq = "BOOL"
+
+        else:
+            tipo_bq = "STRING"
+
+        campos.append(bigquery.SchemaField(campo.name, tipo_bq, mode="NULLABLE" if campo.nullable else "REQUIRED"))
+
+    return campos
+
+
+
+
 class CargadorBigQuery:
 
 
-    def __init__(self, dataset="dataframes_meli", project_id="reportes-bedoya-389011"):
+    def __init__(self, dataset="dataframes_meli", project_id="reportes-bedoya-389011", forzar: bool = False,
+                 client=None, modo_carga: str = BQ_MODO_CARGA, max_cargas_simultaneas: int = BQ_MAX_CARGAS_SIMULTANEAS,
+                 incremental: bool = BQ_INCREMENTAL, contexto=None):
 
-        self.logger = setup_logger('o5_serving_logs/carga_bigquery.log')
+        """
+        Cargador de las tablas de Gold a BigQuery. Cada carga completa queda
+        registrada en el manifiesto con el hash del archivo subido; si el archivo
+        no cambió desde la última carga, se saltea (salvo forzar=True).
+
+        Parameters:
+        - client: cliente de BigQuery a usar (permite inyectar un cliente falso local).
+        - modo_carga (str): "load_job" sube el Parquet directo como load job;
+          "to_gbq" mantiene la carga vía DataFrame.
+        - max_cargas_simultaneas (int): load jobs que se envían en paralelo.
+        - incremental (bool): las tablas con clave (par, date_time) se actualizan con
+          staging + MERGE (ver cargar_incremental) en lugar de reemplazarse.
+        - contexto (ContextoEjecucion): si la tabla de Gold ya está en memoria (misma
+          corrida, mismo hash), se usa en vez de volver a leer el Parquet.
+        """
 
-        # Inicializar credenciales
+        self.logger = setup_logger('o5_serving_logs/carga_bigquery.log')
 
-        self.credentials = service_account.Credentials.from_service_account_file(GOOGLE_APPLICATION_CREDENTIALS)
         self.project_id = project_id
         self.dataset = dataset
 
+        # Inicializar credenciales y cliente (salvo que se inyecte uno)
+
+        if client is None:
+
+            self.credentials = service_account.Credentials.from_service_account_file(GOOGLE_APPLICATION_CREDENTIALS)
+
+            client = bigquery.Client(project=project_id, credentials=self.credentials)
+
+        else:
+
+            self.credentials = getattr(client, "_credentials", None)
+
+        self.client = client
+
+        self.modo_carga = modo_carga
+
+        self.max_cargas_simultaneas = max(1, int(max_cargas_simultaneas))
+
+        self.incremental = incremental
+
+        self.forzar = forzar
+
+        self.contexto = contexto
+
+        self.manifiesto = Manifiesto()
+
         # Ruta de archivos .parquet en gold
         self.gold_path = os.path.abspath(
             os.path.join(os.path.dirname(__file__), "../../../data/o3_gold")
@@ -29,11 +122,36 @@ class CargadorBigQuery:
 
 
 
-    def cargar_archivo(self, nombre_archivo):
+    def cargar_archivo(self, nombre_archivo, pares: list = None, desde: str = None, hasta: str = None,
+                       particion: str = None, write_disposition: str = None):
+
+
+        """
+        Carga un archivo .parquet (o un dataset particionado de gold) a BigQuery.
+        Con filtros por pares/fechas solo se leen las particiones necesarias
+        y las filas se agregan a la tabla en lugar de reemplazarla.
+
+        Parameters:
+        - particion (str): partición diaria destino "YYYYMMDD" (decorador tabla$YYYYMMDD).
+        - write_disposition (str): WRITE_TRUNCATE / WRITE_APPEND; por defecto TRUNCATE
+          en cargas completas y APPEND en cargas filtradas (incrementales).
+        """
+
+        carga = self._iniciar_carga(nombre_archivo, pares, desde, hasta, particion, write_disposition)
+
+        if not isinstance(carga, dict):
+            return carga
+
+        return self._finalizar_carga(carga)
+
+
+
 
+    def _iniciar_carga(self, nombre_archivo, pares=None, desde=None, hasta=None, particion=None, write_disposition=None):
 
         """
-        Carga un archivo .parquet específico a BigQuery.
+        Valida el archivo y dispara la carga. En modo "load_job" devuelve la carga
+        con el job en curso (sin esperar a que BigQuery termine de procesarlo).
         """
 
         path = os.path.join(self.gold_path, nombre_archivo)
@@ -42,30 +160,146 @@ class CargadorBigQuery:
             self.logger.error(f"❌ No se encontró el archivo {nombre_archivo}")
             return f"❌ No se encontró el archivo {nombre_archivo}"
 
+        filtrado = bool(pares or desde or hasta)
+
+        tabla_destino = nombre_archivo.replace(".parquet", "")
+
+        tabla_id = f"{self.dataset}.{tabla_destino}"
+
+        entradas = {"gold": hash_ruta(path)}
+
+        if not filtrado and not particion and not self.forzar and self.manifiesto.esta_vigente("bigquery", tabla_id, entradas):
+
+            self.logger.info(f"✅ '{nombre_archivo}' sin cambios desde la última carga en '{tabla_id}'. Se saltea.")
+
+            return tabla_id
+
+        carga = {"nombre": nombre_archivo, "tabla_id": tabla_id, "entradas": entradas,
+                 "completa": not filtrado and not particion, "job": None}
+
         try:
-            df = pd.read_parquet(path)
+            if self.modo_carga == "load_job":
 
-            tabla_destino = nombre_archivo.replace(".parquet", "")
+                carga["job"] = self._enviar_load_job(path, tabla_id, pares, desde, hasta, particion, write_disposition,
+                                                     hash_archivo=entradas["gold"])
+
+                return carga
+
+            if es_dataset(path) or filtrado or self._en_memoria(path, entradas["gold"]) is not None:
+                df = self._leer_gold(path, entradas["gold"], pares, desde, hasta).to_pandas()
+
+            else:
+                df = pd.read_parquet(path)
 
             df.to_gbq(
-                destination_table=f"{self.dataset}.{tabla_destino}",
+                destination_table=tabla_id,
                 project_id=self.project_id,
                 credentials=self.credentials,
-                if_exists="replace"
+                if_exists="append" if filtrado else "replace"
             )
 
-            self.logger.info(f"✅ Archivo '{nombre_archivo}' cargado con éxito en '{self.dataset}.{tabla_destino}'.")
+            return carga
 
         except Exception as e:
 
             self.logger.error(f"❌ Error al cargar '{nombre_archivo}': {e}")
 
+            return f"❌ Error al cargar '{nombre_archivo}': {e}"
+
 
 
-    def cargar_todas_tablas_gold(self):
+
+    def _enviar_load_job(self, path, tabla_id, pares=None, desde=None, hasta=None, particion=None, write_disposition=None,
+                         hash_archivo=None):
+
+        """
+        Envía el Parquet como load job de BigQuery, sin pasar por pandas.
+        Los datasets particionados o las cargas filtradas se leen con Arrow
+        (solo las particiones necesarias) y se suben como un Parquet en memoria.
+        """
+
+        filtrado = bool(pares or desde or hasta)
+
+        if es_dataset(path) or filtrado:
+
+            tabla = self._leer_gold(path, hash_archivo, pares, desde, hasta)
+
+            buffer = pa.BufferOutputStream()
+
+            pq.write_table(tabla, buffer)
+
+            fuente = io.BytesIO(buffer.getvalue().to_pybytes())
+
+            esquema = tabla.schema
+
+        else:
+
+            fuente = open(path, "rb")
+
+            esquema = pq.read_schema(path)
+
+        destino = f"{self.project_id}.{tabla_id}" + (f"${particion}" if particion else "")
+
+        if write_disposition is None:
+            write_disposition = "WRITE_APPEND" if filtrado else "WRITE_TRUNCATE"
+
+        job_config = bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.PARQUET,
+            write_disposition=write_disposition,
+            schema=esquema_bigquery(esquema),
+        )
+
+        if particion:
+            job_config.time_partitioning = bigquery.TimePartitioning(type_=bigquery.TimePartitioningType.DAY, field="date_time")
+
+        try:
+            return self.client.load_table_from_file(fuente, destino, job_config=job_config)
+
+        finally:
+            fuente.close()
+
+
+
+
+    def _finalizar_carga(self, carga: dict):
+
+        """
+        Espera el load job (si lo hay) y registra la carga completa en el manifiesto.
+        Devuelve el id de la tabla, o un mensaje "❌ ..." si el job falló.
+        """
+
+        try:
+            if carga["job"] is not None:
+
+                carga["job"].result()
+
+                self.logger.info(f"Load job {getattr(carga['job'], 'job_id', '')}: {getattr(carga['job'], 'output_rows', None)} filas.")
+
+            if carga["completa"]:
+                self.manifiesto.registrar("bigquery", carga["tabla_id"], entradas=carga["entradas"], hash_salida=carga["entradas"]["gold"])
+
+            self.logger.info(f"✅ Archivo '{carga['nombre']}' cargado con éxito en '{carga['tabla_id']}'.")
+
+            return carga["tabla_id"]
+
+        except Exception as e:
+
+            self.logger.error(f"❌ Error al cargar '{carga['nombre']}': {e}")
+
+            return f"❌ Error al cargar '{carga['nombre']}': {e}"
+
+
+
+    def cargar_todas_tablas_gold(self, pares: list = None, desde: str = None, hasta: str = None):
 
         """
         Carga todos los archivos .parquet desde la carpeta gold a BigQuery.
+        Los load jobs de las distintas tablas se envían en paralelo y recién
+        después se espera el resultado de cada uno.
+
+        Devuelve la lista de tablas cargadas, o un mensaje "❌ ..." si alguna
+        falló o (en una carga completa) no quedó registrada en el manifiesto
+        con el hash actual de su archivo de Gold.
         """
 
         self.logger.info("INICIO CARGA de archivos .parquet a BigQuery")
@@ -78,7 +312,24 @@ class CargadorBigQuery:
             return "❌ Carpeta GOLD no encontrada."
 
 
-        archivos = [f for f in os.listdir(self.gold_path) if f.endswith(".parquet")]
+        # Archivos .parquet sueltos y datasets particionados (carpetas)
+        archivos = [
+            f for f in os.listdir(self.gold_path)
+            if f.endswith(".parquet") or es_dataset(os.path.join(self.gold_path, f))
+        ]
+
+
+        # "x.parquet" y la carpeta "x/" van a la misma tabla: se carga solo el dataset
+        # (el .parquet es un resto de una corrida anterior con Silver monolítico)
+        por_tabla = {}
+
+        for archivo in sorted(archivos, key=lambda a: es_dataset(os.path.join(self.gold_path, a))):
+            por_tabla[archivo.replace(".parquet", "")] = archivo
+
+        for descartado in sorted(set(archivos) - set(por_tabla.values())):
+            self.logger.warning(f"⚠️ '{descartado}' se saltea: '{descartado.replace('.parquet', '')}' ya es un dataset en GOLD.")
+
+        archivos = sorted(por_tabla.values())
 
 
         if not archivos:
@@ -88,8 +339,274 @@ class CargadorBigQuery:
             return "⚠️ No se encontraron archivos .parquet en GOLD."
 
 
-        for archivo in archivos:
+        resultados = {}
 
-            self.cargar_archivo(archivo)
+        por_cargar = archivos
+
+        if self.incremental:
+
+            mergeables = [a for a in archivos if self._es_mergeable(os.path.join(self.gold_path, a))]
+
+            for archivo in mergeables:
+                resultados[archivo] = self.cargar_incremental(archivo, pares, desde)
+
+            por_cargar = [a for a in archivos if a not in mergeables]
+
+        with ThreadPoolExecutor(max_workers=self.max_cargas_simultaneas) as executor:
+
+            cargas = list(executor.map(lambda archivo: self._iniciar_carga(archivo, pares, desde, hasta), por_cargar))
+
+        for archivo, carga in zip(por_cargar, cargas):
+            resultados[archivo] = self._finalizar_carga(carga) if isinstance(carga, dict) else carga
+
+        fallidas = [a for a in archivos if not isinstance(resultados.get(a), str) or resultados[a].startswith("❌")]
+
+        # Una carga completa solo cuenta si el manifiesto tiene el hash actual del archivo
+        if not pares and not desde and not hasta:
+            fallidas += [a for a in archivos if a not in fallidas and not self._carga_registrada(a)]
+
+        if fallidas:
+
+            self.logger.error(f"FIN CARGA. ❌ Fallaron {len(fallidas)} de {len(archivos)} tablas: {sorted(fallidas)}")
+
+            return f"❌ Fallaron {len(fallidas)} de {len(archivos)} tablas en BigQuery: {sorted(fallidas)}"
 
         self.logger.info("FIN CARGA de tablas en BigQuery.")
+
+        return [resultados[a] for a in archivos]
+
+
+
+
+    def cargar_incremental(self, nombre_archivo="currencies_transformadas.parquet", pares: list = None, desde: str = None):
+
+        """
+        Carga incremental con upsert:
+        1. Crea (si no existe) la tabla destino particionada por día de date_time
+           y clusterizada por moneda.
+        2. Sube a una tabla de staging las filas de Gold (o las de los pares/fechas indicados).
+        3. Hace MERGE por (par, date_time) sobre el destino, sin dejarlo vacío en ningún momento:
+           inserta las claves que no están (incluida historia más vieja que lo ya cargado,
+           como la de un backfill) y actualiza las que cambiaron de valor.
+        4. Verifica que el conteo final sea el conteo previo + las claves que no estaban.
+        """
+
+        path = os.path.join(self.gold_path, nombre_archivo)
+
+        if not os.path.exists(path):
+            self.logger.error(f"❌ No se encontró el archivo {nombre_archivo}")
+            return f"❌ No se encontró el archivo {nombre_archivo}"
+
+        tabla_destino = nombre_archivo.replace(".parquet", "")
+
+        tabla_id = f"{self.dataset}.{tabla_destino}"
+
+        destino = f"{self.project_id}.{tabla_id}"
+
+        # Staging propio de esta carga: dos corridas simultáneas no se pisan ni se borran la tabla
+        staging = f"{destino}__staging_{uuid.uuid4().hex[:12]}"
+
+        entradas = {"gold": hash_ruta(path), "modo": "merge"}
+
+        if not pares and not desde and not self.forzar and self.manifiesto.esta_vigente("bigquery", tabla_id, entradas):
+
+            self.logger.info(f"✅ '{nombre_archivo}' sin cambios desde el último MERGE en '{tabla_id}'. Se saltea.")
+
+            return tabla_id
+
+        self.logger.info(f"INICIO carga incremental (MERGE) de '{nombre_archivo}' en '{tabla_id}'")
+
+        try:
+            tabla = self._leer_gold(path, entradas["gold"], pares, desde)
+
+            self._crear_tabla_destino(destino, tabla.schema)
+
+            if tabla.num_rows == 0:
+
+                if not pares and not desde:
+                    self.manifiesto.registrar("bigquery", tabla_id, entradas=entradas, hash_salida=entradas["gold"])
+
+                self.logger.info(f"✅ Sin filas para '{tabla_id}'.")
+
+                return tabla_id
+
+            self._subir_tabla(tabla, staging, "WRITE_TRUNCATE")
+
+            filas_antes = self._consultar_escalar(f"SELECT COUNT(*) AS n FROM `{destino}`")
+
+            filas_a_insertar = self._consultar_escalar(
+                f"SELECT COUNT(*) AS n FROM (SELECT DISTINCT {', '.join(CLAVES_MERGE)} FROM `{staging}`) S "
+                f"LEFT JOIN `{destino}` T USING ({', '.join(CLAVES_MERGE)}) WHERE T.date_time IS NULL"
+            )
+
+            desde_staging = pc.min(tabla["date_time"]).as_py()
+
+            self.client.query(self._sql_merge(destino, staging, tabla.schema.names, desde_staging)).result()
+
+            filas_despues = self._consultar_escalar(f"SELECT COUNT(*) AS n FROM `{destino}`")
+
+            if filas_despues != filas_antes + filas_a_insertar:
+
+                raise ValueError(
+                    f"Conteo inconsistente tras el MERGE: {filas_antes} + {filas_a_insertar} != {filas_despues}"
+                )
+
+            if not pares and not desde:
+                self.manifiesto.registrar("bigquery", tabla_id, entradas=entradas, hash_salida=entradas["gold"])
+
+            self.logger.info(
+                f"✅ MERGE en '{tabla_id}' completado. Staging: {tabla.num_rows} filas, "
+                f"insertadas: {filas_a_insertar}, total: {filas_despues}."
+            )
+
+            return tabla_id
+
+        except Exception as e:
+
+            self.logger.error(f"❌ Error en la carga incremental de '{nombre_archivo}': {e}")
+
+            return f"❌ Error en la carga incremental de '{nombre_archivo}': {e}"
+
+        finally:
+
+            self.client.delete_table(staging, not_found_ok=True)
+
+
+
+
+    def _carga_registrada(self, nombre_archivo: str) -> bool:
+
+        """
+        True si el manifiesto registra la tabla en BigQuery con el hash actual del archivo de Gold.
+        """
+
+        previa = self.manifiesto.obtener("bigquery", f"{self.dataset}.{nombre_archivo.replace('.parquet', '')}")
+
+        return bool(previa) and previa.get("hash") == hash_ruta(os.path.join(self.gold_path, nombre_archivo))
+
+
+
+
+    def _en_memoria(self, path: str, hash_archivo: str = None, pares=None, desde=None, hasta=None) -> pa.Table:
+
+        if self.contexto is None or es_dataset(path):
+            return None
+
+        return self.contexto.obtener("gold", os.path.basename(path), hash_archivo, pares, desde, hasta)
+
+
+
+
+    def _leer_gold(self, path: str, hash_archivo: str = None, pares=None, desde=None, hasta=None) -> pa.Table:
+
+        """
+        Tabla de Gold filtrada: desde el contexto en memoria si está disponible, si no desde disco.
+        """
+
+        tabla = self._en_memoria(path, hash_archivo, pares, desde, hasta)
+
+        if tabla is None:
+            tabla = leer_dataset(path, pares, desde, hasta)
+
+        return tabla
+
+
+
+
+    def _es_mergeable(self, path: str) -> bool:
+
+        """
+        Una tabla admite MERGE si tiene las columnas de la clave natural.
+        Solo se lee el esquema (footer / metadatos del dataset), nunca los datos.
+        """
+
+        try:
+            tabla = self._en_memoria(path)
+
+            if tabla is not None:
+                columnas = tabla.schema.names
+
+            else:
+                columnas = columnas_dataset(path) if es_dataset(path) else pq.read_schema(path).names
+
+        except Exception:
+            return False
+
+        return all(c in columnas for c in CLAVES_MERGE)
+
+
+
+
+    def _crear_tabla_destino(self, destino: str, esquema: pa.Schema):
+
+        tabla = bigquery.Table(destino, schema=esquema_bigquery(esquema))
+
+        tabla.time_partitioning = bigquery.TimePartitioning(type_=bigquery.TimePartitioningType.DAY, field="date_time")
+
+        tabla.clustering_fields = ["base_currency", "destination_currency"]
+
+        self.client.create_table(tabla, exists_ok=True)
+
+
+
+
+    def _subir_tabla(self, tabla: pa.Table, destino: str, write_disposition: str):
+
+        buffer = pa.BufferOutputStream()
+
+        pq.write_table(tabla, buffer)
+
+        job_config = bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.PARQUET,
+            write_disposition=write_disposition,
+            schema=esquema_bigquery(tabla.schema),
+        )
+
+        with io.BytesIO(buffer.getvalue().to_pybytes()) as fuente:
+            self.client.load_table_from_file(fuente, destino, job_config=job_config).result()
+
+
+
+
+    def _consultar_escalar(self, sql: str) -> int:
+
+        for fila in self.client.query(sql).result():
+            return fila["n"]
+
+        return 0
+
+
+
+
+    def _sql_merge(self, destino: str, staging: str, columnas: list, desde_staging) -> str:
+
+        """
+        MERGE por clave natural. El staging se deduplica por clave y el destino
+        se acota a las fechas presentes en staging para podar particiones. Las
+        filas que ya están con los mismos valores no se reescriben.
+        """
+
+        claves = ", ".join(CLAVES_MERGE)
+
+        condicion = " AND ".join(f"T.{c} = S.{c}" for c in CLAVES_MERGE)
+
+        valores = [c for c in columnas if c not in CLAVES_MERGE]
+
+        cambio = " OR ".join(f"T.{c} IS DISTINCT FROM S.{c}" for c in valores)
+
+        actualizacion = ", ".join(f"{c} = S.{c}" for c in valores)
+
+        cuando_coincide = f"WHEN MATCHED AND ({cambio}) THEN UPDATE SET {actualizacion}" if valores else ""
+
+        return f"""
+            MERGE `{destino}` T
+            USING (
+                SELECT * FROM `{staging}`
+                WHERE TRUE
+                QUALIFY ROW_NUMBER() OVER (PARTITION BY {claves} ORDER BY date_time) = 1
+            ) S
+            ON {condicion}
+               AND T.date_time >= TIMESTAMP("{desde_staging.isoformat()}")
+            {cuando_coincide}
+            WHEN NOT MATCHED THEN INSERT ({", ".join(columnas)}) VALUES ({", ".join(f"S.{c}" for c in columnas)})
+        """
@@ -0,0 +1,355 @@
+import os
+import re
+import gzip
+import json
+import threading
+
+
+
+
+# Campos de contexto que la API solo envía en el primer registro del payload
+CAMPOS_CABECERA = ["code", "codein", "name", "create_date"]
+
+
+# Formatos de almacenamiento bronze soportados (extensión del archivo por par):
+# - "json": el payload completo como un único documento JSON compacto
+# - "jsonl.gz": un registro por línea (JSON Lines) comprimido con gzip
+FORMATOS_BRONZE = ("json", "jsonl.gz")
+
+
+
+
+def ruta_bronze(bronze_path: str, pair: str, formato: str = "json") -> str:
+
+    """
+    Devuelve la ruta del archivo bronze de un par para el formato indicado.
+    """
+
+    if formato not in FORMATOS_BRONZE:
+        raise ValueError(f"Formato bronze no soportado: {formato}. Opciones: {FORMATOS_BRONZE}")
+
+    return os.path.join(bronze_path, f"{pair}.{formato}")
+
+
+
+
+def par_desde_archivo(file_name: str) -> str:
+
+    """
+    Obtiene el par (ej. USD-BRL) a partir del nombre de un archivo bronze.
+    """
+
+    for formato in sorted(FORMATOS_BRONZE, key=len, reverse=True):
+
+        if file_name.endswith(f".{formato}"):
+            return file_name[: -len(formato) - 1]
+
+    return file_name
+
+
+
+
+def listar_archivos_bronze(bronze_path: str) -> list:
+
+    """
+    Lista (en el orden de os.listdir) los archivos bronze de cualquier formato soportado.
+    """
+
+    return [
+        os.path.join(bronze_path, file)
+        for file in os.listdir(bronze_path)
+        if any(file.endswith(f".{formato}") for formato in FORMATOS_BRONZE)
+    ]
+
+
+
+
+# Un lock por archivo bronze, compartido por todo el proceso (ver lock_bronze)
+_LOCKS_BRONZE = {}
+
+_LOCK_LOCKS_BRONZE = threading.Lock()
+
+
+
+
+def lock_bronze(path: str) -> threading.Lock:
+
+    """
+    Lock del archivo bronze de un par. La extracción diaria y los shards del
+    backfill fusionan sobre el mismo archivo (leer_payload → fusionar_registros →
+    escribir_payload): ese ciclo completo se hace con este lock tomado para que
+    ninguna escritura pise a otra.
+    """
+
+    with _LOCK_LOCKS_BRONZE:
+        return _LOCKS_BRONZE.setdefault(os.path.abspath(path), threading.Lock())
+
+
+
+
+def escribir_payload(path: str, data: list):
+
+    """
+    Escribe el payload tal cual lo devuelve la API, sin indentación.
+    El formato se deduce de la extensión. La escritura es atómica
+    (archivo temporal + os.replace) para no dejar archivos a medias.
+    """
+
+    tmp_path = f"{path}.tmp"
+
+    if path.endswith(".jsonl.gz"):
+
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+
+            for registro in data:
+                f.write(json.dumps(registro, ensure_ascii=False, separators=(",", ":")))
+                f.write("\n")
+
+    else:
+
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+
+    os.replace(tmp_path, path)
+
+
+
+
+def iterar_registros(path: str):
+
+    """
+    Generador que devuelve los registros de un archivo bronze de a uno, sin
+    cargar el archivo completo: en JSON Lines se lee línea por línea y en .json
+    el array se decodifica elemento por elemento (ver _iterar_array_json).
+    """
+
+    if path.endswith(".jsonl.gz"):
+
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+
+            for linea in f:
+
+                if linea.strip():
+                    yield json.loads(linea)
+
+    else:
+
+        with open(path, "r", encoding="utf-8") as f:
+            yield from _iterar_array_json(f)
+
+
+
+
+# Caracteres leídos por bloque al decodificar un .json en streaming
+TAMANO_BLOQUE_JSON = 1 << 16
+
+
+_DECODER_JSON = json.JSONDecoder()
+
+
+_ESPACIOS = re.compile(r"[ \t\n\r]*")
+
+
+
+
+def _iterar_array_json(f, tamano_bloque: int = TAMANO_BLOQUE_JSON):
+
+    """
+    Decodifica un array JSON de a un elemento con el scanner de JSONDecoder,
+    leyendo el archivo en bloques: en memoria solo hay un bloque y el elemento
+    en curso. Lanza ValueError si el documento no es una lista.
+    """
+
+    buffer, pos, fin_archivo = "", 0, False
+
+    def completar(pos):
+
+        nonlocal buffer, fin_archivo
+
+        bloque = f.read(tamano_bloque)
+
+        fin_archivo = not bloque
+
+        buffer = buffer[pos:] + bloque
+
+        return 0
+
+    # Apertura del array
+    while True:
+
+        pos = _ESPACIOS.match(buffer, pos).end()
+
+        if pos < len(buffer):
+            break
+
+        if fin_archivo:
+            raise ValueError("El payload está vacío.")
+
+        pos = completar(pos)
+
+    if buffer[pos] != "[":
+        raise ValueError("El payload no es una lista de registros.")
+
+    pos += 1
+
+    esperando_elemento = True
+
+    while True:
+
+        pos = _ESPACIOS.match(buffer, pos).end()
+
+        if not esperando_elemento and pos < len(buffer) and buffer[pos] == ",":
+
+            esperando_elemento = True
+
+            pos = _ESPACIOS.match(buffer, pos + 1).end()
+
+        if pos >= len(buffer):
+
+            if fin_archivo:
+                raise ValueError("Array JSON sin cerrar.")
+
+            pos = completar(pos)
+
+            continue
+
+        if buffer[pos] == "]":
+            return
+
+        if not esperando_elemento:
+            raise ValueError(f"Se esperaba ',' o ']' en el array JSON y se encontró {buffer[pos]!r}.")
+
+        try:
+            elemento, fin = _DECODER_JSON.scan_once(buffer, pos)
+
+        except (json.JSONDecodeError, StopIteration):
+
+            # Elemento cortado al final del bloque: se lee más y se reintenta
+            if fin_archivo:
+                raise ValueError(f"Elemento JSON inválido en la posición {pos} del bloque.")
+
+            pos = completar(pos)
+
+            continue
+
+        # Un escalar cortado en el borde del bloque se decodifica igual ("12" de "12.5",
+        # "1" de "1e5"): solo se acepta si después ya se leyó la ',' o el ']' que lo cierra
+        siguiente = _ESPACIOS.match(buffer, fin).end()
+
+        if not fin_archivo and (siguiente >= len(buffer) or buffer[siguiente] not in ",]"):
+
+            pos = completar(pos)
+
+            continue
+
+        yield elemento
+
+        pos, esperando_elemento = fin, False
+
+
+
+
+def leer_registros(path: str) -> list:
+
+    """
+    Lee todos los registros de un archivo bronze. Para quien necesita el
+    payload completo en memoria: en .json un json.load es más rápido que
+    decodificar elemento por elemento. Lanza ValueError si no es una lista.
+    """
+
+    if path.endswith(".jsonl.gz"):
+        return list(iterar_registros(path))
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    if not isinstance(data, list):
+        raise ValueError("El payload no es una lista de registros.")
+
+    return data
+
+
+
+
+def leer_payload(path: str):
+
+    """
+    Lee un payload bronze completo. Devuelve None si el archivo no existe
+    o no se puede interpretar.
+    """
+
+    if not os.path.isfile(path):
+        return None
+
+    try:
+        return leer_registros(path)
+
+    except (OSError, ValueError, EOFError):
+        return None
+
+
+
+
+def ultimo_timestamp(registros) -> int:
+
+    """
+    Devuelve el timestamp (epoch en segundos) más reciente de un payload,
+    o None si no hay registros con timestamp válido.
+    """
+
+    if not isinstance(registros, list):
+        return None
+
+    timestamps = []
+
+    for registro in registros:
+
+        try:
+            timestamps.append(int(registro["timestamp"]))
+
+        except (KeyError, TypeError, ValueError):
+            continue
+
+    return max(timestamps) if timestamps else None
+
+
+
+
+def fusionar_registros(existentes: list, nuevos: list) -> list:
+
+    """
+    Une dos payloads de la API (lista con cabecera en el primer registro)
+    sin duplicar timestamps. Ante un mismo timestamp gana el registro nuevo.
+    El resultado queda ordenado del más reciente al más antiguo, con la
+    cabecera (code, codein, name, create_date) solo en el primer registro,
+    igual que la respuesta original de la API.
+    """
+
+    existentes = existentes if isinstance(existentes, list) else []
+    nuevos = nuevos if isinstance(nuevos, list) else []
+
+    cabecera = {}
+
+    for payload in (existentes, nuevos):
+
+        if payload and isinstance(payload[0], dict):
+            cabecera.update({k: payload[0][k] for k in CAMPOS_CABECERA if k in payload[0]})
+
+    por_timestamp = {}
+
+    for registro in existentes + nuevos:
+
+        try:
+            clave = int(registro["timestamp"])
+
+        except (KeyError, TypeError, ValueError):
+            continue
+
+        por_timestamp[clave] = {k: v for k, v in registro.items() if k not in CAMPOS_CABECERA}
+
+    fusionados = [por_timestamp[ts] for ts in sorted(por_timestamp, reverse=True)]
+
+    if fusionados:
+        fusionados[0] = {**cabecera, **fusionados[0]}
+
+    return fusionados
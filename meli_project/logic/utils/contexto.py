@@ -0,0 +1,71 @@
+import threading
+import pyarrow as pa
+from meli_project.logic.utils.particiones import filtrar_tabla
+
+
+
+
+class ContextoEjecucion:
+
+
+
+    def __init__(self):
+
+        """
+        Contexto de una corrida del pipeline: guarda en memoria las tablas Arrow
+        ya escritas en disco para que las etapas siguientes (modelado, carga)
+        las reutilicen sin volver a decodificar el Parquet.
+
+        Cada tabla se guarda junto al hash del archivo escrito (el mismo del
+        manifiesto); si quien la pide pasa un hash distinto, el archivo cambió
+        en disco y se devuelve None para que se lea de nuevo.
+        """
+
+        self._tablas = {}
+
+        self._lock = threading.Lock()
+
+
+
+
+    def guardar(self, capa: str, nombre: str, tabla: pa.Table, hash_archivo: str = None):
+
+        with self._lock:
+            self._tablas[(capa, nombre)] = (tabla, hash_archivo)
+
+
+
+
+    def obtener(self, capa: str, nombre: str, hash_archivo: str = None, pares: list = None,
+                desde: str = None, hasta: str = None) -> pa.Table:
+
+        """
+        Devuelve la tabla (filtrada por pares/fechas si se indican) o None si no
+        está en memoria o no corresponde al archivo con ese hash.
+        """
+
+        with self._lock:
+            tabla, hash_guardado = self._tablas.get((capa, nombre), (None, None))
+
+        if tabla is None or (hash_archivo is not None and hash_archivo != hash_guardado):
+            return None
+
+        return filtrar_tabla(tabla, pares, desde, hasta)
+
+
+
+
+    def iterar_lotes(self, capa: str, nombre: str, hash_archivo: str = None, pares: list = None,
+                     desde: str = None, hasta: str = None, filas_por_lote: int = 100_000):
+
+        """
+        Igual que particiones.iterar_lotes pero sobre la tabla en memoria
+        (cada lote es una vista, no una copia). None si la tabla no está.
+        """
+
+        tabla = self.obtener(capa, nombre, hash_archivo, pares, desde, hasta)
+
+        if tabla is None:
+            return None
+
+        return (pa.Table.from_batches([batch]) for batch in tabla.to_batches(max_chunksize=filas_por_lote) if batch.num_rows)
@@ -0,0 +1,88 @@
+import pandas as pd
+import pyarrow as pa
+
+
+
+
+##################  ESQUEMAS ARROW  ##################
+
+
+# Columnas de bronze que usa el camino Arrow (valores crudos de la API ya tipados)
+BRONZE_ARROW_SCHEMA = pa.schema([
+    ("code", pa.dictionary(pa.int32(), pa.string())),
+    ("codein", pa.dictionary(pa.int32(), pa.string())),
+    ("bid", pa.float64()),
+    ("ask", pa.float64()),
+    ("timestamp", pa.int64()),
+])
+
+
+# Renombres bronze → silver según la consigna
+RENOMBRES_SILVER = {
+    "code": "base_currency",
+    "codein": "destination_currency",
+    "bid": "purchase_value",
+    "ask": "sale_value",
+    "timestamp": "date_time",
+}
+
+
+# Tipos float admitidos para las columnas de valores en silver
+TIPOS_FLOAT = {"float32": pa.float32(), "float64": pa.float64()}
+
+
+
+
+def construir_esquema_silver(tipos_float: dict = None) -> pa.Schema:
+
+    """
+    Devuelve el esquema declarado de la capa silver. Las monedas se guardan como
+    diccionario (categóricas) y cada columna de valores puede ser float32 o float64.
+
+    Parameters:
+    - tipos_float (dict): ej. {"purchase_value": "float32"}; por defecto float64.
+    """
+
+    tipos_float = tipos_float or {}
+
+    return pa.schema([
+        ("base_currency", pa.dictionary(pa.int32(), pa.string())),
+        ("destination_currency", pa.dictionary(pa.int32(), pa.string())),
+        ("purchase_value", TIPOS_FLOAT[tipos_float.get("purchase_value", "float64")]),
+        ("sale_value", TIPOS_FLOAT[tipos_float.get("sale_value", "float64")]),
+        ("date_time", pa.timestamp("s", tz="UTC")),
+    ])
+
+
+
+
+def conformar_a_esquema(datos, esquema: pa.Schema) -> pa.Table:
+
+    """
+    Convierte un DataFrame o una pa.Table al esquema indicado, validando antes
+    que estén exactamente las columnas declaradas. Lanza ValueError si faltan
+    o sobran columnas, o si algún valor no se puede castear al tipo declarado.
+    """
+
+    columnas = list(datos.columns) if isinstance(datos, pd.DataFrame) else datos.column_names
+
+    faltantes = [c for c in esquema.names if c not in columnas]
+    sobrantes = [c for c in columnas if c not in esquema.names]
+
+    if faltantes or sobrantes:
+        raise ValueError(f"Esquema inválido. Faltan: {faltantes}. Sobran: {sobrantes}.")
+
+    try:
+        if isinstance(datos, pd.DataFrame):
+            return pa.Table.from_pandas(datos[esquema.names], schema=esquema, preserve_index=False)
+
+        return datos.select(esquema.names).cast(esquema)
+
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+        raise ValueError(f"Esquema inválido: {e}") from e
+
+
+
+
+# Esquema de la capa silver con los tipos por defecto
+SILVER_ARROW_SCHEMA = construir_esquema_silver()
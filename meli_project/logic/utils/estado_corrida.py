@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import uuid
+import threading
+from meli_project.logic.utils.manifiesto import hash_ruta
+
+
+
+
+class EstadoCorrida:
+
+
+
+    def __init__(self, path: str = None):
+
+        """
+        Estado durable de una corrida del pipeline (data/o6_corridas/ultima_corrida.json).
+        Registra las unidades completadas de cada etapa (ej. pares extraídos) y las
+        etapas terminadas con el hash de sus entradas y de su salida, para que
+        main.py --resume saltee todo lo que ya quedó hecho y sigue vigente.
+        """
+
+        self.path = path or os.path.abspath(
+            os.path.join(os.path.dirname(__file__), "../../../data/o6_corridas/ultima_corrida.json")
+        )
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        self._lock = threading.Lock()
+
+        self.datos = {}
+
+
+
+
+    def iniciar(self, reanudar: bool = False) -> bool:
+
+        """
+        Con reanudar=True retoma el estado de la última corrida (si existe);
+        si no, arranca una corrida nueva. Devuelve True si se retomó.
+        """
+
+        previo = self._leer() if reanudar else {}
+
+        with self._lock:
+
+            if previo:
+
+                self.datos = previo
+
+                self.datos["reanudaciones"] = self.datos.get("reanudaciones", 0) + 1
+
+            else:
+
+                self.datos = {
+                    "id": uuid.uuid4().hex,
+                    "inicio": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "fin": None,
+                    "reanudaciones": 0,
+                    "valores": {},
+                    "unidades": {},
+                    "etapas": {},
+                }
+
+            self._guardar()
+
+        return bool(previo)
+
+
+
+
+    def obtener(self, clave: str, default=None):
+
+        return self.datos["valores"].get(clave, default)
+
+
+
+
+    def guardar(self, clave: str, valor):
+
+        with self._lock:
+
+            self.datos["valores"][clave] = valor
+
+            self._guardar()
+
+
+
+
+    def registrar_unidad(self, etapa: str, unidad: str, path: str = None):
+
+        """
+        Marca una unidad de trabajo como completada (ej. un par en extracción),
+        guardando el hash del archivo que produjo.
+        """
+
+        with self._lock:
+
+            self.datos["unidades"].setdefault(etapa, {})[unidad] = {
+                "path": path,
+                "hash": hash_ruta(path) if path else None,
+            }
+
+            self._guardar()
+
+
+
+
+    def unidad_vigente(self, etapa: str, unidad: str) -> bool:
+
+        """
+        True si la unidad está completa y su archivo sigue en disco sin cambios.
+        """
+
+        previa = self.datos["unidades"].get(etapa, {}).get(unidad)
+
+        if not previa:
+            return False
+
+        return previa["path"] is None or previa["hash"] == hash_ruta(previa["path"])
+
+
+
+
+    def completar_etapa(self, etapa: str, entradas: dict = None, resultado=None, path: str = None):
+
+        with self._lock:
+
+            self.datos["etapas"][etapa] = {
+                "entradas": entradas or {},
+                "resultado": resultado,
+                "path": path,
+                "hash": hash_ruta(path) if path else None,
+                "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+
+            self._guardar()
+
+
+
+
+    def etapa_vigente(self, etapa: str, entradas: dict = None) -> bool:
+
+        """
+        True si la etapa ya terminó con exactamente estas entradas y su salida
+        (si la tiene) sigue en disco sin modificaciones.
+        """
+
+        previa = self.datos["etapas"].get(etapa)
+
+        if not previa or previa["entradas"] != (entradas or {}):
+            return False
+
+        return previa["path"] is None or previa["hash"] == hash_ruta(previa["path"])
+
+
+
+
+    def resultado_etapa(self, etapa: str):
+
+        return self.datos["etapas"].get(etapa, {}).get("resultado")
+
+
+
+
+    def finalizar(self, resumen: dict):
+
+        with self._lock:
+
+            self.datos["fin"] = time.strftime("%Y-%m-%d %H:%M:%S")
+
+            self.datos["resumen"] = resumen
+
+            self._guardar()
+
+
+
+
+    def _leer(self) -> dict:
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        except (OSError, ValueError):
+            return {}
+
+
+
+
+    def _guardar(self):
+
+        tmp_path = f"{self.path}.tmp"
+
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.datos, f, indent=2, ensure_ascii=False, default=str)
+
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,249 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import pyarrow.parquet as pq
+
+
+
+
+def hash_ruta(path: str) -> str:
+
+    """
+    Hash sha256 del contenido de un archivo, o de todos los archivos de una
+    carpeta (dataset particionado) recorridos en orden. None si no existe.
+    """
+
+    if os.path.isfile(path):
+        return _hash_archivo(path)
+
+    if not os.path.isdir(path):
+        return None
+
+    sha = hashlib.sha256()
+
+    for raiz, carpetas, archivos in os.walk(path):
+
+        carpetas.sort()
+
+        for nombre in sorted(archivos):
+
+            full_path = os.path.join(raiz, nombre)
+
+            sha.update(os.path.relpath(full_path, path).encode("utf-8"))
+            sha.update(_hash_archivo(full_path).encode("utf-8"))
+
+    return sha.hexdigest()
+
+
+
+
+def contar_filas(path: str) -> int:
+
+    """
+    Cantidad de filas de un Parquet o dataset particionado, leída de los
+    metadatos (sin leer los datos). None para otros formatos.
+    """
+
+    if os.path.isfile(path) and path.endswith(".parquet"):
+        return pq.ParquetFile(path).metadata.num_rows
+
+    if os.path.isdir(path):
+
+        total = 0
+
+        for raiz, _, archivos in os.walk(path):
+
+            for nombre in archivos:
+
+                if nombre.endswith(".parquet"):
+                    total += pq.ParquetFile(os.path.join(raiz, nombre)).metadata.num_rows
+
+        return total
+
+    return None
+
+
+
+
+def tamano_ruta(path: str) -> int:
+
+    """
+    Bytes en disco de un archivo o de todos los archivos de una carpeta. 0 si no existe.
+    """
+
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+
+    return sum(os.path.getsize(os.path.join(raiz, nombre)) for raiz, _, archivos in os.walk(path) for nombre in archivos)
+
+
+
+
+def enlazar_o_copiar(origen: str, destino: str) -> str:
+
+    """
+    Deja en destino el mismo contenido que origen usando un hardlink cuando el
+    sistema de archivos lo permite (sin copiar bytes) y una copia si no.
+    Es seguro porque las capas se escriben con reemplazo atómico (archivo nuevo),
+    así que reescribir el origen nunca modifica el destino enlazado.
+    Devuelve "hardlink" o "copia".
+    """
+
+    tmp_path = f"{destino}.tmp"
+
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    try:
+        os.link(origen, tmp_path)
+        metodo = "hardlink"
+
+    except OSError:
+        shutil.copyfile(origen, tmp_path)
+        metodo = "copia"
+
+    os.replace(tmp_path, destino)
+
+    return metodo
+
+
+
+
+def _hash_archivo(path: str) -> str:
+
+    sha = hashlib.sha256()
+
+    with open(path, "rb") as f:
+
+        for bloque in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(bloque)
+
+    return sha.hexdigest()
+
+
+
+
+_LOCKS_RUTAS = {}
+
+_LOCK_REGISTRO = threading.Lock()
+
+
+
+
+def _lock_ruta(path: str) -> threading.Lock:
+
+    """
+    Un lock por archivo de manifiesto (por ruta absoluta), compartido en el proceso.
+    """
+
+    with _LOCK_REGISTRO:
+        return _LOCKS_RUTAS.setdefault(os.path.abspath(path), threading.Lock())
+
+
+
+
+class Manifiesto:
+
+
+
+    def __init__(self, path: str = None):
+
+        """
+        Manifiesto de artefactos por capa (silver, gold, bigquery).
+        Para cada salida guarda su hash de contenido, filas y los hashes de las
+        entradas con las que se generó, para poder saltear trabajo repetido.
+        """
+
+        self.path = path or os.path.abspath(
+            os.path.join(os.path.dirname(__file__), "../../../data/manifiesto.json")
+        )
+
+        # Compartido por todas las instancias que apuntan al mismo archivo
+        self._lock = _lock_ruta(self.path)
+
+
+
+
+    def obtener(self, capa: str, nombre: str) -> dict:
+
+        return self._leer().get(capa, {}).get(nombre)
+
+
+
+
+    def registrar(self, capa: str, nombre: str, path: str = None, entradas: dict = None, hash_salida: str = None) -> dict:
+
+        """
+        Registra (o actualiza) una salida. Si no se pasa hash_salida se calcula del path.
+        """
+
+        entrada = {
+            "path": path,
+            "hash": hash_salida or (hash_ruta(path) if path else None),
+            "filas": contar_filas(path) if path else None,
+            "entradas": entradas or {},
+            "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+        # Leer, fusionar y reemplazar bajo el mismo lock: otra instancia del
+        # proceso (modelado, carga, transformación) no puede pisar la entrada
+        with self._lock:
+
+            data = self._leer()
+
+            data.setdefault(capa, {})[nombre] = entrada
+
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+            descriptor, tmp_path = tempfile.mkstemp(prefix=".manifiesto_", suffix=".tmp", dir=os.path.dirname(self.path))
+
+            try:
+                with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+                    json.dump(data, f, indent=2, ensure_ascii=False)
+
+                os.replace(tmp_path, self.path)
+
+            except BaseException:
+
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+                raise
+
+        return entrada
+
+
+
+
+    def esta_vigente(self, capa: str, nombre: str, entradas: dict, path: str = None) -> bool:
+
+        """
+        True si la salida ya se generó con exactamente estas entradas y
+        (cuando hay path) el archivo sigue en disco sin modificaciones.
+        """
+
+        previa = self.obtener(capa, nombre)
+
+        if not previa or previa.get("entradas") != entradas:
+            return False
+
+        if path is not None:
+            return previa.get("hash") == hash_ruta(path)
+
+        return True
+
+
+
+
+    def _leer(self) -> dict:
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+
+        except (OSError, ValueError):
+            return {}
@@ -0,0 +1,506 @@
+import os
+import io
+import sys
+import json
+import time
+import pstats
+import cProfile
+import resource
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from meli_project.params import METRICAS_PATH, PERFILAR_ETAPAS, METRICAS_MUESTREO_RSS
+
+
+
+
+# Límites superiores (segundos) del histograma de latencia HTTP
+BUCKETS_LATENCIA = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+# ru_maxrss viene en KiB en Linux y en bytes en macOS
+ESCALA_RU_MAXRSS = 1 if sys.platform == "darwin" else 1024
+
+
+# Texto de # HELP de los contadores conocidos (el resto usa una descripción genérica)
+AYUDA_CONTADORES = {
+    "segundos": "Wall time en segundos",
+    "cpu_segundos": "CPU del proceso en segundos",
+    "ok": "1 si terminó bien, 0 si falló",
+    "rss_inicial_bytes": "RSS al empezar, en bytes",
+    "pico_rss_bytes": "Máximo RSS muestreado, en bytes",
+    "rss_delta_bytes": "Crecimiento del RSS (pico menos inicial), en bytes",
+    "pico_rss_proceso_bytes": "Pico de RSS del proceso desde que arrancó (ru_maxrss), en bytes",
+    "filas_entrada": "Filas leídas",
+    "filas_salida": "Filas escritas",
+    "bytes_leidos": "Bytes leídos",
+    "bytes_escritos": "Bytes escritos",
+}
+
+
+
+
+def rss_actual() -> int:
+
+    """
+    RSS actual del proceso en bytes (/proc/self/statm). Donde no hay /proc
+    devuelve None y solo queda el pico del proceso (ru_maxrss).
+    """
+
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+
+
+class MuestreoRss:
+
+
+
+    def __init__(self, intervalo: float = METRICAS_MUESTREO_RSS):
+
+        """
+        Hilo que lee el RSS actual cada `intervalo` segundos mientras corre una
+        etapa y se queda con el máximo. ru_maxrss no sirve por etapa: es el pico
+        del proceso desde que arrancó, igual para todas las etapas posteriores
+        a la más pesada.
+        """
+
+        self.intervalo = max(0.001, intervalo)
+
+        self.inicial = rss_actual()
+
+        self.pico = self.inicial
+
+        self._fin = threading.Event()
+
+        self._hilo = None
+
+        if self.inicial is not None:
+
+            self._hilo = threading.Thread(target=self._muestrear, name="muestreo-rss", daemon=True)
+
+            self._hilo.start()
+
+
+
+
+    def _muestrear(self):
+
+        while not self._fin.wait(self.intervalo):
+            self._observar()
+
+
+
+
+    def _observar(self):
+
+        rss = rss_actual()
+
+        if rss is not None and rss > self.pico:
+            self.pico = rss
+
+
+
+
+    def detener(self) -> dict:
+
+        self._fin.set()
+
+        if self._hilo is not None:
+
+            self._hilo.join()
+
+            self._observar()
+
+        datos = {"pico_rss_proceso_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * ESCALA_RU_MAXRSS}
+
+        if self.inicial is not None:
+            datos.update({"rss_inicial_bytes": self.inicial, "pico_rss_bytes": self.pico,
+                          "rss_delta_bytes": self.pico - self.inicial})
+
+        return datos
+
+
+
+
+class RegistroMetricas:
+
+
+
+    def __init__(self, path: str = METRICAS_PATH, perfilar: list = None):
+
+        """
+        Métricas de rendimiento de una corrida:
+        - por etapa: wall time, CPU del proceso, RSS (ver medir_etapa) y contadores libres
+          (filas_entrada, filas_salida, bytes_leidos, bytes_escritos, ...)
+        - por par: los mismos contadores y un histograma de latencia HTTP
+        Se exportan como reporte JSON y como textfile de Prometheus.
+
+        Parameters:
+        - path (str): carpeta de salida (reportes, textfile y perfiles).
+        - perfilar (list): etapas a envolver con cProfile + tracemalloc ("todas" = todas).
+        """
+
+        self.path = path
+
+        self.perfilar = set(PERFILAR_ETAPAS if perfilar is None else perfilar)
+
+        self.inicio = time.time()
+
+        self.etapas = {}
+
+        self.pares = {}
+
+        self.http = {}
+
+        self._lock = threading.Lock()
+
+        self._tracemalloc_propio = 0
+
+
+
+
+    @contextmanager
+    def medir_etapa(self, etapa: str):
+
+        """
+        Mide wall time, CPU y RSS del bloque. La CPU y el RSS son del proceso
+        completo, así que en etapas que corren en paralelo se solapan:
+        - pico_rss_bytes: máximo RSS muestreado mientras corre la etapa
+        - rss_delta_bytes: ese máximo menos el RSS al empezar (lo que creció en la etapa)
+        - pico_rss_proceso_bytes: pico del proceso desde que arrancó (ru_maxrss)
+        Si la etapa está en perfilar, además guarda su perfil cProfile (del hilo
+        que la ejecuta) y el top de asignaciones de tracemalloc.
+        """
+
+        perfil = self._iniciar_perfil() if etapa in self.perfilar or "todas" in self.perfilar else None
+
+        muestreo = MuestreoRss()
+
+        inicio, cpu = time.perf_counter(), time.process_time()
+
+        estado = "ok"
+
+        try:
+            yield self
+
+        except BaseException:
+
+            estado = "error"
+
+            raise
+
+        finally:
+
+            datos = {
+                "segundos": round(time.perf_counter() - inicio, 4),
+                "cpu_segundos": round(time.process_time() - cpu, 4),
+                **muestreo.detener(),
+                "estado": estado,
+            }
+
+            with self._lock:
+                self.etapas.setdefault(etapa, {}).update(datos)
+
+            if perfil is not None:
+                self._guardar_perfil(etapa, perfil)
+
+
+
+
+    def sumar(self, etapa: str, clave: str, valor: float, pair: str = None):
+
+        """
+        Suma un contador de la etapa (y del par, si se indica).
+        """
+
+        with self._lock:
+
+            contadores = self.etapas.setdefault(etapa, {})
+
+            contadores[clave] = contadores.get(clave, 0) + valor
+
+            if pair is not None:
+
+                del_par = self.pares.setdefault(pair, {})
+
+                del_par[clave] = del_par.get(clave, 0) + valor
+
+
+
+
+    def extraer_contadores(self) -> dict:
+
+        """
+        Devuelve y vacía los contadores por etapa y por par. Lo usan los workers
+        de proceso: su METRICAS es otra copia y los contadores vuelven al padre
+        junto con el resultado (ver sumar_contadores).
+        """
+
+        with self._lock:
+
+            contadores = {"etapas": self.etapas, "pares": self.pares}
+
+            self.etapas, self.pares = {}, {}
+
+        return contadores
+
+
+
+
+    def sumar_contadores(self, contadores: dict):
+
+        """
+        Suma los contadores numéricos devueltos por extraer_contadores() en otro proceso.
+        """
+
+        with self._lock:
+
+            for destino, origen in ((self.etapas, contadores["etapas"]), (self.pares, contadores["pares"])):
+
+                for nombre, valores in origen.items():
+
+                    acumulado = destino.setdefault(nombre, {})
+
+                    for clave, valor in valores.items():
+
+                        if isinstance(valor, (int, float)):
+                            acumulado[clave] = acumulado.get(clave, 0) + valor
+
+
+
+
+    def observar_http(self, segundos: float, status, pair: str = None):
+
+        """
+        Registra la duración de una descarga (con sus reintentos) en el histograma del par.
+        """
+
+        clave = pair or "total"
+
+        with self._lock:
+
+            h = self.http.setdefault(clave, {"buckets": [0] * len(BUCKETS_LATENCIA), "suma": 0.0,
+                                             "cantidad": 0, "status": {}})
+
+            for i, limite in enumerate(BUCKETS_LATENCIA):
+
+                if segundos <= limite:
+                    h["buckets"][i] += 1
+
+            h["suma"] += segundos
+
+            h["cantidad"] += 1
+
+            h["status"][str(status)] = h["status"].get(str(status), 0) + 1
+
+
+
+
+    def reporte(self) -> dict:
+
+        with self._lock:
+
+            return json.loads(json.dumps({
+                "inicio": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.inicio)),
+                "segundos_totales": round(time.time() - self.inicio, 4),
+                "etapas": self.etapas,
+                "pares": self.pares,
+                "http": {
+                    pair: {**h, "limites_buckets": list(BUCKETS_LATENCIA)}
+                    for pair, h in self.http.items()
+                },
+            }))
+
+
+
+
+    def guardar_reporte(self, nombre: str = None) -> str:
+
+        """
+        Guarda el reporte JSON de la corrida (metricas/corrida_YYYYmmdd_HHMMSS.json por defecto).
+        """
+
+        path = os.path.join(self.path, nombre or f"corrida_{time.strftime('%Y%m%d_%H%M%S', time.localtime(self.inicio))}.json")
+
+        self._escribir(path, json.dumps(self.reporte(), indent=2, ensure_ascii=False))
+
+        return path
+
+
+
+
+    def exportar_prometheus(self, nombre: str = "meli_pipeline.prom") -> str:
+
+        """
+        Escribe el textfile para el textfile collector de node_exporter
+        (se reemplaza atómicamente en cada corrida).
+        """
+
+        reporte = self.reporte()
+
+        lineas = [
+            "# HELP meli_pipeline_ultima_corrida_timestamp_segundos Inicio de la última corrida (epoch).",
+            "# TYPE meli_pipeline_ultima_corrida_timestamp_segundos gauge",
+            f"meli_pipeline_ultima_corrida_timestamp_segundos {self.inicio:.0f}",
+        ]
+
+        lineas += _familias("meli_pipeline_etapa", "etapa", {
+            etapa: {**{k: v for k, v in datos.items() if k != "estado"}, "ok": int(datos.get("estado", "ok") == "ok")}
+            for etapa, datos in reporte["etapas"].items()
+        })
+
+        lineas += [
+            "# HELP meli_pipeline_etapa_estado Estado de la etapa en la última corrida (la serie con valor 1).",
+            "# TYPE meli_pipeline_etapa_estado gauge",
+        ]
+
+        for etapa, datos in sorted(reporte["etapas"].items()):
+
+            if "estado" in datos:
+                lineas.append(f'meli_pipeline_etapa_estado{{etapa="{etapa}",estado="{datos["estado"]}"}} 1')
+
+        lineas += _familias("meli_pipeline_par", "pair", reporte["pares"])
+
+        lineas += [
+            "# HELP meli_pipeline_http_duracion_segundos Duración de las descargas HTTP (con reintentos) por par.",
+            "# TYPE meli_pipeline_http_duracion_segundos histogram",
+        ]
+
+        for pair, h in sorted(reporte["http"].items()):
+
+            for limite, cantidad in zip(BUCKETS_LATENCIA, h["buckets"]):
+                lineas.append(f'meli_pipeline_http_duracion_segundos_bucket{{pair="{pair}",le="{limite}"}} {cantidad}')
+
+            lineas.append(f'meli_pipeline_http_duracion_segundos_bucket{{pair="{pair}",le="+Inf"}} {h["cantidad"]}')
+            lineas.append(f'meli_pipeline_http_duracion_segundos_sum{{pair="{pair}"}} {h["suma"]:.6f}')
+            lineas.append(f'meli_pipeline_http_duracion_segundos_count{{pair="{pair}"}} {h["cantidad"]}')
+
+        lineas += [
+            "# HELP meli_pipeline_http_respuestas Respuestas HTTP por par y status.",
+            "# TYPE meli_pipeline_http_respuestas gauge",
+        ]
+
+        for pair, h in sorted(reporte["http"].items()):
+
+            for status, cantidad in sorted(h["status"].items()):
+                lineas.append(f'meli_pipeline_http_respuestas{{pair="{pair}",status="{status}"}} {cantidad}')
+
+        path = os.path.join(self.path, nombre)
+
+        self._escribir(path, "\n".join(lineas) + "\n")
+
+        return path
+
+
+
+
+    def _iniciar_perfil(self) -> dict:
+
+        with self._lock:
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._tracemalloc_propio += 1
+
+            elif self._tracemalloc_propio:
+                self._tracemalloc_propio += 1
+
+        perfil = cProfile.Profile()
+
+        perfil.enable()
+
+        return {"cprofile": perfil, "memoria_inicial": tracemalloc.take_snapshot()}
+
+
+
+
+    def _guardar_perfil(self, etapa: str, perfil: dict):
+
+        perfil["cprofile"].disable()
+
+        marca = time.strftime("%Y%m%d_%H%M%S")
+
+        carpeta = os.path.join(self.path, "perfiles")
+
+        os.makedirs(carpeta, exist_ok=True)
+
+        perfil["cprofile"].dump_stats(os.path.join(carpeta, f"{etapa}_{marca}.prof"))
+
+        texto = io.StringIO()
+
+        pstats.Stats(perfil["cprofile"], stream=texto).sort_stats("cumulative").print_stats(30)
+
+        diferencias = tracemalloc.take_snapshot().compare_to(perfil["memoria_inicial"], "lineno")
+
+        _, pico = tracemalloc.get_traced_memory()
+
+        texto.write(f"\n\ntracemalloc: pico {pico / 1024 ** 2:.2f} MB. Top 25 asignaciones de la etapa:\n")
+
+        for estadistica in diferencias[:25]:
+            texto.write(f"{estadistica}\n")
+
+        self._escribir(os.path.join(carpeta, f"{etapa}_{marca}.txt"), texto.getvalue())
+
+        with self._lock:
+
+            if self._tracemalloc_propio:
+
+                self._tracemalloc_propio -= 1
+
+                if self._tracemalloc_propio == 0:
+                    tracemalloc.stop()
+
+
+
+
+    def _escribir(self, path: str, contenido: str):
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        tmp_path = f"{path}.tmp"
+
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(contenido)
+
+        os.replace(tmp_path, path)
+
+
+
+
+def _familias(prefijo: str, etiqueta: str, datos: dict) -> list:
+
+    """
+    Una familia gauge por contador numérico: {prefijo}_{contador}{etiqueta="valor"},
+    con su # HELP (AYUDA_CONTADORES o una descripción genérica) y su # TYPE.
+    """
+
+    contadores = sorted({k for valores in datos.values() for k, v in valores.items() if isinstance(v, (int, float))})
+
+    lineas = []
+
+    for contador in contadores:
+
+        ayuda = AYUDA_CONTADORES.get(contador, f"Contador {contador}")
+
+        lineas.append(f"# HELP {prefijo}_{contador} {ayuda}, por {etiqueta}.")
+
+        lineas.append(f"# TYPE {prefijo}_{contador} gauge")
+
+        for clave, valores in sorted(datos.items()):
+
+            if isinstance(valores.get(contador), (int, float)):
+                lineas.append(f'{prefijo}_{contador}{{{etiqueta}="{clave}"}} {valores[contador]}')
+
+    return lineas
+
+
+
+
+# Registro de la corrida en curso (compartido por todas las etapas del proceso)
+METRICAS = RegistroMetricas()
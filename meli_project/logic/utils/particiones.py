@@ -0,0 +1,276 @@
+import os
+import uuid
+from itertools import chain
+from datetime import datetime, timedelta, timezone
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+
+
+
+# Layout Hive de los datasets particionados: base_currency=USD/date=2026-10-18/
+ESQUEMA_PARTICIONES = pa.schema([
+    ("base_currency", pa.string()),
+    ("date", pa.string()),
+])
+
+PARTICIONADO_HIVE = ds.partitioning(ESQUEMA_PARTICIONES, flavor="hive")
+
+
+
+
+def es_dataset(path: str) -> bool:
+
+    """
+    Un dataset particionado es una carpeta; un Parquet monolítico es un archivo.
+    """
+
+    return os.path.isdir(path)
+
+
+
+
+def escribir_dataset_particionado(tabla: pa.Table, path: str, modo: str = "reemplazar",
+                                  compresion: str = "zstd", filas_por_grupo: int = 250_000):
+
+    """
+    Escribe una tabla silver/gold como dataset Hive particionado por moneda base y fecha.
+    Acepta también un iterable de tablas (modo streaming): se escriben en una sola
+    pasada, sin concatenarlas en memoria. Devuelve la cantidad de filas escritas.
+
+    Parameters:
+    - modo (str): "reemplazar" borra y reescribe solo las particiones presentes en la tabla;
+      "agregar" suma archivos nuevos a las particiones existentes sin tocar los anteriores.
+    """
+
+    if modo not in ("reemplazar", "agregar"):
+        raise ValueError(f"Modo de escritura no soportado: {modo}")
+
+    filas = [0]
+
+    def preparar(t: pa.Table) -> pa.Table:
+
+        t = t.set_column(
+            t.schema.get_field_index("base_currency"),
+            "base_currency",
+            pc.cast(t["base_currency"], pa.string()),
+        )
+
+        filas[0] += t.num_rows
+
+        return t.append_column("date", pc.strftime(t["date_time"], format="%Y-%m-%d"))
+
+    if isinstance(tabla, pa.Table):
+
+        datos = preparar(tabla)
+
+    else:
+
+        tablas = iter(tabla)
+
+        primera = next(tablas, None)
+
+        if primera is None:
+            return 0
+
+        primera = preparar(primera)
+
+        lotes = chain(primera.to_batches(), (b for t in tablas for b in preparar(t).to_batches()))
+
+        datos = pa.RecordBatchReader.from_batches(primera.schema, lotes)
+
+    formato = ds.ParquetFileFormat()
+
+    ds.write_dataset(
+        datos,
+        path,
+        format=formato,
+        partitioning=PARTICIONADO_HIVE,
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior="delete_matching" if modo == "reemplazar" else "overwrite_or_ignore",
+        file_options=formato.make_write_options(compression=compresion),
+        max_rows_per_group=filas_por_grupo,
+        min_rows_per_group=min(filas_por_grupo, 65_536),
+    )
+
+    return filas[0]
+
+
+
+
+def filtro_dataset(pares: list = None, desde: str = None, hasta: str = None):
+
+    """
+    Arma la expresión de filtro (predicate pushdown) por pares y rango de fechas.
+
+    Parameters:
+    - pares (list): ej. ["USD-BRL", "EUR-BRL"].
+    - desde / hasta (str): fechas "YYYY-MM-DD" inclusivas.
+    """
+
+    filtro = None
+
+    if pares:
+
+        for pair in pares:
+
+            base, destino = pair.split("-")
+
+            condicion = (ds.field("base_currency") == base) & (ds.field("destination_currency") == destino)
+
+            filtro = condicion if filtro is None else filtro | condicion
+
+    if desde:
+
+        condicion = ds.field("date") >= desde
+
+        filtro = condicion if filtro is None else filtro & condicion
+
+    if hasta:
+
+        condicion = ds.field("date") <= hasta
+
+        filtro = condicion if filtro is None else filtro & condicion
+
+    return filtro
+
+
+
+
+def leer_dataset(path: str, pares: list = None, desde: str = None, hasta: str = None) -> pa.Table:
+
+    """
+    Lee un dataset particionado (o un Parquet monolítico) aplicando los filtros
+    por par y fecha. En datasets particionados los filtros sobre base_currency y
+    date descartan carpetas completas sin abrirlas. Devuelve las columnas en el
+    orden de silver, sin la columna auxiliar "date".
+    """
+
+    dataset, filtro = _dataset_y_filtro(path, pares, desde, hasta)
+
+    return _normalizar_columnas(dataset.to_table(filter=filtro))
+
+
+
+
+def iterar_lotes(path: str, pares: list = None, desde: str = None, hasta: str = None,
+                 filas_por_lote: int = 100_000):
+
+    """
+    Igual que leer_dataset pero devuelve un generador de tablas chicas
+    (un record batch cada una), para procesar el dataset sin materializarlo
+    completo en memoria.
+    """
+
+    dataset, filtro = _dataset_y_filtro(path, pares, desde, hasta)
+
+    for batch in dataset.to_batches(filter=filtro, batch_size=filas_por_lote):
+
+        if batch.num_rows:
+            yield _normalizar_columnas(pa.Table.from_batches([batch]))
+
+
+
+
+def filtrar_tabla(tabla: pa.Table, pares: list = None, desde: str = None, hasta: str = None) -> pa.Table:
+
+    """
+    Aplica los mismos filtros por par y fecha que leer_dataset sobre una tabla
+    que ya está en memoria (sin volver a leer el Parquet de disco).
+    """
+
+    filtro = _filtro_sin_particiones(pares, desde, hasta)
+
+    if filtro is None:
+        return _normalizar_columnas(tabla)
+
+    return _normalizar_columnas(ds.dataset(tabla).to_table(filter=filtro))
+
+
+
+
+def columnas_dataset(path: str) -> list:
+
+    """
+    Devuelve los nombres de columna (orden silver) sin leer datos.
+    """
+
+    dataset, _ = _dataset_y_filtro(path)
+
+    return _normalizar_columnas(dataset.schema.empty_table()).column_names
+
+
+
+
+def _dataset_y_filtro(path: str, pares: list = None, desde: str = None, hasta: str = None):
+
+    if es_dataset(path):
+        return ds.dataset(path, format="parquet", partitioning=PARTICIONADO_HIVE), filtro_dataset(pares, desde, hasta)
+
+    return ds.dataset(path, format="parquet"), _filtro_sin_particiones(pares, desde, hasta)
+
+
+
+
+def _normalizar_columnas(tabla: pa.Table) -> pa.Table:
+
+    """
+    Quita la columna auxiliar "date", ordena las columnas como en silver y
+    vuelve a codificar base_currency como diccionario (la partición se lee como string).
+    """
+
+    if "date" in tabla.column_names:
+        tabla = tabla.drop(["date"])
+
+    columnas = [c for c in ("base_currency", "destination_currency", "purchase_value", "sale_value", "date_time")
+                if c in tabla.column_names]
+
+    tabla = tabla.select(columnas + [c for c in tabla.column_names if c not in columnas])
+
+    if "base_currency" in tabla.column_names and not pa.types.is_dictionary(tabla.schema.field("base_currency").type):
+
+        tabla = tabla.set_column(
+            tabla.schema.get_field_index("base_currency"),
+            "base_currency",
+            pc.dictionary_encode(tabla["base_currency"]),
+        )
+
+    return tabla
+
+
+
+
+def _filtro_sin_particiones(pares: list = None, desde: str = None, hasta: str = None):
+
+    """
+    Mismo filtro que filtro_dataset, pero sobre un Parquet sin columna "date"
+    (el rango se evalúa contra date_time; Parquet descarta row groups por estadísticas).
+    """
+
+    filtro = filtro_dataset(pares)
+
+    if desde:
+
+        condicion = ds.field("date_time") >= pa.scalar(_inicio_del_dia(desde), pa.timestamp("s", tz="UTC"))
+
+        filtro = condicion if filtro is None else filtro & condicion
+
+    if hasta:
+
+        condicion = ds.field("date_time") < pa.scalar(_inicio_del_dia(hasta, dias=1), pa.timestamp("s", tz="UTC"))
+
+        filtro = condicion if filtro is None else filtro & condicion
+
+    return filtro
+
+
+
+
+def _inicio_del_dia(fecha: str, dias: int = 0) -> datetime:
+
+    """
+    Convierte "YYYY-MM-DD" a datetime UTC (opcionalmente desplazado en días).
+    """
+
+    return datetime.strptime(fecha, "%Y-%m-%d").replace(tzinfo=timezone.utc) + timedelta(days=dias)
@@ -0,0 +1,144 @@
+import time
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from meli_project.logic.utils.utils import *
+
+
+
+
+class PipelineRunner:
+
+
+
+    def __init__(self, max_workers: int = 4, fail_fast: bool = False, logger=None, metricas=None):
+
+        """
+        Runner mínimo de etapas con dependencias explícitas (DAG).
+        - Cada etapa recibe un dict con los resultados de sus dependencias.
+        - Las etapas independientes corren en paralelo (hasta max_workers).
+        - Si una etapa falla, todas las que dependen de ella se saltean.
+        - Con fail_fast=True, además, no se inicia ninguna etapa nueva tras el primer error.
+        - Con un RegistroMetricas, cada etapa se mide (tiempo, CPU, RSS) con su nombre.
+        """
+
+        self.max_workers = max_workers
+
+        self.fail_fast = fail_fast
+
+        self.logger = logger or setup_logger("o6_main_logs/pipeline_runner.log")
+
+        self.metricas = metricas
+
+        self.etapas = {}
+
+
+
+
+    def agregar(self, nombre: str, funcion, depende_de: list = None):
+
+        """
+        Registra una etapa. Las dependencias deben estar registradas antes.
+        """
+
+        depende_de = list(depende_de or [])
+
+        if nombre in self.etapas:
+            raise ValueError(f"La etapa '{nombre}' ya está registrada.")
+
+        faltantes = [d for d in depende_de if d not in self.etapas]
+
+        if faltantes:
+            raise ValueError(f"La etapa '{nombre}' depende de etapas no registradas: {faltantes}")
+
+        self.etapas[nombre] = {"funcion": funcion, "depende_de": depende_de}
+
+        return self
+
+
+
+
+    def ejecutar(self) -> dict:
+
+        """
+        Ejecuta el DAG y devuelve el estado de cada etapa:
+        {"estado": "ok" | "error" | "salteada", "resultado", "error", "segundos"}.
+        """
+
+        estados = {}
+
+        pendientes = list(self.etapas)
+
+        en_curso = {}
+
+        abortado = False
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+
+            while pendientes or en_curso:
+
+                for nombre in list(pendientes):
+
+                    deps = self.etapas[nombre]["depende_de"]
+
+                    if abortado or any(estados.get(d, {}).get("estado") in ("error", "salteada") for d in deps):
+
+                        motivo = "fail-fast" if abortado else "falló una dependencia"
+
+                        estados[nombre] = {"estado": "salteada", "resultado": None, "error": motivo, "segundos": 0.0}
+
+                        self.logger.warning(f"⏭️ Etapa '{nombre}' salteada ({motivo}).")
+
+                        pendientes.remove(nombre)
+
+                    elif all(estados.get(d, {}).get("estado") == "ok" for d in deps):
+
+                        entradas = {d: estados[d]["resultado"] for d in deps}
+
+                        self.logger.info(f"▶️ Inicia etapa '{nombre}'.")
+
+                        futuro = executor.submit(self._correr, nombre, entradas)
+
+                        en_curso[futuro] = nombre
+
+                        pendientes.remove(nombre)
+
+                if not en_curso:
+                    continue
+
+                terminados, _ = wait(list(en_curso), return_when=FIRST_COMPLETED)
+
+                for futuro in terminados:
+
+                    nombre = en_curso.pop(futuro)
+
+                    estados[nombre] = futuro.result()
+
+                    if estados[nombre]["estado"] == "error" and self.fail_fast:
+                        abortado = True
+
+        return estados
+
+
+
+
+    def _correr(self, nombre: str, entradas: dict) -> dict:
+
+        inicio = time.perf_counter()
+
+        try:
+            with self.metricas.medir_etapa(nombre) if self.metricas is not None else nullcontext():
+                resultado = self.etapas[nombre]["funcion"](entradas)
+
+            segundos = time.perf_counter() - inicio
+
+            self.logger.info(f"✅ Etapa '{nombre}' finalizada en {segundos:.2f}s.")
+
+            return {"estado": "ok", "resultado": resultado, "error": None, "segundos": segundos}
+
+        except Exception as e:
+
+            segundos = time.perf_counter() - inicio
+
+            self.logger.error(f"❌ Etapa '{nombre}' falló tras {segundos:.2f}s: {e}")
+
+            return {"estado": "error", "resultado": None, "error": str(e), "segundos": segundos}
@@ -1,36 +1,248 @@
 import os
+import json
+import time
+import queue
+import atexit
 import logging
 import pickle
+import threading
 import pandas as pd
+from meli_project.params import LOG_ARCHIVO, LOG_PATH, LOG_COLA_MAX, LOG_LOTE, LOG_INTERVALO
 
 
 
 
-def setup_logger(log_relative_path: str):
+def setup_logger(log_relative_path: str, pair: str = None):
 
     """
-    Configura un logger con formato y nivel fijo, que guarda logs en logs/{log_relative_path}.
+    Devuelve el logger de un paso del pipeline. Todos los loggers escriben a un
+    único sink JSON Lines ({LOG_PATH}/{LOG_ARCHIVO}) a través de una cola en memoria:
+    quien loguea solo encola el registro y un hilo de fondo lo escribe en lotes.
+
+    La ruta relativa se conserva como etiqueta: la carpeta es la etapa y el
+    nombre del archivo el logger (ej. 'o4_modeling_logs/convertir_a_csv.log').
 
     Parameters:
     - log_relative_path (str): ruta relativa, ej: 'cleaning/clean_contacts.log'
+    - pair (str): par de monedas con el que se etiquetan los registros (ej. 'USD-BRL').
     """
 
-    # Ruta absoluta a la carpeta logs/ en el root
-    logs_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "logs"))
-    full_log_path = os.path.join(logs_root, log_relative_path)
+    carpeta, archivo = os.path.split(log_relative_path)
 
-    os.makedirs(os.path.dirname(full_log_path), exist_ok=True)
+    etapa = carpeta.split("/")[0].replace("_logs", "") or "general"
 
-    # Crear logger específico para este archivo
-    logger_name = os.path.splitext(os.path.basename(log_relative_path))[0]
-    logger = logging.getLogger(logger_name)
-    logger.setLevel(logging.INFO)
+    logger = logging.getLogger(f"{etapa}.{os.path.splitext(archivo)[0]}")
 
     if not logger.handlers:
-        handler = logging.FileHandler(full_log_path, mode="a", encoding="utf-8")
-        formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.addHandler(_manejador_cola())
         logger.propagate = False  # evita duplicación en consola
 
+    if pair is not None:
+        return logging.LoggerAdapter(logger, {"pair": pair})
+
     return logger
+
+
+
+
+def vaciar_logs(timeout: float = 5.0):
+
+    """
+    Espera a que el hilo de fondo escriba todo lo encolado hasta ahora.
+    """
+
+    if _ESTADO["manejador"] is not None:
+        _ESTADO["manejador"].vaciar(timeout)
+
+
+
+
+_ESTADO = {"manejador": None, "lock": threading.Lock()}
+
+
+
+
+def _manejador_cola():
+
+    with _ESTADO["lock"]:
+
+        if _ESTADO["manejador"] is None:
+
+            _ESTADO["manejador"] = _ManejadorColaJsonl(os.path.join(LOG_PATH, LOG_ARCHIVO))
+
+            atexit.register(_ESTADO["manejador"].cerrar)
+
+        return _ESTADO["manejador"]
+
+
+
+
+class _ManejadorColaJsonl(logging.Handler):
+
+
+
+    def __init__(self, path: str):
+
+        """
+        Handler no bloqueante: emit() arma el registro y lo encola sin esperar.
+        Un hilo de fondo vacía la cola en lotes de hasta LOG_LOTE líneas (o cada
+        LOG_INTERVALO segundos) sobre un único archivo abierto. Si la cola llega
+        a LOG_COLA_MAX, los registros se descartan y se cuentan en lugar de
+        frenar al pipeline.
+
+        En procesos hijos (ProcessPoolExecutor) el hilo no existe: ahí cada
+        registro se escribe directo en modo append.
+        """
+
+        super().__init__()
+
+        self.path = path
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._pid = os.getpid()
+
+        self._cola = queue.Queue(maxsize=LOG_COLA_MAX)
+
+        self._descartados = 0
+
+        self._archivo = open(path, "a", encoding="utf-8")
+
+        self._hilo = threading.Thread(target=self._escribir_en_lotes, name="logs-jsonl", daemon=True)
+
+        self._hilo.start()
+
+
+
+
+    def emit(self, record: logging.LogRecord):
+
+        try:
+            linea = self._registro(record)
+
+            if os.getpid() != self._pid:
+
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(linea, ensure_ascii=False) + "\n")
+
+                return
+
+            self._cola.put_nowait(linea)
+
+        except queue.Full:
+            self._descartados += 1
+
+        except Exception:
+            self.handleError(record)
+
+
+
+
+    def vaciar(self, timeout: float = 5.0):
+
+        if os.getpid() != self._pid:
+            return
+
+        listo = threading.Event()
+
+        try:
+            self._cola.put(listo, timeout=timeout)
+
+        except queue.Full:
+            return
+
+        listo.wait(timeout)
+
+
+
+
+    def cerrar(self):
+
+        if os.getpid() != self._pid or not self._hilo.is_alive():
+            return
+
+        self._cola.put(None)
+
+        self._hilo.join(timeout=10)
+
+
+
+
+    def _registro(self, record: logging.LogRecord) -> dict:
+
+        etapa, _, nombre = record.name.partition(".")
+
+        linea = {
+            "ts": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "nivel": record.levelname,
+            "etapa": etapa,
+            "logger": nombre or etapa,
+            "pair": getattr(record, "pair", None),
+            "mensaje": record.getMessage(),
+        }
+
+        if record.exc_info:
+            linea["excepcion"] = logging.Formatter().formatException(record.exc_info)
+
+        return linea
+
+
+
+
+    def _escribir_en_lotes(self):
+
+        terminar = False
+
+        while not terminar:
+
+            try:
+                primero = self._cola.get(timeout=LOG_INTERVALO)
+
+            except queue.Empty:
+                continue
+
+            lote = [primero]
+
+            while len(lote) < LOG_LOTE:
+
+                try:
+                    lote.append(self._cola.get_nowait())
+
+                except queue.Empty:
+                    break
+
+            lineas = []
+
+            eventos = []
+
+            for item in lote:
+
+                if item is None:
+                    terminar = True
+
+                elif isinstance(item, threading.Event):
+                    eventos.append(item)
+
+                else:
+                    lineas.append(json.dumps(item, ensure_ascii=False))
+
+            if self._descartados:
+
+                lineas.append(json.dumps({"ts": time.strftime("%Y-%m-%d %H:%M:%S"), "nivel": "WARNING", "etapa": "logs",
+                                          "logger": "cola", "pair": None,
+                                          "mensaje": f"⚠️ Cola de logs llena: {self._descartados} registros descartados."},
+                                         ensure_ascii=False))
+
+                self._descartados = 0
+
+            if lineas:
+
+                self._archivo.write("\n".join(lineas) + "\n")
+
+                self._archivo.flush()
+
+            for evento in eventos:
+                evento.set()
+
+        self._archivo.close()
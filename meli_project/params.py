@@ -15,4 +15,119 @@ GOOGLE_APPLICATION_CREDENTIALS = os.environ.get('GOOGLE_APPLICATION_CREDENTIALS'
 API_KEY_AWESOME = os.environ.get('API_KEY_AWESOME')
 
 
+# Extracción concurrente: máximo de descargas en vuelo y límite de requests por host
+EXTRACCION_MAX_EN_VUELO = int(os.environ.get('EXTRACCION_MAX_EN_VUELO', 8))
+
+EXTRACCION_REQUESTS_POR_SEGUNDO = float(os.environ.get('EXTRACCION_REQUESTS_POR_SEGUNDO', 5))
+
+# Extracción incremental: solo se piden los días que faltan en bronze
+EXTRACCION_INCREMENTAL = os.environ.get('EXTRACCION_INCREMENTAL', 'false').lower() == 'true'
+
+# Backfill histórico: días por shard (cada shard es una llamada a la API y debe entrar en su límite de registros)
+BACKFILL_DIAS_POR_SHARD = int(os.environ.get('BACKFILL_DIAS_POR_SHARD', 360))
+
+# Formato de almacenamiento bronze: "json" (compacto) o "jsonl.gz" (JSON Lines comprimido)
+BRONZE_FORMATO = os.environ.get('BRONZE_FORMATO', 'json')
+
+
+# Limpieza: procesos para convertir los JSON de bronze en paralelo (1 = secuencial)
+LIMPIEZA_N_WORKERS = int(os.environ.get('LIMPIEZA_N_WORKERS', 1))
+
+# Camino Arrow nativo bronze → silver (sin DataFrames de pandas intermedios)
+PIPELINE_ARROW = os.environ.get('PIPELINE_ARROW', 'false').lower() == 'true'
+
+# Modo streaming bronze → silver: lotes chicos hacia un ParquetWriter (memoria acotada por lote)
+PIPELINE_STREAMING = os.environ.get('PIPELINE_STREAMING', 'false').lower() == 'true'
+
+STREAMING_FILAS_POR_LOTE = int(os.environ.get('STREAMING_FILAS_POR_LOTE', 50_000))
+
+
+# Parquet silver: compresión, tamaño de row group (filas) y columnas guardadas como float32
+SILVER_COMPRESION = os.environ.get('SILVER_COMPRESION', 'zstd')
+
+SILVER_ROW_GROUP = int(os.environ.get('SILVER_ROW_GROUP', 250_000))
+
+SILVER_COLUMNAS_FLOAT32 = [c for c in os.environ.get('SILVER_COLUMNAS_FLOAT32', '').split(',') if c]
+
+# Calidad de datos bronze → silver: las filas que fallan una regla van a cuarentena (data/o2_calidad)
+# - outlier: desvío relativo del valor medio contra la mediana móvil del par (ventana en cotizaciones)
+# - hueco: más de CALIDAD_MAX_HUECO_DIAS días entre dos fechas consecutivas con cotización del par (viernes → lunes = 3)
+CALIDAD_ACTIVA = os.environ.get('CALIDAD_ACTIVA', 'true').lower() == 'true'
+
+CALIDAD_VENTANA_MEDIANA = int(os.environ.get('CALIDAD_VENTANA_MEDIANA', 21))
+
+CALIDAD_UMBRAL_OUTLIER = float(os.environ.get('CALIDAD_UMBRAL_OUTLIER', 0.25))
+
+CALIDAD_MAX_HUECO_DIAS = int(os.environ.get('CALIDAD_MAX_HUECO_DIAS', 4))
+
+# Silver/gold como dataset Hive particionado (base_currency=USD/date=YYYY-MM-DD/) en lugar de un único archivo
+DATASET_PARTICIONADO = os.environ.get('DATASET_PARTICIONADO', 'false').lower() == 'true'
+
+
+# Exportación CSV en gold: filas por lote y salida comprimida (.csv.gz)
+CSV_FILAS_POR_LOTE = int(os.environ.get('CSV_FILAS_POR_LOTE', 100_000))
+
+CSV_GZIP = os.environ.get('CSV_GZIP', 'false').lower() == 'true'
+
+
+# Tasas cruzadas en gold (derivadas vía BRL): subconjunto de monedas (vacío = todas),
+# formato "largo" (una fila por par origen/destino) o "ancho" (una columna por moneda destino)
+# y antigüedad máxima (días) de la última cotización usada en cada día
+CRUCES_MONEDAS = [m for m in os.environ.get('CRUCES_MONEDAS', '').split(',') if m]
+
+CRUCES_FORMATO = os.environ.get('CRUCES_FORMATO', 'largo')
+
+CRUCES_TOLERANCIA_DIAS = int(os.environ.get('CRUCES_TOLERANCIA_DIAS', 7))
+
+
+# Carga a BigQuery: "load_job" (Parquet directo) o "to_gbq" (vía DataFrame), y jobs en paralelo
+BQ_MODO_CARGA = os.environ.get('BQ_MODO_CARGA', 'load_job')
+
+BQ_MAX_CARGAS_SIMULTANEAS = int(os.environ.get('BQ_MAX_CARGAS_SIMULTANEAS', 4))
+
+# Serving incremental: staging + MERGE por (par, date_time) en lugar de reemplazar la tabla
+BQ_INCREMENTAL = os.environ.get('BQ_INCREMENTAL', 'false').lower() == 'true'
+
+
+# Logs: un único archivo JSON Lines (en logs/) escrito por un hilo de fondo desde una cola acotada
+LOG_ARCHIVO = os.environ.get('LOG_ARCHIVO', 'pipeline.jsonl')
+
+LOG_PATH = os.environ.get('LOG_PATH', os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "logs")))
+
+LOG_COLA_MAX = int(os.environ.get('LOG_COLA_MAX', 50_000))
+
+LOG_LOTE = int(os.environ.get('LOG_LOTE', 500))
+
+LOG_INTERVALO = float(os.environ.get('LOG_INTERVALO', 0.5))
+
+
+# Cliente HTTP: timeouts (segundos) y reintentos con backoff exponencial
+HTTP_TIMEOUT_CONEXION = float(os.environ.get('HTTP_TIMEOUT_CONEXION', 5))
+
+HTTP_TIMEOUT_LECTURA = float(os.environ.get('HTTP_TIMEOUT_LECTURA', 30))
+
+HTTP_MAX_REINTENTOS = int(os.environ.get('HTTP_MAX_REINTENTOS', 4))
+
+HTTP_BACKOFF_BASE = float(os.environ.get('HTTP_BACKOFF_BASE', 0.5))
+
+HTTP_BACKOFF_MAX = float(os.environ.get('HTTP_BACKOFF_MAX', 30))
+
+
+# Caché HTTP en disco (TTL en segundos, 0 = siempre revalidar)
+HTTP_CACHE_ACTIVO = os.environ.get('HTTP_CACHE_ACTIVO', 'true').lower() == 'true'
+
+HTTP_CACHE_TTL = float(os.environ.get('HTTP_CACHE_TTL', 3600))
+
+
+# Métricas por etapa/par (reporte JSON + textfile Prometheus) y etapas a perfilar con cProfile/tracemalloc
+# (lista separada por coma de nombres de etapa de main.py, o "todas")
+PERFILAR_ETAPAS = [e for e in os.environ.get('PERFILAR_ETAPAS', '').split(',') if e]
+
+
 ##################  PATHS  ##################
+
+# Carpeta de métricas y perfiles (por defecto junto a los logs)
+METRICAS_PATH = os.environ.get('METRICAS_PATH', os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "logs", "metricas")))
+
+# Intervalo (segundos) de muestreo del RSS mientras corre cada etapa
+METRICAS_MUESTREO_RSS = float(os.environ.get('METRICAS_MUESTREO_RSS', 0.05))
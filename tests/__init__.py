@@ -0,0 +1,18 @@
+import os
+import shutil
+import atexit
+import tempfile
+
+
+
+
+# Los tests no escriben en logs/ del repositorio: el sink de logs y las métricas
+# van a una carpeta temporal. Se define antes de importar meli_project.params
+# (este paquete se importa antes que cualquier módulo de test).
+_TMP_LOGS = tempfile.mkdtemp(prefix="meli_tests_logs_")
+
+os.environ.setdefault("LOG_PATH", _TMP_LOGS)
+
+os.environ.setdefault("METRICAS_PATH", os.path.join(_TMP_LOGS, "metricas"))
+
+atexit.register(shutil.rmtree, _TMP_LOGS, True)
@@ -0,0 +1,173 @@
+import io
+import re
+import itertools
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+
+
+CLAVES = ["base_currency", "destination_currency", "date_time"]
+
+
+
+
+class JobFalso:
+
+    _ids = itertools.count()
+
+    def __init__(self, cliente, destino: str, filas: int = None, error: str = None, resultado: list = None):
+
+        self.cliente = cliente
+
+        self.destino = destino
+
+        self.job_id = f"job_{next(self._ids)}"
+
+        self.output_rows = filas
+
+        self.error = error
+
+        self.resultado = resultado or []
+
+    def result(self):
+
+        self.cliente.eventos.append(("result", self.destino))
+
+        if self.error:
+            raise RuntimeError(self.error)
+
+        return [dict(fila) for fila in self.resultado]
+
+
+
+
+class ClienteBigQueryFalso:
+
+    """
+    Cliente de BigQuery en memoria para los tests. Guarda cada tabla como un
+    DataFrame y registra las llamadas en orden (eventos):
+    - ("submit", destino) al recibir un load job y ("result", destino) al esperarlo
+    - cargas: (destino, job_config, filas) de cada load job
+    - consultas: el SQL de cada query
+
+    Solo entiende las consultas que emite CargadorBigQuery.cargar_incremental.
+    Con fallar={"tabla": "motivo"} los load jobs de esa tabla fallan al esperar el resultado.
+    """
+
+    def __init__(self, fallar: dict = None):
+
+        self.tablas = {}
+
+        self.creadas = {}
+
+        self.borradas = []
+
+        self.cargas = []
+
+        self.consultas = []
+
+        self.eventos = []
+
+        self.fallar = fallar or {}
+
+        # Si se define, el MERGE descarta esta cantidad de filas (para forzar un conteo inconsistente)
+        self.perder_filas_en_merge = 0
+
+    def load_table_from_file(self, fuente, destino, job_config=None):
+
+        tabla = pq.read_table(io.BytesIO(fuente.read())).to_pandas()
+
+        self.cargas.append((destino, job_config, len(tabla)))
+
+        self.eventos.append(("submit", destino))
+
+        base = destino.split("$")[0]
+
+        error = next((motivo for nombre, motivo in self.fallar.items() if base.endswith(f".{nombre}")), None)
+
+        if error is None:
+
+            if job_config.write_disposition == "WRITE_APPEND" and base in self.tablas:
+                tabla = pd.concat([self.tablas[base], tabla], ignore_index=True)
+
+            self.tablas[base] = tabla
+
+        return JobFalso(self, destino, filas=len(tabla), error=error)
+
+    def create_table(self, tabla, exists_ok=False):
+
+        self.creadas[f"{tabla.project}.{tabla.dataset_id}.{tabla.table_id}"] = tabla
+
+        return tabla
+
+    def delete_table(self, tabla, not_found_ok=False):
+
+        self.borradas.append(tabla)
+
+        self.tablas.pop(tabla, None)
+
+    def query(self, sql: str):
+
+        self.consultas.append(sql)
+
+        nombres = re.findall(r"`([^`]+)`", sql)
+
+        sql = sql.strip()
+
+        if sql.startswith("SELECT COUNT(*) AS n FROM (SELECT DISTINCT"):
+
+            staging = self._tabla(nombres[0]).drop_duplicates(CLAVES)
+
+            destino = self._tabla(nombres[1])
+
+            cruce = staging[CLAVES].merge(destino[CLAVES], on=CLAVES, how="left", indicator=True) if not destino.empty \
+                else staging.assign(_merge="left_only")
+
+            return JobFalso(self, nombres[0], resultado=[{"n": int((cruce["_merge"] == "left_only").sum())}])
+
+        if sql.startswith("SELECT COUNT(*)"):
+            return JobFalso(self, nombres[0], resultado=[{"n": len(self._tabla(nombres[0]))}])
+
+        if sql.startswith("MERGE"):
+
+            destino, staging = nombres[0], nombres[1]
+
+            nuevas = self._tabla(staging).drop_duplicates(CLAVES)
+
+            unida = pd.concat([self._tabla(destino), nuevas], ignore_index=True).drop_duplicates(CLAVES, keep="last")
+
+            self.tablas[destino] = unida.iloc[:len(unida) - self.perder_filas_en_merge]
+
+            return JobFalso(self, destino)
+
+        raise NotImplementedError(sql)
+
+    def _tabla(self, nombre: str) -> pd.DataFrame:
+
+        tabla = self.tablas.get(nombre)
+
+        if tabla is None:
+            return pd.DataFrame(columns=CLAVES)
+
+        return tabla.astype({"base_currency": str, "destination_currency": str})
+
+
+
+
+def tabla_gold(pares: list, dias: int, inicio: str = "2024-01-01") -> pa.Table:
+
+    """
+    Tabla con el esquema de currencies_transformadas: una cotización diaria por par.
+    """
+
+    fechas = pd.date_range(inicio, periods=dias, freq="D", tz="UTC")
+
+    filas = [
+        {"base_currency": par.split("-")[0], "destination_currency": par.split("-")[1],
+         "purchase_value": 1.0 + i / 100, "sale_value": 1.01 + i / 100, "date_time": fecha}
+        for par in pares for i, fecha in enumerate(fechas)
+    ]
+
+    return pa.Table.from_pandas(pd.DataFrame(filas), preserve_index=False)
@@ -0,0 +1,272 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse, parse_qs
+from meli_project.logic.o1_extraction import api_wb, backfill
+from meli_project.logic.o1_extraction.api_wb import CurrencyExtractor
+from meli_project.logic.o1_extraction.backfill import BackfillHistorico
+from meli_project.logic.utils.bronze import fusionar_registros, leer_payload, ruta_bronze
+
+
+
+
+HOY = datetime(2025, 1, 31, tzinfo=timezone.utc)
+
+
+
+
+def registros_api(pair: str, inicio: datetime, fin: datetime, bid: str = "1.0000") -> list:
+
+    """
+    Payload del endpoint daily entre dos fechas: una cotización por día (12:00 UTC),
+    del más reciente al más antiguo, con la cabecera en el primer registro.
+    """
+
+    code, codein = pair.split("-")
+
+    registros = []
+
+    dia = fin
+
+    while dia >= inicio:
+
+        registros.append({"bid": bid, "ask": "1.0100", "timestamp": str(int((dia + timedelta(hours=12)).timestamp()))})
+
+        dia -= timedelta(days=1)
+
+    if registros:
+        registros[0] = {"code": code, "codein": codein, "name": f"{code}/{codein}", **registros[0]}
+
+    return registros
+
+
+
+
+class RespuestaFalsa:
+
+    def __init__(self, registros: list):
+
+        self.status_code = 200
+
+        self._registros = registros
+
+        self.content = b"[]"
+
+    def json(self):
+
+        return self._registros
+
+
+
+
+class HttpFalso:
+
+    """
+    Reemplaza al HttpClient del extractor: responde el rango start_date/end_date
+    pedido (o los últimos N días hasta HOY) y cuenta los requests.
+    """
+
+    def __init__(self, bid: str = "1.0000", vacios: tuple = ()):
+
+        self.urls = []
+
+        self.bid = bid
+
+        # Pares para los que la API no tiene datos
+        self.vacios = vacios
+
+    def get(self, url):
+
+        self.urls.append(url)
+
+        partes = urlparse(url)
+
+        pair, dias = partes.path.strip("/").split("/")[-2:]
+
+        consulta = parse_qs(partes.query)
+
+        if "start_date" in consulta:
+
+            inicio = datetime.strptime(consulta["start_date"][0], "%Y%m%d").replace(tzinfo=timezone.utc)
+
+            fin = datetime.strptime(consulta["end_date"][0], "%Y%m%d").replace(tzinfo=timezone.utc)
+
+        else:
+
+            inicio, fin = HOY - timedelta(days=int(dias) - 1), HOY
+
+        return RespuestaFalsa([] if pair in self.vacios else registros_api(pair, inicio, fin, self.bid))
+
+    def bronze_vigente(self, url, response, path):
+
+        return False
+
+    def confirmar(self, url, response, path):
+
+        pass
+
+    def resumen_latencias(self):
+
+        return {}
+
+
+
+
+class TestBackfill(unittest.TestCase):
+
+
+    def setUp(self):
+
+        self.tmp = tempfile.mkdtemp()
+
+        self.extractor = CurrencyExtractor(numero_dias=10, requests_por_segundo=0, incremental=False, usar_cache=False)
+
+        self.extractor.bronze_path = self.tmp
+
+        self.extractor.base_url = "http://api.local/json/daily"
+
+        self.extractor.http = HttpFalso()
+
+        self.backfill = BackfillHistorico(self.extractor, dias_por_shard=30,
+                                          checkpoint_path=os.path.join(self.tmp, "checkpoint.json"))
+
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+    def _bronze(self, pair: str = "USD-BRL") -> list:
+
+        return leer_payload(ruta_bronze(self.tmp, pair, self.extractor.formato_bronze))
+
+
+    def test_extraccion_diaria_conserva_la_historia_del_backfill(self):
+
+        self.assertIn("✅", self.backfill.ejecutar("2024-01-01", "2024-12-31", ["USD-BRL"]))
+
+        self.assertEqual(len(self._bronze()), 366)
+
+        # La ventana diaria (no incremental) pisa sus días pero no borra los anteriores
+        self.extractor.http = HttpFalso(bid="2.0000")
+
+        self.extractor.descargar_json_moneda("USD-BRL")
+
+        registros = self._bronze()
+
+        self.assertEqual(len(registros), 366 + 10)
+
+        self.assertEqual(registros[0]["code"], "USD")
+
+        self.assertEqual([r["bid"] for r in registros[:10]], ["2.0000"] * 10)
+
+        self.assertEqual(len({r["timestamp"] for r in registros}), len(registros))
+
+
+    def test_extraccion_diaria_y_backfill_en_paralelo_no_se_pisan(self):
+
+        def fusion_lenta(existentes, nuevos):
+
+            # Agranda la ventana entre leer y escribir bronze
+            time.sleep(0.02)
+
+            return fusionar_registros(existentes, nuevos)
+
+        with mock.patch.object(backfill, "fusionar_registros", fusion_lenta), \
+                mock.patch.object(api_wb, "fusionar_registros", fusion_lenta), ThreadPoolExecutor(1) as executor:
+
+            historia = executor.submit(self.backfill.ejecutar, "2024-01-01", "2024-12-31", ["USD-BRL"])
+
+            # La extracción diaria del mismo par corre mientras se fusionan los shards
+            while not historia.done():
+                self.extractor.descargar_json_moneda("USD-BRL")
+
+            self.assertIn("✅", historia.result())
+
+        self.assertEqual(len(self._bronze()), 366 + 10)
+
+
+    def test_checkpoint_usa_un_temporal_unico(self):
+
+        self.backfill.ejecutar("2024-01-01", "2024-01-31", ["USD-BRL"])
+
+        # Un .tmp fijo de otro proceso no se pisa ni se usa
+        with open(f"{self.backfill.checkpoint_path}.tmp", "w", encoding="utf-8") as f:
+            f.write("{")
+
+        self.backfill.ejecutar("2024-02-01", "2024-02-29", ["USD-BRL"])
+
+        self.assertTrue(any(":20240201-" in shard for shard in self.backfill._leer_checkpoint()))
+
+        self.assertEqual(sorted(f for f in os.listdir(self.tmp) if "checkpoint" in f), ["checkpoint.json", "checkpoint.json.tmp"])
+
+
+    def test_checkpoint_se_saltea_si_bronze_tiene_los_shards(self):
+
+        self.backfill.ejecutar("2024-01-01", "2024-06-30", ["USD-BRL", "EUR-BRL"])
+
+        requests = len(self.extractor.http.urls)
+
+        self.assertEqual(requests, 2 * 7)
+
+        self.backfill.ejecutar("2024-01-01", "2024-06-30", ["USD-BRL", "EUR-BRL"])
+
+        self.assertEqual(len(self.extractor.http.urls), requests)
+
+
+    def test_shards_sin_bronze_se_vuelven_a_descargar(self):
+
+        self.backfill.ejecutar("2024-01-01", "2024-06-30", ["USD-BRL", "EUR-BRL"])
+
+        os.remove(ruta_bronze(self.tmp, "EUR-BRL", self.extractor.formato_bronze))
+
+        self.extractor.http.urls.clear()
+
+        self.backfill.ejecutar("2024-01-01", "2024-06-30", ["USD-BRL", "EUR-BRL"])
+
+        self.assertEqual(len(self.extractor.http.urls), 7)
+
+        self.assertTrue(all("/EUR-BRL/" in url for url in self.extractor.http.urls))
+
+        self.assertEqual(len(self._bronze("EUR-BRL")), 182)
+
+
+    def test_historia_pisada_vuelve_a_quedar_pendiente(self):
+
+        self.backfill.ejecutar("2024-01-01", "2024-06-30", ["USD-BRL"])
+
+        # Bronze reescrito solo con los últimos días (como hacía la extracción diaria)
+        path = ruta_bronze(self.tmp, "USD-BRL", self.extractor.formato_bronze)
+
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("[]")
+
+        self.extractor.http.urls.clear()
+
+        self.backfill.ejecutar("2024-01-01", "2024-06-30", ["USD-BRL"])
+
+        self.assertEqual(len(self.extractor.http.urls), 7)
+
+
+    def test_shard_sin_registros_sigue_completado(self):
+
+        self.extractor.http = HttpFalso(vacios=("XYZ-BRL",))
+
+        self.backfill.ejecutar("2024-01-01", "2024-01-31", ["XYZ-BRL"])
+
+        self.assertIsNone(self._bronze("XYZ-BRL"))
+
+        self.backfill.ejecutar("2024-01-01", "2024-01-31", ["XYZ-BRL"])
+
+        self.assertEqual(len(self.extractor.http.urls), 2)
+
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import json
+import unittest
+from urllib.request import urlopen
+from benchmarks.datos_sinteticos import ServidorApiMock, generar_payload, pares_sinteticos
+from benchmarks.run_benchmarks import benchmark_escala, medir
+
+
+
+
+class TestDatosSinteticos(unittest.TestCase):
+
+
+    def test_payload_con_forma_de_awesomeapi(self):
+
+        payload = generar_payload("S000-BRL", 10)
+
+        self.assertEqual(len(payload), 10)
+
+        self.assertEqual((payload[0]["code"], payload[0]["codein"]), ("S000", "BRL"))
+
+        self.assertNotIn("code", payload[1])
+
+        # Del más reciente al más antiguo, un día entre registros
+        marcas = [int(r["timestamp"]) for r in payload]
+
+        self.assertEqual([a - b for a, b in zip(marcas, marcas[1:])], [86400] * 9)
+
+        self.assertTrue(all(float(r["ask"]) >= float(r["bid"]) for r in payload))
+
+        self.assertEqual(payload, generar_payload("S000-BRL", 10))
+
+
+    def test_servidor_mock(self):
+
+        with ServidorApiMock(3, 7) as servidor:
+
+            with urlopen(f"{servidor.url_base}/available") as respuesta:
+                self.assertEqual(sorted(json.load(respuesta)), pares_sinteticos(3))
+
+            with urlopen(f"{servidor.url_base}/daily/S001-BRL/7") as respuesta:
+                self.assertEqual(json.load(respuesta), generar_payload("S001-BRL", 7))
+
+            self.assertEqual(servidor.requests, 2)
+
+
+
+
+class TestBenchmarkEscala(unittest.TestCase):
+
+
+    def test_mide_todas_las_etapas_y_carga_gold(self):
+
+        resultados = benchmark_escala(3, 20, repeticiones=1, latencia=0.0, max_en_vuelo=2)
+
+        por_etapa = {r["etapa"]: r for r in resultados}
+
+        self.assertEqual(list(por_etapa), ["extraccion", "limpieza", "transformacion", "modelado", "carga_bigquery"])
+
+        registros = resultados[0]["registros"]
+
+        self.assertGreater(registros, 0)
+
+        for resultado in resultados:
+
+            self.assertEqual((resultado["pares"], resultado["dias"], resultado["registros"]), (3, 20, registros))
+
+            self.assertGreaterEqual(resultado["segundos_mediana"], resultado["segundos_min"])
+
+        carga = por_etapa["carga_bigquery"]
+
+        # Las tablas de Gold (serie completa y agregados) llegan al cliente falso
+        self.assertGreater(carga["tablas"], 1)
+
+        self.assertGreater(carga["filas_cargadas"], 0)
+
+
+    def test_etapa_con_error_corta_el_benchmark(self):
+
+        with self.assertRaises(RuntimeError):
+            medir(lambda: "❌ Carpeta GOLD no encontrada.", 2)
+
+
+
+
+if __name__ == "__main__":
+    unittest.main()
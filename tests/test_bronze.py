@@ -0,0 +1,106 @@
+import io
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from meli_project.logic.utils.bronze import (
+    TAMANO_BLOQUE_JSON, _iterar_array_json, escribir_payload, iterar_registros, leer_registros,
+)
+
+
+
+
+DOCUMENTO = """ [
+    {"bid": "5.4321", "ask": "5.44", "timestamp": "1704067200", "name": "Dólar, \\"americano\\" ]"},
+    12.5, -0.25, 1e5, -3.75E-2, 0, -7, 1234567890.0987654321,
+    "texto con ] y , adentro", "", true, false, null,
+    [1, [2.5, "]"], {}], {"anidado": {"lista": [1.5e3, -2], "vacio": []}},
+    {"high": "1.1", "low": "1.0", "timestamp": "1704153600"}
+] """
+
+
+
+
+class TestIterarArrayJson(unittest.TestCase):
+
+
+    def _decodificar(self, texto: str, tamano_bloque: int) -> list:
+
+        return list(_iterar_array_json(io.StringIO(texto), tamano_bloque=tamano_bloque))
+
+
+    def test_igual_a_json_load_con_cualquier_tamano_de_bloque(self):
+
+        esperado = json.loads(DOCUMENTO)
+
+        for tamano_bloque in (1, 2, 3, 4, 5, 7, 11, 16, 64):
+
+            with self.subTest(tamano_bloque=tamano_bloque):
+                self.assertEqual(self._decodificar(DOCUMENTO, tamano_bloque), esperado)
+
+
+    def test_numero_cortado_en_el_borde_del_bloque_por_defecto(self):
+
+        for corte in ("12", "12.", "-", "1e", "1e-", "-3.75E"):
+
+            # El número queda partido justo en el límite de TAMANO_BLOQUE_JSON
+            relleno = " " * (TAMANO_BLOQUE_JSON - len(corte) - 1)
+
+            documento = f"[{relleno}{corte}{'12.5'[len(corte):] if corte.startswith('12') else '5'}]"
+
+            with self.subTest(corte=corte):
+                self.assertEqual(self._decodificar(documento, TAMANO_BLOQUE_JSON), json.loads(documento))
+
+
+    def test_documentos_invalidos(self):
+
+        for texto in ("", "   ", '{"a": 1}', "[1, 2", "[1 2]", "[1,, 2]", "[12.5.3]"):
+
+            for tamano_bloque in (1, 3, 64):
+
+                with self.subTest(texto=texto, tamano_bloque=tamano_bloque), self.assertRaises(ValueError):
+                    self._decodificar(texto, tamano_bloque)
+
+
+    def test_array_vacio(self):
+
+        self.assertEqual(self._decodificar(" [ ] ", 1), [])
+
+
+
+
+class TestArchivosBronze(unittest.TestCase):
+
+
+    def setUp(self):
+
+        self.tmp = tempfile.mkdtemp()
+
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+    def test_formatos_leen_los_mismos_registros(self):
+
+        registros = json.loads(DOCUMENTO)[:1] + [{"bid": f"{i / 7:.4f}", "timestamp": str(1704067200 + i)} for i in range(50)]
+
+        for formato in ("json", "jsonl.gz"):
+
+            path = os.path.join(self.tmp, f"USD-BRL.{formato}")
+
+            escribir_payload(path, registros)
+
+            with self.subTest(formato=formato):
+
+                self.assertEqual(list(iterar_registros(path)), registros)
+
+                self.assertEqual(leer_registros(path), registros)
+
+
+
+
+if __name__ == "__main__":
+    unittest.main()
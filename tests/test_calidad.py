@@ -0,0 +1,143 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from meli_project.logic.o3_transformation.calidad import ControlCalidad
+from meli_project.logic.utils.esquemas import construir_esquema_silver
+
+
+
+
+def serie(base: str, dias: int, inicio: str = "2024-01-01", semilla: int = 0) -> pd.DataFrame:
+
+    """
+    Cotizaciones diarias de un par, de la más reciente a la más antigua (como bronze).
+    """
+
+    valores = np.exp(np.cumsum(np.random.default_rng(semilla).normal(0, 0.005, dias))) * 5
+
+    df = pd.DataFrame({
+        "base_currency": base, "destination_currency": "BRL",
+        "purchase_value": valores, "sale_value": valores * 1.001,
+        "date_time": pd.date_range(inicio, periods=dias, freq="D", tz="UTC"),
+    })
+
+    return df.iloc[::-1].reset_index(drop=True)
+
+
+
+
+def tabla_silver(df: pd.DataFrame) -> pa.Table:
+
+    return pa.Table.from_pandas(df, schema=construir_esquema_silver(), preserve_index=False)
+
+
+
+
+def filas(tabla: pa.Table) -> list:
+
+    return sorted(tabla.to_pandas().astype(str).itertuples(index=False, name=None))
+
+
+
+
+class TestCalidadEnLotes(unittest.TestCase):
+
+
+    def setUp(self):
+
+        self.tmp = tempfile.mkdtemp()
+
+        usd = serie("USD", 80, semilla=1)
+
+        eur = serie("EUR", 80, semilla=2).drop(index=range(30, 45))
+
+        # Outliers cerca de los bordes de lote, inválidos y duplicados lejos de la original
+        usd.loc[[9, 10, 41], ["purchase_value", "sale_value"]] = [[50.0, 50.1], [0.5, 0.51], [40.0, 40.2]]
+
+        usd.loc[20, "sale_value"] = np.nan
+
+        eur.loc[5, "sale_value"] = eur.loc[5, "purchase_value"] * 0.9
+
+        self.tabla = tabla_silver(pd.concat([usd, eur, usd.iloc[[3, 60]], eur.iloc[[60]]], ignore_index=True))
+
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+    def _evaluar(self, tamano_lote: int = None):
+
+        control = ControlCalidad(path=f"{self.tmp}/{tamano_lote}")
+
+        if tamano_lote is None:
+            validas = control.evaluar(self.tabla)
+
+        else:
+
+            lotes = (self.tabla.slice(inicio, tamano_lote) for inicio in range(0, self.tabla.num_rows, tamano_lote))
+
+            validas = pa.concat_tables(list(control.evaluar_lotes(lotes)))
+
+        reporte = control.guardar()
+
+        cuarentena = pq.read_table(f"{control.path}/cuarentena.parquet")
+
+        return validas, cuarentena, reporte
+
+
+    def test_lotes_igual_a_la_tabla_completa(self):
+
+        validas, cuarentena, reporte = self._evaluar()
+
+        self.assertEqual(reporte["reglas"], {"valor_invalido": 1, "duplicado": 3, "venta_menor_compra": 1, "outlier": 3})
+
+        self.assertEqual([(h["pair"], h["dias"]) for h in reporte["huecos"]["detalle"]], [("EUR-BRL", 16)])
+
+        for tamano_lote in (1, 2, 3, 7, 13, 40, 500):
+
+            with self.subTest(tamano_lote=tamano_lote):
+
+                validas_lotes, cuarentena_lotes, reporte_lotes = self._evaluar(tamano_lote)
+
+                self.assertEqual(filas(validas_lotes), filas(validas))
+
+                self.assertEqual(filas(cuarentena_lotes), filas(cuarentena))
+
+                for clave in ("filas_evaluadas", "filas_cuarentena", "reglas", "pares", "huecos"):
+                    self.assertEqual(reporte_lotes[clave], reporte[clave])
+
+
+    def test_evaluar_conserva_el_orden(self):
+
+        validas, _, _ = self._evaluar()
+
+        originales = list(self.tabla.to_pandas().astype(str).itertuples(index=False, name=None))
+
+        posiciones = [originales.index(fila) for fila in validas.to_pandas().astype(str).itertuples(index=False, name=None)]
+
+        self.assertEqual(posiciones, sorted(posiciones))
+
+
+    def test_sin_cuarentena_borra_la_anterior(self):
+
+        self._evaluar()
+
+        control = ControlCalidad(path=f"{self.tmp}/None")
+
+        control.evaluar(tabla_silver(serie("USD", 10)))
+
+        self.assertEqual(control.guardar()["filas_cuarentena"], 0)
+
+        self.assertEqual(os.listdir(control.path), ["reporte_calidad.json"])
+
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,401 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import pyarrow as pa
+import pyarrow.parquet as pq
+from meli_project.logic.o5_serving import carga_gcp
+from meli_project.logic.o5_serving.carga_gcp import CargadorBigQuery
+from meli_project.logic.utils.manifiesto import Manifiesto
+from meli_project.logic.utils.particiones import escribir_dataset_particionado
+from tests.cliente_bigquery_falso import ClienteBigQueryFalso, tabla_gold
+
+
+
+
+PARES = ["USD-BRL", "EUR-BRL", "ARS-BRL"]
+
+DESTINO = "reportes-bedoya-389011.dataframes_meli.currencies_transformadas"
+
+
+
+
+class TestCargaIncremental(unittest.TestCase):
+
+
+    def setUp(self):
+
+        self.tmp = tempfile.mkdtemp()
+
+        self.cliente = ClienteBigQueryFalso()
+
+        self.cargador = self._cargador()
+
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+    def _cargador(self) -> CargadorBigQuery:
+
+        cargador = CargadorBigQuery(client=self.cliente, incremental=True)
+
+        cargador.gold_path = self.tmp
+
+        cargador.manifiesto = Manifiesto(os.path.join(self.tmp, "manifiesto.json"))
+
+        return cargador
+
+
+    def _escribir_gold(self, dias: int, inicio: str = "2024-01-01", tabla=None):
+
+        tabla = tabla if tabla is not None else tabla_gold(PARES, dias, inicio)
+
+        pq.write_table(tabla, os.path.join(self.tmp, "currencies_transformadas.parquet"))
+
+
+    def _stagings(self) -> list:
+
+        return [destino for destino, _, _ in self.cliente.cargas if "__staging" in destino]
+
+
+    def test_primera_carga_crea_destino_particionado_y_borra_staging(self):
+
+        self._escribir_gold(10)
+
+        resultado = self.cargador.cargar_incremental()
+
+        self.assertEqual(resultado, "dataframes_meli.currencies_transformadas")
+
+        self.assertEqual(len(self.cliente.tablas[DESTINO]), 30)
+
+        tabla = self.cliente.creadas[DESTINO]
+
+        self.assertEqual(tabla.time_partitioning.field, "date_time")
+
+        self.assertEqual(tabla.clustering_fields, ["base_currency", "destination_currency"])
+
+        staging = self._stagings()[0]
+
+        self.assertEqual(self.cliente.borradas, [staging])
+
+        self.assertNotIn(staging, self.cliente.tablas)
+
+
+    def test_inserta_solo_claves_nuevas(self):
+
+        self._escribir_gold(10)
+
+        self.cargador.cargar_incremental()
+
+        self._escribir_gold(13)
+
+        resultado = self.cargador.cargar_incremental()
+
+        self.assertEqual(resultado, "dataframes_meli.currencies_transformadas")
+
+        self.assertEqual(len(self.cliente.tablas[DESTINO]), 39)
+
+        self.assertEqual(self.cliente.tablas[DESTINO].duplicated(["base_currency", "destination_currency", "date_time"]).sum(), 0)
+
+
+    def test_historia_anterior_de_un_backfill_llega_al_destino(self):
+
+        self._escribir_gold(10, inicio="2024-03-01")
+
+        self.cargador.cargar_incremental()
+
+        # El backfill agrega dos meses previos a lo que ya estaba cargado
+        self._escribir_gold(70, inicio="2024-01-01")
+
+        self.assertEqual(self.cargador.cargar_incremental(), "dataframes_meli.currencies_transformadas")
+
+        destino = self.cliente.tablas[DESTINO]
+
+        self.assertEqual(len(destino), 3 * 70)
+
+        self.assertEqual(destino["date_time"].min().strftime("%Y-%m-%d"), "2024-01-01")
+
+
+    def test_filas_corregidas_se_actualizan(self):
+
+        self._escribir_gold(10)
+
+        self.cargador.cargar_incremental()
+
+        corregida = tabla_gold(PARES, 10).to_pandas()
+
+        corregida.loc[0, "purchase_value"] = 99.0
+
+        self._escribir_gold(10, tabla=pa.Table.from_pandas(corregida, preserve_index=False))
+
+        self.assertEqual(self.cargador.cargar_incremental(), "dataframes_meli.currencies_transformadas")
+
+        destino = self.cliente.tablas[DESTINO]
+
+        self.assertEqual(len(destino), 30)
+
+        self.assertEqual((destino["purchase_value"] == 99.0).sum(), 1)
+
+
+    def test_sql_merge_por_clave_natural_con_poda_de_particiones(self):
+
+        self._escribir_gold(10)
+
+        self.cargador.cargar_incremental()
+
+        self._escribir_gold(12)
+
+        self.cargador.cargar_incremental()
+
+        merge = [q for q in self.cliente.consultas if q.strip().startswith("MERGE")][-1]
+
+        staging = self._stagings()[-1]
+
+        self.assertIn(f"MERGE `{DESTINO}` T", merge)
+
+        self.assertIn(f"SELECT * FROM `{staging}`", merge)
+
+        self.assertIn("QUALIFY ROW_NUMBER() OVER (PARTITION BY base_currency, destination_currency, date_time", merge)
+
+        self.assertIn("T.base_currency = S.base_currency AND T.destination_currency = S.destination_currency "
+                      "AND T.date_time = S.date_time", merge)
+
+        # El destino se acota desde la primera fecha del staging
+        self.assertIn('T.date_time >= TIMESTAMP("2024-01-01T00:00:00+00:00")', merge)
+
+        # Solo se reescriben las filas cuyos valores cambiaron
+        self.assertIn("WHEN MATCHED AND (T.purchase_value IS DISTINCT FROM S.purchase_value "
+                      "OR T.sale_value IS DISTINCT FROM S.sale_value) "
+                      "THEN UPDATE SET purchase_value = S.purchase_value, sale_value = S.sale_value", merge)
+
+        self.assertIn("WHEN NOT MATCHED THEN INSERT", merge)
+
+
+    def test_conteo_inconsistente_devuelve_error_y_borra_staging(self):
+
+        self._escribir_gold(10)
+
+        self.cliente.perder_filas_en_merge = 1
+
+        resultado = self.cargador.cargar_incremental()
+
+        self.assertTrue(resultado.startswith("❌"))
+
+        self.assertIn("Conteo inconsistente", resultado)
+
+        self.assertEqual(self.cliente.borradas, self._stagings())
+
+        self.assertIsNone(self.cargador.manifiesto.obtener("bigquery", "dataframes_meli.currencies_transformadas"))
+
+
+    def test_sin_cambios_se_saltea(self):
+
+        self._escribir_gold(10)
+
+        self.cargador.cargar_incremental()
+
+        cargas = len(self.cliente.cargas)
+
+        self.assertEqual(self.cargador.cargar_incremental(), "dataframes_meli.currencies_transformadas")
+
+        self.assertEqual(len(self.cliente.cargas), cargas)
+
+
+    def test_staging_distinto_en_cada_carga(self):
+
+        self._escribir_gold(10)
+
+        self.cargador.cargar_incremental()
+
+        # Otra corrida (otro cargador) sobre el mismo destino no reutiliza el staging
+        self._escribir_gold(11)
+
+        self._cargador().cargar_incremental()
+
+        primera, segunda = self._stagings()
+
+        self.assertNotEqual(primera, segunda)
+
+        for staging in (primera, segunda):
+            self.assertTrue(staging.startswith(f"{DESTINO}__staging_"))
+
+
+    def test_es_mergeable_lee_solo_el_esquema(self):
+
+        path = os.path.join(self.tmp, "currencies_transformadas")
+
+        escribir_dataset_particionado(tabla_gold(PARES, 5), path)
+
+        pq.write_table(tabla_gold(PARES, 5).drop(["date_time"]), os.path.join(self.tmp, "sin_fecha.parquet"))
+
+        with mock.patch.object(carga_gcp, "leer_dataset", side_effect=AssertionError("leyó datos")), \
+                mock.patch.object(carga_gcp.pq, "read_table", side_effect=AssertionError("leyó datos")):
+
+            self.assertTrue(self.cargador._es_mergeable(path))
+
+            self.assertFalse(self.cargador._es_mergeable(os.path.join(self.tmp, "sin_fecha.parquet")))
+
+
+
+
+class TestCargaLoadJob(unittest.TestCase):
+
+
+    def setUp(self):
+
+        self.tmp = tempfile.mkdtemp()
+
+        self.cliente = ClienteBigQueryFalso()
+
+        self.cargador = self._cargador()
+
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+    def _cargador(self) -> CargadorBigQuery:
+
+        cargador = CargadorBigQuery(client=self.cliente, modo_carga="load_job", incremental=False,
+                                    max_cargas_simultaneas=4)
+
+        cargador.gold_path = self.tmp
+
+        cargador.manifiesto = Manifiesto(os.path.join(self.tmp, "manifiesto.json"))
+
+        return cargador
+
+
+    def _escribir_tablas(self, nombres: list, dias: int = 5):
+
+        for nombre in nombres:
+            pq.write_table(tabla_gold(PARES, dias), os.path.join(self.tmp, f"{nombre}.parquet"))
+
+
+    def test_job_config_parquet_con_esquema_explicito(self):
+
+        self._escribir_tablas(["currencies_transformadas"])
+
+        self.assertEqual(self.cargador.cargar_archivo("currencies_transformadas.parquet"),
+                         "dataframes_meli.currencies_transformadas")
+
+        destino, config, filas = self.cliente.cargas[0]
+
+        self.assertEqual(destino, DESTINO)
+
+        self.assertEqual(filas, 15)
+
+        self.assertEqual(config.source_format, "PARQUET")
+
+        self.assertEqual(config.write_disposition, "WRITE_TRUNCATE")
+
+        self.assertEqual([(c.name, c.field_type) for c in config.schema], [
+            ("base_currency", "STRING"), ("destination_currency", "STRING"), ("purchase_value", "FLOAT64"),
+            ("sale_value", "FLOAT64"), ("date_time", "TIMESTAMP"),
+        ])
+
+
+    def test_carga_filtrada_agrega_en_la_particion_del_dia(self):
+
+        self._escribir_tablas(["currencies_transformadas"])
+
+        self.cargador.cargar_archivo("currencies_transformadas.parquet", pares=["USD-BRL"],
+                                     desde="2024-01-03", hasta="2024-01-03", particion="20240103")
+
+        destino, config, filas = self.cliente.cargas[0]
+
+        self.assertEqual(destino, f"{DESTINO}$20240103")
+
+        self.assertEqual(filas, 1)
+
+        self.assertEqual(config.write_disposition, "WRITE_APPEND")
+
+        self.assertEqual(config.time_partitioning.field, "date_time")
+
+        # Una carga filtrada no cuenta como carga completa de la tabla
+        self.assertIsNone(self.cargador.manifiesto.obtener("bigquery", "dataframes_meli.currencies_transformadas"))
+
+
+    def test_dataset_particionado_se_sube_desde_arrow(self):
+
+        escribir_dataset_particionado(tabla_gold(PARES, 5), os.path.join(self.tmp, "currencies_transformadas"))
+
+        self.assertEqual(self.cargador.cargar_archivo("currencies_transformadas"), "dataframes_meli.currencies_transformadas")
+
+        destino, config, filas = self.cliente.cargas[0]
+
+        self.assertEqual((destino, filas), (DESTINO, 15))
+
+        self.assertEqual([c.name for c in config.schema],
+                         ["base_currency", "destination_currency", "purchase_value", "sale_value", "date_time"])
+
+
+    def test_parquet_suelto_y_dataset_de_la_misma_tabla_se_cargan_una_vez(self):
+
+        pq.write_table(tabla_gold(PARES, 3), os.path.join(self.tmp, "currencies_transformadas.parquet"))
+
+        escribir_dataset_particionado(tabla_gold(PARES, 5), os.path.join(self.tmp, "currencies_transformadas"))
+
+        self.assertEqual(self.cargador.cargar_todas_tablas_gold(), ["dataframes_meli.currencies_transformadas"])
+
+        # Se sube el dataset (5 días), no el .parquet anterior (3 días)
+        self.assertEqual([(destino, filas) for destino, _, filas in self.cliente.cargas], [(DESTINO, 15)])
+
+
+    def test_envia_todos_los_jobs_antes_de_esperar(self):
+
+        nombres = ["tabla_a", "tabla_b", "tabla_c"]
+
+        self._escribir_tablas(nombres)
+
+        resultado = self.cargador.cargar_todas_tablas_gold()
+
+        self.assertEqual(sorted(resultado), [f"dataframes_meli.{n}" for n in nombres])
+
+        acciones = [accion for accion, _ in self.cliente.eventos]
+
+        self.assertEqual(acciones, ["submit"] * 3 + ["result"] * 3)
+
+        for nombre in nombres:
+            self.assertTrue(self.cargador._carga_registrada(f"{nombre}.parquet"))
+
+
+    def test_informa_la_tabla_que_fallo(self):
+
+        self._escribir_tablas(["tabla_a", "tabla_b", "tabla_c"])
+
+        self.cliente.fallar = {"tabla_b": "quota exceeded"}
+
+        resultado = self.cargador.cargar_todas_tablas_gold()
+
+        self.assertEqual(resultado, "❌ Fallaron 1 de 3 tablas en BigQuery: ['tabla_b.parquet']")
+
+        self.assertTrue(self.cargador._carga_registrada("tabla_a.parquet"))
+
+        self.assertFalse(self.cargador._carga_registrada("tabla_b.parquet"))
+
+        # Al reintentar solo se vuelve a subir la tabla que falló
+        self.cliente.fallar = {}
+
+        cargas = len(self.cliente.cargas)
+
+        self.assertIsInstance(self._cargador().cargar_todas_tablas_gold(), list)
+
+        self.assertEqual([d for d, _, _ in self.cliente.cargas[cargas:]], ["reportes-bedoya-389011.dataframes_meli.tabla_b"])
+
+
+    def test_archivo_inexistente(self):
+
+        self.assertTrue(self.cargador.cargar_archivo("no_existe.parquet").startswith("❌"))
+
+        self.assertEqual(self.cliente.cargas, [])
+
+
+
+
+if __name__ == "__main__":
+    unittest.main()
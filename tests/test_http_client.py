@@ -0,0 +1,89 @@
+import json
+import shutil
+import tempfile
+import unittest
+from meli_project.logic.o1_extraction.api_wb import CurrencyExtractor
+from meli_project.logic.o1_extraction.http_cache import HttpCache
+
+
+
+
+class RespuestaHttpFalsa:
+
+    def __init__(self, datos: dict):
+
+        self.status_code = 200
+
+        self.content = json.dumps(datos).encode()
+
+        self.headers = {"ETag": '"v1"'}
+
+    def json(self):
+
+        return json.loads(self.content)
+
+
+
+
+class TestCacheDePares(unittest.TestCase):
+
+
+    def setUp(self):
+
+        self.tmp = tempfile.mkdtemp()
+
+        self.extractor = CurrencyExtractor(requests_por_segundo=0, usar_cache=False)
+
+        self.extractor.http.cache = HttpCache(self.tmp, ttl_segundos=3600)
+
+        self.requests = []
+
+        def get_falso(url, **kwargs):
+
+            self.requests.append(url)
+
+            return RespuestaHttpFalsa({"USD-BRL": "Dólar/Real", "EUR-BRL": "Euro/Real", "USD-EUR": "Dólar/Euro"})
+
+        self.extractor.http._get_con_reintentos = get_falso
+
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+    def test_segunda_consulta_dentro_del_ttl_no_hace_request(self):
+
+        self.assertEqual(self.extractor.get_currency_pairs_brl(), ["USD-BRL", "EUR-BRL"])
+
+        self.assertEqual(self.extractor.get_currency_pairs_brl(), ["USD-BRL", "EUR-BRL"])
+
+        self.assertEqual(self.requests, [self.extractor.available_url])
+
+        # Otro extractor con la misma caché en disco tampoco consulta la API
+        otro = CurrencyExtractor(requests_por_segundo=0, usar_cache=False)
+
+        otro.http.cache = HttpCache(self.tmp, ttl_segundos=3600)
+
+        otro.http._get_con_reintentos = self.extractor.http._get_con_reintentos
+
+        self.assertEqual(otro.get_currency_pairs_brl(), ["USD-BRL", "EUR-BRL"])
+
+        self.assertEqual(len(self.requests), 1)
+
+
+    def test_vencido_el_ttl_se_vuelve_a_pedir(self):
+
+        self.extractor.http.cache.ttl_segundos = 0
+
+        self.extractor.get_currency_pairs_brl()
+
+        self.extractor.get_currency_pairs_brl()
+
+        self.assertEqual(len(self.requests), 2)
+
+
+
+
+if __name__ == "__main__":
+    unittest.main()
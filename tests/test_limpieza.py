@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import unittest
+from benchmarks.datos_sinteticos import escribir_bronze_sintetico
+from meli_project.logic.o2_cleaning.clean_json import DFsCurrencies
+from meli_project.logic.utils.bronze import escribir_payload, ruta_bronze
+from meli_project.logic.utils.metricas import METRICAS
+
+
+
+
+class TestConversionEnParalelo(unittest.TestCase):
+
+
+    def setUp(self):
+
+        self.tmp = tempfile.mkdtemp()
+
+        escribir_bronze_sintetico(self.tmp, 4, 30)
+
+        # Se convierte a DataFrame pero no a Arrow (bid con tipos mezclados)
+        escribir_payload(ruta_bronze(self.tmp, "ROTO-BRL", "json"),
+                         [{"code": "ROTO", "codein": "BRL", "bid": "1", "timestamp": "1"}, {"bid": {"x": 1}, "timestamp": "2"},
+                          {"bid": "1.5", "timestamp": "3"}])
+
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+    def _unificar(self, n_workers: int):
+
+        limpieza = DFsCurrencies(n_workers=n_workers)
+
+        limpieza.bronze_path = self.tmp
+
+        antes = dict(METRICAS.etapas.get("limpieza", {}))
+
+        df = limpieza.obtener_df_unificado()
+
+        despues = METRICAS.etapas.get("limpieza", {})
+
+        return df, {clave: despues[clave] - antes.get(clave, 0) for clave in ("filas_salida", "bytes_leidos")}
+
+
+    def test_igual_al_camino_secuencial_y_suma_metricas_de_los_workers(self):
+
+        secuencial, metricas_secuencial = self._unificar(1)
+
+        paralelo, metricas_paralelo = self._unificar(2)
+
+        # El archivo que no se puede serializar se descarta sin cortar la conversión
+        secuencial = secuencial[secuencial["pair"] != "ROTO-BRL"].reset_index(drop=True)
+
+        self.assertEqual(len(paralelo), 4 * 29)
+
+        self.assertTrue(paralelo.astype(str).equals(secuencial.astype(str)))
+
+        self.assertEqual(metricas_paralelo["filas_salida"], metricas_secuencial["filas_salida"] - 2)
+
+        roto = os.path.getsize(ruta_bronze(self.tmp, "ROTO-BRL", "json"))
+
+        self.assertEqual(metricas_paralelo["bytes_leidos"], metricas_secuencial["bytes_leidos"] - roto)
+
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from meli_project.logic.utils.metricas import RegistroMetricas, rss_actual
+
+
+
+
+MB = 1024 ** 2
+
+
+
+
+@unittest.skipIf(rss_actual() is None, "Sin /proc: solo se informa el pico del proceso")
+class TestRssPorEtapa(unittest.TestCase):
+
+
+    def setUp(self):
+
+        self.tmp = tempfile.mkdtemp()
+
+        self.metricas = RegistroMetricas(path=self.tmp, perfilar=[])
+
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+    def test_etapa_liviana_despues_de_una_pesada(self):
+
+        with self.metricas.medir_etapa("pesada"):
+
+            bloque = np.ones(200 * MB // 8)
+
+            time.sleep(0.2)
+
+            del bloque
+
+        with self.metricas.medir_etapa("liviana"):
+            time.sleep(0.1)
+
+        pesada, liviana = self.metricas.etapas["pesada"], self.metricas.etapas["liviana"]
+
+        self.assertGreater(pesada["rss_delta_bytes"], 150 * MB)
+
+        self.assertLess(liviana["rss_delta_bytes"], 20 * MB)
+
+        self.assertLess(liviana["pico_rss_bytes"], pesada["pico_rss_bytes"] - 150 * MB)
+
+        # El pico del proceso (ru_maxrss) sigue arrastrando la etapa pesada: por eso va en otro campo
+        self.assertGreater(liviana["pico_rss_proceso_bytes"], liviana["pico_rss_bytes"] + 150 * MB)
+
+
+    def test_prometheus_exporta_los_campos_de_rss(self):
+
+        with self.metricas.medir_etapa("limpieza"):
+            pass
+
+        with open(self.metricas.exportar_prometheus(), encoding="utf-8") as f:
+            texto = f.read()
+
+        for campo in ("pico_rss_bytes", "rss_delta_bytes", "pico_rss_proceso_bytes"):
+            self.assertIn(f'meli_pipeline_etapa_{campo}{{etapa="limpieza"}}', texto)
+
+        self.assertTrue(os.path.isfile(os.path.join(self.tmp, "meli_pipeline.prom")))
+
+
+
+
+class TestPrometheus(unittest.TestCase):
+
+
+    def setUp(self):
+
+        self.tmp = tempfile.mkdtemp()
+
+        self.metricas = RegistroMetricas(path=self.tmp, perfilar=[])
+
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+    def _exportar(self) -> list:
+
+        with open(self.metricas.exportar_prometheus(), encoding="utf-8") as f:
+            return f.read().splitlines()
+
+
+    def test_exporta_el_estado_de_cada_etapa(self):
+
+        with self.metricas.medir_etapa("limpieza"):
+            pass
+
+        with self.assertRaises(ValueError), self.metricas.medir_etapa("carga"):
+            raise ValueError("falla")
+
+        lineas = self._exportar()
+
+        self.assertIn('meli_pipeline_etapa_estado{etapa="limpieza",estado="ok"} 1', lineas)
+
+        self.assertIn('meli_pipeline_etapa_estado{etapa="carga",estado="error"} 1', lineas)
+
+        self.assertIn('meli_pipeline_etapa_ok{etapa="carga"} 0', lineas)
+
+
+    def test_cada_familia_tiene_help_y_type(self):
+
+        with self.metricas.medir_etapa("limpieza"):
+            self.metricas.sumar("limpieza", "filas_salida", 10, "USD-BRL")
+
+        lineas = self._exportar()
+
+        familias = [linea.split()[2] for linea in lineas if linea.startswith("# TYPE")]
+
+        ayudas = [linea.split()[2] for linea in lineas if linea.startswith("# HELP")]
+
+        self.assertEqual(familias, ayudas)
+
+        self.assertIn("meli_pipeline_par_filas_salida", familias)
+
+        self.assertIn('meli_pipeline_par_filas_salida{pair="USD-BRL"} 10', lineas)
+
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pyarrow.parquet as pq
+from meli_project.logic.o4_modeling.modelado import CurrencyModeler
+from meli_project.logic.utils.manifiesto import Manifiesto
+from meli_project.logic.utils.particiones import escribir_dataset_particionado, leer_dataset
+from tests.cliente_bigquery_falso import tabla_gold
+
+
+
+
+PARES = ["USD-BRL", "EUR-BRL", "ARS-BRL"]
+
+
+
+
+class TestCopiaAGold(unittest.TestCase):
+
+
+    def setUp(self):
+
+        self.tmp = tempfile.mkdtemp()
+
+        for capa in ("silver", "gold"):
+            os.makedirs(os.path.join(self.tmp, capa))
+
+
+    def tearDown(self):
+
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+    def _modelador(self, **filtros) -> CurrencyModeler:
+
+        modelador = CurrencyModeler(**filtros)
+
+        modelador.silver_path = os.path.join(self.tmp, "silver")
+
+        modelador.gold_path = os.path.join(self.tmp, "gold")
+
+        modelador.manifiesto = Manifiesto(os.path.join(self.tmp, "manifiesto.json"))
+
+        return modelador
+
+
+    def test_dataset_filtrado_reemplaza_al_parquet_anterior(self):
+
+        pq.write_table(tabla_gold(PARES, 3), os.path.join(self.tmp, "silver", "currencies_transformadas.parquet"))
+
+        self._modelador().copiar_parquet_a_gold()
+
+        # Silver pasa a dataset particionado: Gold no puede quedar con los dos formatos
+        os.remove(os.path.join(self.tmp, "silver", "currencies_transformadas.parquet"))
+
+        escribir_dataset_particionado(tabla_gold(PARES, 5), os.path.join(self.tmp, "silver", "currencies_transformadas"))
+
+        destino = self._modelador(pares=["USD-BRL"], desde="2024-01-02").copiar_parquet_a_gold()
+
+        self.assertEqual(destino, os.path.join(self.tmp, "gold", "currencies_transformadas"))
+
+        self.assertEqual(os.listdir(os.path.join(self.tmp, "gold")), ["currencies_transformadas"])
+
+        tabla = leer_dataset(destino)
+
+        self.assertEqual(tabla.num_rows, 4)
+
+        self.assertEqual(set(tabla["base_currency"].to_pylist()), {"USD"})
+
+
+
+    def test_modelado_completo_devuelve_el_error_de_un_paso(self):
+
+        resultado = self._modelador().procesar_modelado_completo()
+
+        self.assertTrue(resultado.startswith("❌ Archivo no encontrado"))
+
+
+    def test_modelado_completo_devuelve_los_resultados(self):
+
+        pq.write_table(tabla_gold(PARES, 3), os.path.join(self.tmp, "silver", "currencies_transformadas.parquet"))
+
+        resultados = self._modelador().procesar_modelado_completo()
+
+        self.assertIsInstance(resultados, list)
+
+        self.assertEqual(resultados[0], os.path.join(self.tmp, "gold", "currencies_transformadas.parquet"))
+
+
+
+
+if __name__ == "__main__":
+    unittest.main()